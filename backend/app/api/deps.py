@@ -6,10 +6,17 @@ from typing import AsyncGenerator
 from fastapi import Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.database import get_db
+from app.core.database import get_db, get_read_db
 from app.services.server_service import ServerService
+from app.services.server_pool_service import ServerPoolService
 from app.services.job_service import JobService
 from app.services.execution_service import ExecutionService
+from app.services.artifact_service import ArtifactService
+from app.services.pipeline_service import PipelineService
+from app.services.result_cache import ResultCacheService
+from app.services.webhook_service import WebhookService
+from app.services.rollup_service import RollupService
+from app.services.regression_service import RegressionService
 
 
 async def get_server_service(
@@ -19,6 +26,13 @@ async def get_server_service(
     return ServerService(db)
 
 
+async def get_server_pool_service(
+    db: AsyncSession = Depends(get_db)
+) -> ServerPoolService:
+    """サーバプールサービスの依存性注入"""
+    return ServerPoolService(db)
+
+
 async def get_job_service(
     db: AsyncSession = Depends(get_db)
 ) -> JobService:
@@ -31,3 +45,53 @@ async def get_execution_service(
 ) -> ExecutionService:
     """実行サービスの依存性注入"""
     return ExecutionService(db)
+
+
+async def get_execution_read_service(
+    db: AsyncSession = Depends(get_db),
+    read_db: AsyncSession = Depends(get_read_db)
+) -> ExecutionService:
+    """実行サービス（履歴・一覧の参照をレプリカから行う）の依存性注入"""
+    return ExecutionService(db, read_db=read_db)
+
+
+async def get_artifact_service(
+    db: AsyncSession = Depends(get_db)
+) -> ArtifactService:
+    """成果物サービスの依存性注入"""
+    return ArtifactService(db)
+
+
+async def get_pipeline_service(
+    db: AsyncSession = Depends(get_db)
+) -> PipelineService:
+    """パイプラインサービスの依存性注入"""
+    return PipelineService(db)
+
+
+async def get_result_cache_service(
+    db: AsyncSession = Depends(get_read_db)
+) -> ResultCacheService:
+    """実行結果キャッシュサービスの依存性注入"""
+    return ResultCacheService(db)
+
+
+async def get_webhook_service(
+    db: AsyncSession = Depends(get_db)
+) -> WebhookService:
+    """Webhookサービスの依存性注入"""
+    return WebhookService(db)
+
+
+async def get_rollup_service(
+    db: AsyncSession = Depends(get_read_db)
+) -> RollupService:
+    """実行集計サービスの依存性注入"""
+    return RollupService(db)
+
+
+async def get_regression_service(
+    db: AsyncSession = Depends(get_read_db)
+) -> RegressionService:
+    """実行時間の遅延検知サービスの依存性注入"""
+    return RegressionService(db)
@@ -0,0 +1,124 @@
+"""
+API共通レスポンス
+HTTP Range リクエストに対応したファイル配信
+"""
+from fastapi import HTTPException, status
+from fastapi.responses import StreamingResponse
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+from urllib.parse import quote
+
+
+# ファイル読み込みの単位
+CHUNK_SIZE = 1024 * 1024
+
+
+def parse_range(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Range ヘッダーを解析
+    
+    単一範囲（bytes=start-end / bytes=start- / bytes=-suffix）のみ対応し、
+    複数範囲や不正な形式の場合は範囲指定なしとして扱う。
+    
+    Args:
+        range_header: Range ヘッダーの値
+        size: ファイルサイズ
+        
+    Returns:
+        (開始位置, 終了位置（含む）) のタプル、範囲指定なしの場合はNone
+        
+    Raises:
+        HTTPException: 範囲がファイル外（416）
+    """
+    if not range_header or not range_header.startswith("bytes="):
+        return None
+    
+    spec = range_header[len("bytes="):].strip()
+    if "," in spec or "-" not in spec:
+        return None
+    
+    start_text, end_text = spec.split("-", 1)
+    try:
+        if start_text:
+            start = int(start_text)
+            end = int(end_text) if end_text else size - 1
+        else:
+            # 末尾からのバイト数指定
+            suffix = int(end_text)
+            start = max(size - suffix, 0)
+            end = size - 1
+    except ValueError:
+        return None
+    
+    end = min(end, size - 1)
+    if start >= size or start > end:
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            detail="要求された範囲が不正です",
+            headers={"Content-Range": f"bytes */{size}"}
+        )
+    return start, end
+
+
+def _iter_file(path: Path, start: int, length: int) -> Iterator[bytes]:
+    """ファイルの指定範囲を分割して読み込む"""
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = length
+        while remaining > 0:
+            data = f.read(min(CHUNK_SIZE, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            yield data
+
+
+def file_range_response(
+    path: Path,
+    size: int,
+    range_header: Optional[str],
+    filename: str,
+    etag: Optional[str] = None,
+    media_type: str = "application/octet-stream"
+) -> StreamingResponse:
+    """
+    Range リクエストに対応したファイルレスポンスを作成
+    
+    Args:
+        path: 配信するファイル
+        size: ファイルサイズ
+        range_header: Range ヘッダーの値
+        filename: ダウンロード時のファイル名
+        etag: ETag（内容ハッシュなど）
+        media_type: Content-Type
+        
+    Returns:
+        範囲指定があれば206、なければ200のレスポンス
+    """
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": f"attachment; filename*=UTF-8''{quote(filename)}",
+    }
+    if etag:
+        headers["ETag"] = f'"{etag}"'
+    
+    byte_range = parse_range(range_header, size) if size > 0 else None
+    if byte_range is None:
+        headers["Content-Length"] = str(size)
+        return StreamingResponse(
+            _iter_file(path, 0, size),
+            status_code=status.HTTP_200_OK,
+            media_type=media_type,
+            headers=headers
+        )
+    
+    start, end = byte_range
+    length = end - start + 1
+    headers["Content-Length"] = str(length)
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    return StreamingResponse(
+        _iter_file(path, start, length),
+        status_code=status.HTTP_206_PARTIAL_CONTENT,
+        media_type=media_type,
+        headers=headers
+    )
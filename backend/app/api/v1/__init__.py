@@ -1,6 +1,6 @@
 """
 API v1 パッケージ
 """
-from app.api.v1 import servers, jobs, executions
+from app.api.v1 import servers, server_pools, jobs, executions, pipelines, webhooks, stats
 
-__all__ = ["servers", "jobs", "executions"]
+__all__ = ["servers", "server_pools", "jobs", "executions", "pipelines", "webhooks", "stats"]
@@ -1,13 +1,40 @@
 """
 ジョブ実行履歴API
 """
-from fastapi import APIRouter, Depends, HTTPException, status, Query, BackgroundTasks
-from typing import List
+from fastapi import (
+    APIRouter, Depends, HTTPException, status, Query, BackgroundTasks, Header,
+    WebSocket, WebSocketDisconnect, Response,
+)
+from typing import List, Literal, Optional
+import asyncio
+from datetime import datetime
+from pathlib import PurePosixPath
 
-from app.schemas.execution import ExecutionResponse, ExecutionCreateRequest
-from app.services.execution_service import ExecutionService, ExecutionNotFoundError
+from app.schemas.execution import (
+    ExecutionResponse,
+    ExecutionCreateRequest,
+    CacheStatsResponse,
+    RetentionReport,
+    RetentionStatsResponse,
+)
+from app.schemas.artifact import ArtifactResponse
+from app.services.execution_service import (
+    ExecutionService,
+    ExecutionNotFoundError,
+    IdempotencyKeyConflictError,
+)
 from app.services.job_service import JobNotFoundError
-from app.api.deps import get_execution_service
+from app.services.artifact_service import ArtifactService, ArtifactNotFoundError
+from app.services.result_cache import ResultCacheService
+from app.services.execution_events import execution_events
+from app.services.retention_service import execution_pruner
+from app.api.deps import (
+    get_execution_service,
+    get_execution_read_service,
+    get_artifact_service,
+    get_result_cache_service,
+)
+from app.api.responses import file_range_response, parse_range
 
 router = APIRouter()
 
@@ -17,28 +44,102 @@ async def list_executions(
     limit: int = Query(100, ge=1, le=500, description="取得件数"),
     offset: int = Query(0, ge=0, description="オフセット"),
     job_id: int | None = Query(None, description="ジョブIDでフィルタ"),
-    service: ExecutionService = Depends(get_execution_service)
+    service: ExecutionService = Depends(get_execution_read_service)
 ):
     """
     実行履歴一覧を取得
+    
+    レプリカから読む（直近に変更された実行はプライマリから読み直す）。
     """
     if job_id:
         executions = await service.get_by_job_id(job_id, limit=limit)
     else:
         executions = await service.get_all(limit=limit, offset=offset)
-    return executions
+    return service.with_queue_info(executions)
+
+
+@router.get("/cache/stats", response_model=CacheStatsResponse)
+async def get_cache_stats(
+    since: Optional[datetime] = Query(None, description="集計開始日時"),
+    service: ResultCacheService = Depends(get_result_cache_service)
+):
+    """
+    実行結果キャッシュの統計（ヒット率・節約した実行時間）を取得
+    """
+    return await service.stats(since=since)
+
+
+@router.get("/retention/stats", response_model=RetentionStatsResponse)
+async def get_retention_stats():
+    """
+    保持期間を過ぎた実行履歴の削除の統計（削除した件数・出力の量）を取得
+    """
+    return execution_pruner.stats()
+
+
+@router.post("/retention/prune", response_model=RetentionReport)
+async def prune_executions():
+    """
+    保持期間を過ぎた実行履歴を今すぐ削除
+    
+    保持期間はジョブの retention_max_executions / retention_days（未指定は設定値）で指定する。
+    """
+    report = await execution_pruner.prune()
+    return report.to_dict()
+
+
+@router.websocket("/events")
+async def stream_execution_events(
+    websocket: WebSocket,
+    job_id: Optional[List[int]] = Query(None, description="ジョブIDで絞り込み（複数指定可）"),
+    execution_id: Optional[List[int]] = Query(None, description="実行IDで絞り込み（複数指定可）")
+):
+    """
+    実行のステータス変更を ExecutionStatusMessage として送信し続ける（WebSocket）
+    
+    絞り込みを指定しない場合はすべてのジョブの実行が対象。他のワーカーで
+    変更された実行のイベントも届く。
+    """
+    await websocket.accept()
+    with execution_events.subscribe(job_ids=job_id, execution_ids=execution_id) as subscription:
+        # クライアントからの受信は切断の検知のみに使う
+        disconnected = asyncio.create_task(_wait_disconnect(websocket))
+        try:
+            while True:
+                next_event = asyncio.create_task(subscription.get())
+                await asyncio.wait({next_event, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+                if disconnected.done():
+                    next_event.cancel()
+                    break
+                await websocket.send_text(next_event.result().model_dump_json())
+        except WebSocketDisconnect:
+            pass
+        finally:
+            disconnected.cancel()
+
+
+async def _wait_disconnect(websocket: WebSocket) -> None:
+    """クライアントが切断するまで受信を読み捨てる"""
+    try:
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
 
 
 @router.get("/{execution_id}", response_model=ExecutionResponse)
 async def get_execution(
     execution_id: int,
-    service: ExecutionService = Depends(get_execution_service)
+    service: ExecutionService = Depends(get_execution_read_service)
 ):
     """
     実行履歴詳細を取得
+    
+    レプリカから読む（直近に変更された実行やレプリカにまだない実行はプライマリから読む）。
     """
     try:
-        execution = await service.get_by_id(execution_id)
+        execution = await service.get_by_id(execution_id, from_replica=True)
+        service.with_queue_info([execution])
         return execution
     except ExecutionNotFoundError as e:
         raise HTTPException(
@@ -47,28 +148,78 @@ async def get_execution(
         )
 
 
+@router.get("/{execution_id}/logs/{stream}")
+async def get_execution_log(
+    execution_id: int,
+    stream: Literal["stdout", "stderr"],
+    range_header: Optional[str] = Header(None, alias="Range"),
+    service: ExecutionService = Depends(get_execution_read_service)
+):
+    """
+    実行の出力を取得（text/plain）
+    
+    Range ヘッダーによる部分取得（206 Partial Content）に対応する。ログアーカイブへ移した
+    出力は、範囲を含むブロックのみを展開して返す。
+    """
+    try:
+        execution = await service.get_by_id(execution_id, load_logs=False, from_replica=True)
+    except ExecutionNotFoundError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
+    
+    size = service.log_size(execution, stream)
+    headers = {"Accept-Ranges": "bytes"}
+    byte_range = parse_range(range_header, size) if size > 0 else None
+    if byte_range is None:
+        data = await service.read_log(execution, stream)
+        return Response(content=data, media_type="text/plain; charset=utf-8", headers=headers)
+    
+    start, end = byte_range
+    data = await service.read_log(execution, stream, start, end + 1)
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    return Response(
+        content=data,
+        status_code=status.HTTP_206_PARTIAL_CONTENT,
+        media_type="text/plain; charset=utf-8",
+        headers=headers
+    )
+
+
 @router.post("", response_model=ExecutionResponse, status_code=status.HTTP_201_CREATED)
 async def execute_job(
     request: ExecutionCreateRequest,
     background_tasks: BackgroundTasks,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
     service: ExecutionService = Depends(get_execution_service)
 ):
     """
     ジョブを実行
     
     ジョブの実行を開始し、実行履歴を返す。
-    実際の実行は非同期で行われる。
+    同じ Idempotency-Key の要求や、実行待ちの同じ要求には同じ実行履歴を返す。
     """
     try:
-        # ジョブ実行を開始（同期的に実行）
+        # ジョブ実行を開始（実行完了まで待つ）
         # 将来的にはバックグラウンドタスクやCeleryで非同期化を検討
-        execution = await service.create_and_execute(request.job_id)
+        execution = await service.trigger(
+            request.job_id,
+            parameters=request.parameters,
+            input_hashes=request.input_hashes,
+            idempotency_key=idempotency_key
+        )
         return execution
     except JobNotFoundError as e:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=str(e)
         )
+    except IdempotencyKeyConflictError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
 
 
 @router.post("/{execution_id}/cancel", response_model=ExecutionResponse)
@@ -89,3 +240,51 @@ async def cancel_execution(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=str(e)
         )
+
+
+@router.get("/{execution_id}/artifacts", response_model=List[ArtifactResponse])
+async def list_artifacts(
+    execution_id: int,
+    service: ArtifactService = Depends(get_artifact_service)
+):
+    """
+    実行の成果物一覧を取得
+    """
+    artifacts = await service.get_by_execution_id(execution_id)
+    return artifacts
+
+
+@router.get("/{execution_id}/artifacts/{artifact_id}/download")
+async def download_artifact(
+    execution_id: int,
+    artifact_id: int,
+    range_header: Optional[str] = Header(None, alias="Range"),
+    service: ArtifactService = Depends(get_artifact_service)
+):
+    """
+    成果物をダウンロード
+    
+    Range ヘッダーによる部分取得（206 Partial Content）に対応する。
+    """
+    try:
+        artifact = await service.get_by_id(execution_id, artifact_id)
+    except ArtifactNotFoundError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
+    
+    path = service.blob_path(artifact.sha256)
+    if not path.exists():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"成果物ID {artifact_id} のファイルが見つかりません"
+        )
+    
+    return file_range_response(
+        path=path,
+        size=artifact.size,
+        range_header=range_header,
+        filename=PurePosixPath(artifact.path).name,
+        etag=artifact.sha256
+    )
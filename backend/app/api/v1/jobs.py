@@ -4,9 +4,11 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from typing import List
 
-from app.schemas.job import JobCreate, JobUpdate, JobResponse
-from app.services.job_service import JobService, JobNotFoundError
+from app.schemas.job import JobCreate, JobUpdate, JobResponse, DefinitionCacheStatsResponse
+from app.services.job_service import JobService, JobNotFoundError, InvalidJobTargetError
 from app.services.server_service import ServerNotFoundError
+from app.services.server_pool_service import ServerPoolNotFoundError
+from app.services.workspace_sync import WorkspaceError
 from app.api.deps import get_job_service
 
 router = APIRouter()
@@ -15,18 +17,42 @@ router = APIRouter()
 @router.get("", response_model=List[JobResponse])
 async def list_jobs(
     server_id: int | None = Query(None, description="サーバIDでフィルタ"),
+    include: str | None = Query(None, description="追加で含める情報（カンマ区切り）: last_execution"),
     service: JobService = Depends(get_job_service)
 ):
     """
     ジョブ一覧を取得
+    
+    include=last_execution を指定すると、各ジョブの最新の実行の概要を同じクエリで取得して含める。
     """
+    includes = {name.strip() for name in include.split(",") if name.strip()} if include else set()
+    unknown = includes - {"last_execution"}
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"include に指定できない値です: {', '.join(sorted(unknown))}"
+        )
+    include_last_execution = "last_execution" in includes
+    
     if server_id:
-        jobs = await service.get_by_server_id(server_id)
+        jobs = await service.get_by_server_id(server_id, include_last_execution=include_last_execution)
     else:
-        jobs = await service.get_all()
+        jobs = await service.get_all(include_last_execution=include_last_execution)
     return jobs
 
 
+@router.get("/definition-cache/stats", response_model=List[DefinitionCacheStatsResponse])
+async def get_definition_cache_stats(
+    service: JobService = Depends(get_job_service)
+):
+    """
+    定義キャッシュ（ジョブ・サーバ）のヒット率を取得
+    
+    ワーカーごとの集計のため、複数ワーカーで動かしている場合は応答したワーカーの値になる。
+    """
+    return service.get_definition_cache_stats()
+
+
 @router.get("/{job_id}", response_model=JobResponse)
 async def get_job(
     job_id: int,
@@ -56,11 +82,16 @@ async def create_job(
     try:
         job = await service.create(job_data)
         return job
-    except ServerNotFoundError as e:
+    except (ServerNotFoundError, ServerPoolNotFoundError) as e:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=str(e)
         )
+    except WorkspaceError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
 
 
 @router.put("/{job_id}", response_model=JobResponse)
@@ -80,11 +111,16 @@ async def update_job(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=str(e)
         )
-    except ServerNotFoundError as e:
+    except (ServerNotFoundError, ServerPoolNotFoundError) as e:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=str(e)
         )
+    except (InvalidJobTargetError, WorkspaceError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
 
 
 @router.delete("/{job_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,171 @@
+"""
+パイプライン管理API
+"""
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from typing import List
+
+from app.schemas.pipeline import (
+    PipelineCreate,
+    PipelineUpdate,
+    PipelineResponse,
+    PipelineRunResponse,
+)
+from app.services.pipeline_service import (
+    PipelineService,
+    PipelineNotFoundError,
+    PipelineRunNotFoundError,
+    InvalidPipelineError,
+)
+from app.services.job_service import JobNotFoundError
+from app.api.deps import get_pipeline_service
+
+router = APIRouter()
+
+
+@router.get("", response_model=List[PipelineResponse])
+async def list_pipelines(
+    service: PipelineService = Depends(get_pipeline_service)
+):
+    """
+    パイプライン一覧を取得
+    """
+    return await service.get_all()
+
+
+@router.get("/{pipeline_id}", response_model=PipelineResponse)
+async def get_pipeline(
+    pipeline_id: int,
+    service: PipelineService = Depends(get_pipeline_service)
+):
+    """
+    パイプライン詳細を取得
+    """
+    try:
+        return await service.get_by_id(pipeline_id)
+    except PipelineNotFoundError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
+
+
+@router.post("", response_model=PipelineResponse, status_code=status.HTTP_201_CREATED)
+async def create_pipeline(
+    pipeline_data: PipelineCreate,
+    service: PipelineService = Depends(get_pipeline_service)
+):
+    """
+    パイプラインを作成
+    """
+    try:
+        return await service.create(pipeline_data)
+    except InvalidPipelineError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except JobNotFoundError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
+
+
+@router.put("/{pipeline_id}", response_model=PipelineResponse)
+async def update_pipeline(
+    pipeline_id: int,
+    pipeline_data: PipelineUpdate,
+    service: PipelineService = Depends(get_pipeline_service)
+):
+    """
+    パイプラインを更新
+    """
+    try:
+        return await service.update(pipeline_id, pipeline_data)
+    except (PipelineNotFoundError, JobNotFoundError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
+    except InvalidPipelineError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+
+@router.delete("/{pipeline_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_pipeline(
+    pipeline_id: int,
+    service: PipelineService = Depends(get_pipeline_service)
+):
+    """
+    パイプラインを削除
+    """
+    try:
+        await service.delete(pipeline_id)
+    except PipelineNotFoundError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
+
+
+@router.post(
+    "/{pipeline_id}/runs",
+    response_model=PipelineRunResponse,
+    status_code=status.HTTP_202_ACCEPTED
+)
+async def run_pipeline(
+    pipeline_id: int,
+    service: PipelineService = Depends(get_pipeline_service)
+):
+    """
+    パイプラインを実行
+    
+    ノードはバックグラウンドで依存関係に従って実行される。
+    進捗は実行詳細の取得で確認する。
+    """
+    try:
+        return await service.start_run(pipeline_id)
+    except PipelineNotFoundError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
+
+
+@router.get("/{pipeline_id}/runs", response_model=List[PipelineRunResponse])
+async def list_pipeline_runs(
+    pipeline_id: int,
+    limit: int = Query(50, ge=1, le=500, description="取得件数"),
+    service: PipelineService = Depends(get_pipeline_service)
+):
+    """
+    パイプラインの実行履歴を取得
+    """
+    try:
+        return await service.get_runs(pipeline_id, limit=limit)
+    except PipelineNotFoundError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
+
+
+@router.get("/{pipeline_id}/runs/{run_id}", response_model=PipelineRunResponse)
+async def get_pipeline_run(
+    pipeline_id: int,
+    run_id: int,
+    service: PipelineService = Depends(get_pipeline_service)
+):
+    """
+    パイプライン実行の詳細（ノードごとの実行履歴・クリティカルパス）を取得
+    """
+    try:
+        return await service.get_run(pipeline_id, run_id)
+    except PipelineRunNotFoundError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
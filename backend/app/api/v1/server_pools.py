@@ -0,0 +1,128 @@
+"""
+サーバプール管理API
+"""
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from typing import List
+
+from app.schemas.server_pool import (
+    ServerPoolCreate,
+    ServerPoolUpdate,
+    ServerPoolResponse,
+    ServerPoolMemberLoad
+)
+from app.services.server_pool_service import (
+    ServerPoolService,
+    ServerPoolNotFoundError,
+    ServerPoolNameConflictError
+)
+from app.services.server_service import ServerNotFoundError
+from app.api.deps import get_server_pool_service
+
+router = APIRouter()
+
+
+@router.get("", response_model=List[ServerPoolResponse])
+async def list_server_pools(
+    service: ServerPoolService = Depends(get_server_pool_service)
+):
+    """
+    サーバプール一覧を取得
+    """
+    return await service.get_all()
+
+
+@router.get("/{pool_id}", response_model=ServerPoolResponse)
+async def get_server_pool(
+    pool_id: int,
+    service: ServerPoolService = Depends(get_server_pool_service)
+):
+    """
+    サーバプール詳細を取得
+    """
+    try:
+        return await service.get_by_id(pool_id)
+    except ServerPoolNotFoundError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
+
+
+@router.get("/{pool_id}/load", response_model=List[ServerPoolMemberLoad])
+async def get_server_pool_load(
+    pool_id: int,
+    refresh: bool = Query(False, description="定期収集を待たずに負荷を収集し直す"),
+    service: ServerPoolService = Depends(get_server_pool_service)
+):
+    """
+    メンバーの負荷と割り当てのスコアを取得（次に割り当てるメンバーが先頭）
+    """
+    try:
+        return await service.get_load(pool_id, refresh=refresh)
+    except ServerPoolNotFoundError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
+
+
+@router.post("", response_model=ServerPoolResponse, status_code=status.HTTP_201_CREATED)
+async def create_server_pool(
+    pool_data: ServerPoolCreate,
+    service: ServerPoolService = Depends(get_server_pool_service)
+):
+    """
+    サーバプールを作成
+    """
+    try:
+        return await service.create(pool_data)
+    except ServerNotFoundError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
+    except ServerPoolNameConflictError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
+
+
+@router.put("/{pool_id}", response_model=ServerPoolResponse)
+async def update_server_pool(
+    pool_id: int,
+    pool_data: ServerPoolUpdate,
+    service: ServerPoolService = Depends(get_server_pool_service)
+):
+    """
+    サーバプールを更新
+    """
+    try:
+        return await service.update(pool_id, pool_data)
+    except (ServerPoolNotFoundError, ServerNotFoundError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
+    except ServerPoolNameConflictError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
+
+
+@router.delete("/{pool_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_server_pool(
+    pool_id: int,
+    service: ServerPoolService = Depends(get_server_pool_service)
+):
+    """
+    サーバプールを削除（プールを実行先とするジョブも削除される）
+    """
+    try:
+        await service.delete(pool_id)
+    except ServerPoolNotFoundError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
@@ -9,9 +9,14 @@ from app.schemas.server import (
     ServerUpdate,
     ServerResponse,
     ServerTestRequest,
-    ServerTestResponse
+    ServerTestResponse,
+    ServerConcurrencyResponse
+)
+from app.services.server_service import (
+    ServerService,
+    ServerNotFoundError,
+    InvalidJumpServerError
 )
-from app.services.server_service import ServerService, ServerNotFoundError
 from app.api.deps import get_server_service
 
 router = APIRouter()
@@ -28,6 +33,18 @@ async def list_servers(
     return servers
 
 
+@router.get("/concurrency", response_model=List[ServerConcurrencyResponse])
+async def list_server_concurrency(
+    service: ServerService = Depends(get_server_service)
+):
+    """
+    サーバごとの同時実行数の上限と実行中の件数を取得
+    
+    適応型制御が有効なサーバは、現在の上限と観測値も返す。
+    """
+    return await service.get_concurrency_status()
+
+
 @router.get("/{server_id}", response_model=ServerResponse)
 async def get_server(
     server_id: int,
@@ -54,8 +71,19 @@ async def create_server(
     """
     サーバを作成
     """
-    server = await service.create(server_data)
-    return server
+    try:
+        server = await service.create(server_data)
+        return server
+    except ServerNotFoundError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
+    except InvalidJumpServerError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
 
 
 @router.put("/{server_id}", response_model=ServerResponse)
@@ -75,6 +103,11 @@ async def update_server(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=str(e)
         )
+    except InvalidJumpServerError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
 
 
 @router.delete("/{server_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -102,14 +135,26 @@ async def test_server_connection(
     """
     SSH接続をテスト
     """
-    success, message = await service.test_connection(
-        host=test_data.host,
-        port=test_data.port,
-        username=test_data.username,
-        auth_method=test_data.auth_method,
-        password=test_data.password,
-        private_key=test_data.private_key
-    )
+    try:
+        success, message = await service.test_connection(
+            host=test_data.host,
+            port=test_data.port,
+            username=test_data.username,
+            auth_method=test_data.auth_method,
+            password=test_data.password,
+            private_key=test_data.private_key,
+            jump_server_id=test_data.jump_server_id
+        )
+    except ServerNotFoundError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
+    except InvalidJumpServerError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     
     return ServerTestResponse(
         success=success,
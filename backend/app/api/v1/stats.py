@@ -0,0 +1,76 @@
+"""
+実行集計API
+"""
+from fastapi import APIRouter, Depends, Query
+from typing import List, Literal, Optional
+from datetime import datetime
+
+from app.core.database import database_stats
+from app.schemas.rollup import JobRollupStats, ServerRollupStats, DurationRegression, DatabaseStats
+from app.services.rollup_service import RollupService
+from app.services.regression_service import RegressionService
+from app.api.deps import get_rollup_service, get_regression_service
+
+router = APIRouter()
+
+
+@router.get("/jobs", response_model=List[JobRollupStats])
+async def get_job_stats(
+    job_id: Optional[int] = Query(None, description="ジョブIDで絞り込み"),
+    server_id: Optional[int] = Query(None, description="実行したサーバIDで絞り込み"),
+    since: Optional[datetime] = Query(None, description="集計開始日時（省略時は7日前）"),
+    until: Optional[datetime] = Query(None, description="集計終了日時（省略時は現在）"),
+    granularity: Literal["hour", "day"] = Query("day", description="集計の単位"),
+    service: RollupService = Depends(get_rollup_service)
+):
+    """
+    ジョブ・時間帯ごとの実行件数・成功率・実行時間（平均・パーセンタイル）を取得
+    
+    実行の終了時に更新している集計から返すため、実行履歴は走査しない。
+    """
+    return await service.query(
+        "job", since=since, until=until, granularity=granularity, job_id=job_id, server_id=server_id
+    )
+
+
+@router.get("/servers", response_model=List[ServerRollupStats])
+async def get_server_stats(
+    server_id: Optional[int] = Query(None, description="実行したサーバIDで絞り込み"),
+    job_id: Optional[int] = Query(None, description="ジョブIDで絞り込み"),
+    since: Optional[datetime] = Query(None, description="集計開始日時（省略時は7日前）"),
+    until: Optional[datetime] = Query(None, description="集計終了日時（省略時は現在）"),
+    granularity: Literal["hour", "day"] = Query("day", description="集計の単位"),
+    service: RollupService = Depends(get_rollup_service)
+):
+    """
+    実行したサーバ・時間帯ごとの実行件数・成功率・実行時間（平均・パーセンタイル）を取得
+    """
+    return await service.query(
+        "server", since=since, until=until, granularity=granularity, job_id=job_id, server_id=server_id
+    )
+
+
+@router.get("/regressions", response_model=List[DurationRegression])
+async def get_slowest_regressions(
+    job_id: Optional[int] = Query(None, description="ジョブIDで絞り込み"),
+    since: Optional[datetime] = Query(None, description="終了日時の開始（省略時は7日前）"),
+    until: Optional[datetime] = Query(None, description="終了日時の終了（省略時は現在）"),
+    limit: int = Query(50, ge=1, le=500, description="取得件数"),
+    service: RegressionService = Depends(get_regression_service)
+):
+    """
+    実行時間が遅延した実行を、ジョブの平均実行時間に対する遅れが大きい順に取得
+    
+    成功した実行の終了時に、ジョブごとの実行時間の指数移動平均・分散と比べて判定している。
+    """
+    return await service.slowest(since=since, until=until, job_id=job_id, limit=limit)
+
+
+@router.get("/database", response_model=List[DatabaseStats])
+async def get_database_stats():
+    """
+    SQLの実行時間の統計（件数・合計/平均/最大時間・遅いSQL）と接続プールの状態を取得
+    
+    DATABASE_SLOW_QUERY_THRESHOLD 秒以上かかったSQLは警告ログにも出力している。
+    """
+    return database_stats()
@@ -0,0 +1,60 @@
+"""
+Webhook受信API
+"""
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
+from typing import List
+
+from app.models.webhook import WebhookProvider
+from app.schemas.webhook import WebhookAckResponse, WebhookEventResponse
+from app.services.webhook_service import (
+    WebhookService,
+    WebhookNotConfiguredError,
+    WebhookSignatureError,
+)
+from app.api.deps import get_webhook_service
+
+router = APIRouter()
+
+
+@router.get("/events", response_model=List[WebhookEventResponse])
+async def list_webhook_events(
+    limit: int = Query(100, ge=1, le=500, description="取得件数"),
+    service: WebhookService = Depends(get_webhook_service)
+):
+    """
+    受信したWebhookイベントの一覧を取得
+    """
+    return await service.get_events(limit=limit)
+
+
+@router.post(
+    "/{provider}",
+    response_model=WebhookAckResponse,
+    status_code=status.HTTP_202_ACCEPTED
+)
+async def receive_webhook(
+    provider: WebhookProvider,
+    request: Request,
+    service: WebhookService = Depends(get_webhook_service)
+):
+    """
+    Webhookを受信
+    
+    署名を検証してイベントを保存し、すぐに応答する。
+    ジョブへの対応付けと実行の予約はバックグラウンドでまとめて行う。
+    """
+    body = await request.body()
+    try:
+        event_id, duplicate = await service.receive(provider, request.headers, body)
+    except WebhookNotConfiguredError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e)
+        )
+    except WebhookSignatureError as e:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=str(e)
+        )
+    
+    return WebhookAckResponse(event_id=event_id, duplicate=duplicate)
@@ -0,0 +1,4 @@
+"""
+管理コマンドパッケージ
+backend ディレクトリで python -m app.commands.<コマンド名> として実行する
+"""
@@ -0,0 +1,40 @@
+"""
+実行集計のバックフィル
+既存の実行履歴のうち未集計の終了した実行を、集計ワーカーと同じ処理で集計に加算する
+
+実行方法（backend ディレクトリで）:
+    python -m app.commands.backfill_rollups             # 未集計の実行のみ加算
+    python -m app.commands.backfill_rollups --rebuild   # 集計をすべて作り直す
+"""
+import argparse
+import asyncio
+import time
+
+from app.core.database import AsyncSessionLocal
+from app.services.rollup_service import RollupService
+
+
+async def main(rebuild: bool, batch_size: int) -> None:
+    if rebuild:
+        async with AsyncSessionLocal() as db:
+            await RollupService(db).reset()
+        print("cleared existing rollups")
+    
+    started = time.perf_counter()
+    total = 0
+    while True:
+        async with AsyncSessionLocal() as db:
+            applied = await RollupService(db).apply_pending(limit=batch_size)
+        if applied == 0:
+            break
+        total += applied
+        print(f"  {total} executions rolled up ({time.perf_counter() - started:.1f}s)")
+    print(f"done: {total} executions in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rebuild", action="store_true", help="集計を削除してすべての実行を集計し直す")
+    parser.add_argument("--batch-size", type=int, default=5000, help="1回のトランザクションで集計する実行数")
+    args = parser.parse_args()
+    asyncio.run(main(args.rebuild, args.batch_size))
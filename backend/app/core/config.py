@@ -16,6 +16,23 @@ class Settings(BaseSettings):
     
     # データベース設定
     database_url: str
+    database_read_url: str = ""  # 履歴・一覧の参照に使う読み取り専用DB（レプリカ）。空はプライマリを使う
+    read_your_writes_window: float = 5.0  # 変更してからこの秒数の実行はレプリカではなくプライマリから読む
+    database_echo: bool = False  # 全SQLをログに出力（DEBUG とは別に指定する）
+    database_pool_size: int = 10  # 接続プールに保持する接続数（エンジンごと）
+    database_max_overflow: int = 20  # プールを超えて一時的に開く接続数
+    database_pool_timeout: float = 30.0  # プールの接続が空くまで待つ秒数
+    database_pool_pre_ping: bool = True  # 接続を貸し出す前に生存を確認（DBの再起動・フェイルオーバー後の切断に備える）
+    database_pool_recycle: int = 1800  # この秒数より古い接続は作り直す（-1は無効）
+    database_statement_cache_size: int = 100  # asyncpg のステートメントキャッシュ（PgBouncer のトランザクションモードでは0）
+    database_prepared_statement_cache_size: int = 100  # SQLAlchemy の asyncpg アダプタのプリペアドステートメントキャッシュ（同上）
+    database_slow_query_threshold: float = 0.5  # この秒数以上かかったSQLを警告ログに出力（0は無効）
+    
+    # リクエストごとのSQLの計測（件数・DB時間のレスポンスヘッダー、N+1クエリの検出）
+    query_profiling_enabled: bool = False
+    query_profiling_sample_rate: float = 1.0  # 計測するリクエストの割合（本番では 0.01 など）
+    query_profiling_repeat_threshold: int = 10  # 1リクエストで同じSQLをこの回数以上実行したら警告
+    query_profiling_headers: bool = True  # X-DB-Query-Count / X-DB-Time-Ms / Server-Timing を付ける
     
     # セキュリティ設定
     secret_key: str
@@ -30,6 +47,113 @@ class Settings(BaseSettings):
     ssh_timeout: int = 300
     ssh_connect_timeout: int = 30
     
+    # SSH接続プール設定（1接続上のチャネル多重化）
+    ssh_pool_enabled: bool = True
+    ssh_max_sessions_per_connection: int = 10  # sshd の MaxSessions（既定値10）以下にする
+    ssh_max_connections_per_host: int = 8
+    ssh_pool_idle_timeout: int = 300
+    
+    # リモートスクリプトキャッシュ設定
+    ssh_script_cache_enabled: bool = True
+    ssh_script_cache_dir: str = "~/.cache/tsubame-ci/scripts"
+    ssh_script_cache_ttl_days: int = 30
+    
+    # SFTP転送設定
+    sftp_block_size: int = 65536  # SFTP読み書き要求1件のサイズ
+    sftp_max_requests: int = 16  # 1ファイルあたりの同時要求数
+    
+    # 成果物収集設定
+    artifact_storage_dir: str = "./data/artifacts"
+    artifact_download_concurrency: int = 4  # 同時にダウンロードするファイル数
+    
+    # ワークスペース同期設定
+    workspace_root: str = ""  # ジョブが同期できるローカルのディレクトリ（この下のみ。空は同期しない）
+    workspace_sync_concurrency: int = 8  # 同時に転送するファイル数
+    workspace_sync_block_size: int = 1048576  # 差分比較のブロックサイズ
+    workspace_sync_exclude: str = ".git"  # 同期しないファイル・ディレクトリ名（カンマ区切り）
+    workspace_sync_hash_cache_size: int = 100000  # ハッシュを覚えておくローカルのファイル数
+    
+    # 実行結果キャッシュ設定
+    execution_cache_ttl_seconds: int = 86400  # ジョブで未指定の場合の有効期間
+    
+    # 実行要求の合流設定
+    execution_coalesce_window_seconds: float = 0  # ジョブで未指定の場合の実行待ち時間
+    idempotency_key_ttl_seconds: int = 86400  # 冪等キーの有効期間（期限切れのキーは実行履歴の削除ワーカーが削除）
+    
+    # 実行スケジューラ設定
+    scheduler_max_concurrency: int = 0  # 全体の同時実行数の上限（0は無制限）
+    scheduler_server_max_concurrency: int = 0  # サーバで未指定の場合の同時実行数の上限（0は無制限）
+    scheduler_default_estimate_seconds: float = 60.0  # 実績のないジョブの推定実行時間
+    
+    # 定義キャッシュ設定（ジョブ・サーバの定義）
+    definition_cache_enabled: bool = True
+    definition_cache_ttl: float = 60.0  # キャッシュの有効期限（秒）
+    definition_cache_max_entries: int = 10000  # キャッシュする最大件数（超えた場合は最も古く参照したものから破棄）
+    definition_cache_channel: str = "tsubame_definition_cache"  # ワーカー間の無効化通知のチャネル（PostgreSQL）
+    definition_cache_listen_check_interval: float = 5.0  # 無効化通知の受信接続を確認する間隔（秒）
+    
+    # 実行イベント設定（ステータス変更の配信）
+    execution_events_backend: str = "auto"  # auto（PostgreSQLなら postgres）/ postgres（ワーカー間で中継）/ local（プロセス内のみ）
+    execution_events_channel: str = "tsubame_execution_events"  # ワーカー間の中継に使うチャネル（PostgreSQL）
+    execution_events_queue_size: int = 1000  # 購読者ごとにためるイベント数（超えた場合は古いものから破棄）
+    execution_events_reconnect_interval: float = 5.0  # 中継の接続を確認・再接続する間隔（秒）
+    
+    # 実行集計設定（ダッシュボードの成功率・実行時間）
+    rollup_enabled: bool = True  # 集計ワーカーを動かすか（バックフィルコマンドは無関係に使える）
+    rollup_interval: float = 10.0  # 他のワーカーで終了した実行を集計する間隔（秒）
+    rollup_delay: float = 0.5  # 実行の終了から集計までに待つ時間（同時に終了した実行をまとめる。秒）
+    rollup_batch_size: int = 1000  # 1回のトランザクションで集計する最大実行数
+    rollup_sketch_accuracy: float = 0.01  # 実行時間のパーセンタイルの相対誤差
+    
+    # 実行時間の遅延検知設定（集計ワーカーが判定）
+    duration_model_alpha: float = 0.1  # 実行時間モデルの指数移動平均の重み（大きいほど最近の実行を重視）
+    duration_regression_min_samples: int = 10  # この実行数をモデルに加えるまでは判定しない
+    duration_regression_deviation: float = 3.0  # 平均から標準偏差の何倍を超えたら遅延とするか
+    duration_regression_min_ratio: float = 1.5  # 平均の何倍未満なら遅延としない（ばらつきの小さいジョブの誤検知を防ぐ）
+    
+    # 実行履歴の保持設定（ジョブで未指定の場合。0は無制限）
+    retention_max_executions: int = 0  # ジョブごとに保持する実行履歴の件数（新しい順）
+    retention_days: int = 0  # 実行履歴を保持する日数
+    retention_interval: float = 3600.0  # 保持期間を過ぎた実行履歴を削除する間隔（秒）
+    retention_batch_size: int = 500  # 1回のトランザクションで削除する実行履歴の数（長いロックを避ける）
+    retention_batch_pause: float = 0.1  # 削除のトランザクションの間に待つ時間（秒）
+    retention_archive_dir: str = ""  # 削除する実行履歴を圧縮して保存するディレクトリ（空は保存しない）
+    
+    # ログアーカイブ設定（古い実行の出力をDBからセグメントファイルへ移す）
+    log_archive_dir: str = "./data/log-archive"  # セグメントファイルのディレクトリ（ワーカー間で共有する）
+    log_archive_after_days: int = 0  # この日数より前に終了した実行の出力を移す（0は移さない）
+    log_archive_interval: float = 600.0  # 出力を移す間隔（秒）
+    log_archive_batch_size: int = 200  # 1回のトランザクションで移す実行数
+    log_archive_block_size: int = 65536  # 圧縮するブロックのサイズ（読み込み時はこの単位で展開する）
+    log_archive_segment_size: int = 256 * 1024 * 1024  # セグメントファイルの上限サイズ
+    log_archive_compression_level: int = 6  # zlib の圧縮レベル
+    log_archive_max_open_segments: int = 64  # メモリマップを開いたままにするセグメント数
+    log_archive_compact_ratio: float = 0.5  # 参照されている部分がこの割合未満のセグメントを詰め直す（0は詰め直さない）
+    
+    # 実行状態の書き込み設定
+    execution_write_interval: float = 0.05  # 実行状態の変更をまとめて書き込む間隔（秒）
+    execution_write_batch_size: int = 500  # この実行数の変更がたまったら間隔を待たずに書き込む
+    
+    # バッチ実行設定（batch_enabled のジョブ）
+    execution_batch_window: float = 0.2  # 同じサーバへの実行をまとめるために待つ時間（秒）
+    execution_batch_max_size: int = 50  # 1バッチの最大実行数
+    
+    # 適応型同時実行数制御の設定（サーバで有効にした場合）
+    adaptive_concurrency_initial: int = 2  # 起動直後の同時実行数の上限
+    adaptive_concurrency_max: int = 32  # サーバで上限を指定しない場合の最大値
+    
+    # サーバプールの負荷収集設定
+    server_load_sample_interval: float = 15.0  # 負荷を収集する間隔（秒）
+    server_load_sample_timeout: float = 10.0  # 1サーバの収集のタイムアウト（秒）
+    server_load_max_age: float = 60.0  # これより古い収集結果は割り当てに使わない（秒）
+    server_load_min_free_memory_ratio: float = 0.05  # 空きメモリがこの割合未満のサーバは避ける
+    
+    # Webhook設定
+    webhook_secret: str = ""  # 未設定の場合はWebhookを受け付けない
+    webhook_batch_size: int = 500  # 1回にまとめて処理するイベント数
+    webhook_batch_delay: float = 1.0  # 受信後、後続のイベントを待つ時間（秒）
+    webhook_poll_interval: float = 10.0  # 他プロセスで受信したイベントを確認する間隔（秒）
+    
     model_config = SettingsConfigDict(
         env_file=".env",
         case_sensitive=False
@@ -39,6 +163,11 @@ class Settings(BaseSettings):
     def cors_origins(self) -> List[str]:
         """CORS許可オリジンをリストとして取得"""
         return [origin.strip() for origin in self.allowed_origins.split(",")]
+    
+    @property
+    def workspace_sync_exclude_list(self) -> List[str]:
+        """同期除外名をリストとして取得"""
+        return [name.strip() for name in self.workspace_sync_exclude.split(",") if name.strip()]
 
 
 # シングルトンインスタンス
@@ -2,18 +2,72 @@
 データベース接続設定
 SQLAlchemy 2.0 非同期エンジンを使用
 """
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, AsyncEngine, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
 from typing import AsyncGenerator
 
 from app.core.config import settings
+from app.core.query_stats import QueryStats, instrument_engine
 
 
+def engine_options(url: str) -> dict:
+    """
+    エンジンの作成オプション（接続プール・ステートメントキャッシュ・SQLログ）
+    
+    SQLite のインメモリDBは接続を1つしか持たないプールのため、プールの大きさは指定しない。
+    ステートメントキャッシュは asyncpg のみ指定する。
+    
+    Args:
+        url: データベースURL
+        
+    Returns:
+        create_async_engine に渡すキーワード引数
+    """
+    parsed = make_url(url)
+    options = {
+        "echo": settings.database_echo,
+        "future": True,
+        "pool_pre_ping": settings.database_pool_pre_ping,
+    }
+    if parsed.get_backend_name() != "sqlite" or parsed.database not in (None, "", ":memory:"):
+        options.update(
+            pool_size=settings.database_pool_size,
+            max_overflow=settings.database_max_overflow,
+            pool_timeout=settings.database_pool_timeout,
+            pool_recycle=settings.database_pool_recycle,
+        )
+    if parsed.get_driver_name() == "asyncpg":
+        options["connect_args"] = {
+            "statement_cache_size": settings.database_statement_cache_size,
+            "prepared_statement_cache_size": settings.database_prepared_statement_cache_size,
+        }
+    return options
+
+
+def _create_engine(url: str, stats: QueryStats) -> AsyncEngine:
+    """SQLの実行時間を計測するエンジンを作成"""
+    created = create_async_engine(url, **engine_options(url))
+    instrument_engine(created.sync_engine, stats)
+    return created
+
+
+# SQLの実行時間の統計（プライマリ・レプリカ）
+query_stats = QueryStats("primary", settings.database_slow_query_threshold)
+read_query_stats = (
+    QueryStats("replica", settings.database_slow_query_threshold)
+    if settings.database_read_url
+    else query_stats
+)
+
 # 非同期エンジンの作成
-engine = create_async_engine(
-    settings.database_url,
-    echo=settings.debug,  # デバッグモードでSQLログを出力
-    future=True,
+engine = _create_engine(settings.database_url, query_stats)
+
+# 読み取り専用エンジン（レプリカ。未設定の場合はプライマリと同じエンジン）
+read_engine = (
+    _create_engine(settings.database_read_url, read_query_stats)
+    if settings.database_read_url
+    else engine
 )
 
 # セッションファクトリ
@@ -25,6 +79,15 @@ AsyncSessionLocal = async_sessionmaker(
     autoflush=False,
 )
 
+# 読み取り専用セッションファクトリ
+AsyncReadSessionLocal = async_sessionmaker(
+    read_engine,
+    class_=AsyncSession,
+    expire_on_commit=False,
+    autocommit=False,
+    autoflush=False,
+)
+
 
 class Base(DeclarativeBase):
     """SQLAlchemyモデルのベースクラス"""
@@ -47,6 +110,43 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
             await session.close()
 
 
+async def get_read_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    読み取り専用セッション（レプリカ）の依存性注入
+    履歴・一覧の参照に使う。レプリカは遅れて反映されるため、
+    直前の変更を読む必要がある場合はプライマリのセッションを併用する
+    """
+    async with AsyncReadSessionLocal() as session:
+        try:
+            yield session
+        finally:
+            await session.close()
+
+
+def database_stats() -> list:
+    """
+    エンジンごとのSQLの実行時間の統計と接続プールの状態
+    
+    Returns:
+        プライマリ（レプリカを設定した場合はレプリカも）の統計のリスト
+    """
+    engines = [(engine, query_stats)]
+    if read_engine is not engine:
+        engines.append((read_engine, read_query_stats))
+    result = []
+    for target, stats in engines:
+        pool = target.pool
+        item = stats.snapshot()
+        item["pool"] = {
+            "status": pool.status(),
+            "size": pool.size() if hasattr(pool, "size") else None,
+            "checked_out": pool.checkedout() if hasattr(pool, "checkedout") else None,
+            "overflow": pool.overflow() if hasattr(pool, "overflow") else None,
+        }
+        result.append(item)
+    return result
+
+
 async def init_db() -> None:
     """
     データベースの初期化
@@ -0,0 +1,262 @@
+"""
+SQLの実行時間の計測
+エンジンのカーソル実行イベントで各SQLの時間を計り、件数・合計時間と遅いSQLを記録する。
+リクエストごとの計測（件数・DB時間・同じSQLの繰り返し）は QueryProfilingMiddleware で行う
+"""
+import logging
+import random
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Deque, Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+
+logger = logging.getLogger(__name__)
+
+# 記録する遅いSQLの件数（新しいものから）
+SLOW_QUERY_HISTORY = 20
+
+# ログ・記録に残すSQL文の最大長
+MAX_STATEMENT_LENGTH = 500
+
+
+def _truncate(statement: str) -> str:
+    """SQL文を1行にして最大長で切り詰める"""
+    statement = " ".join(statement.split())
+    if len(statement) > MAX_STATEMENT_LENGTH:
+        return statement[:MAX_STATEMENT_LENGTH] + "..."
+    return statement
+
+
+class QueryStats:
+    """
+    エンジンごとのSQLの実行時間の統計
+    
+    イベントはSQLを実行するスレッドから呼ばれるため、更新はロックで保護する。
+    計測はSQLごとに時刻を2回取るだけで、SQL文は遅いSQLのときだけ整形する。
+    """
+    
+    def __init__(self, name: str, slow_threshold: float):
+        self.name = name
+        self.slow_threshold = slow_threshold
+        self.count = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.slow_count = 0
+        self.slow_queries: Deque[dict] = deque(maxlen=SLOW_QUERY_HISTORY)
+        self._lock = threading.Lock()
+    
+    def record(self, statement: str, seconds: float, failed: bool = False) -> None:
+        """
+        SQLの実行時間を記録
+        
+        Args:
+            statement: SQL文
+            seconds: 実行時間（秒）
+            failed: SQLがエラーになったか
+        """
+        slow = 0 < self.slow_threshold <= seconds
+        with self._lock:
+            self.count += 1
+            self.total_seconds += seconds
+            if seconds > self.max_seconds:
+                self.max_seconds = seconds
+            if failed:
+                self.errors += 1
+            if slow:
+                self.slow_count += 1
+        if slow:
+            text = _truncate(statement)
+            self.slow_queries.append({"statement": text, "seconds": seconds, "at": time.time()})
+            logger.warning("遅いSQL（%s、%.3f秒）: %s", self.name, seconds, text)
+    
+    def snapshot(self) -> dict:
+        """
+        統計を取得
+        
+        Returns:
+            件数・エラー数・合計/平均/最大時間・遅いSQLの件数と直近の遅いSQL
+        """
+        with self._lock:
+            return {
+                "engine": self.name,
+                "count": self.count,
+                "errors": self.errors,
+                "total_seconds": self.total_seconds,
+                "mean_seconds": self.total_seconds / self.count if self.count else 0.0,
+                "max_seconds": self.max_seconds,
+                "slow_threshold": self.slow_threshold,
+                "slow_count": self.slow_count,
+                "slow_queries": list(reversed(self.slow_queries)),
+            }
+    
+    def reset(self) -> None:
+        """統計を初期化"""
+        with self._lock:
+            self.count = 0
+            self.errors = 0
+            self.total_seconds = 0.0
+            self.max_seconds = 0.0
+            self.slow_count = 0
+            self.slow_queries.clear()
+
+
+class RequestQueryProfile:
+    """
+    1リクエストで実行したSQLの計測
+    
+    SQL文はバインドパラメータを含まない形で渡されるため、同じSQL文は同じ形の
+    クエリ（値だけが異なる）とみなして回数を数える。
+    """
+    
+    __slots__ = ("count", "total_seconds", "max_seconds", "statements", "closed")
+    
+    def __init__(self):
+        self.count = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.statements: Dict[str, List[float]] = {}  # SQL文ごとの [回数, 合計時間]
+        self.closed = False
+    
+    def record(self, statement: str, seconds: float) -> None:
+        """SQLの実行時間を記録（リクエストの終了後に実行されたSQLは記録しない）"""
+        if self.closed:
+            return
+        self.count += 1
+        self.total_seconds += seconds
+        if seconds > self.max_seconds:
+            self.max_seconds = seconds
+        item = self.statements.get(statement)
+        if item is None:
+            self.statements[statement] = [1, seconds]
+        else:
+            item[0] += 1
+            item[1] += seconds
+    
+    def repeated(self, threshold: int) -> List[Tuple[str, int, float]]:
+        """
+        繰り返し実行したSQLを取得
+        
+        Args:
+            threshold: この回数以上実行したSQLを返す
+            
+        Returns:
+            (SQL文, 回数, 合計時間) のリスト（回数の多い順）
+        """
+        items = [
+            (statement, int(count), seconds)
+            for statement, (count, seconds) in self.statements.items()
+            if count >= threshold
+        ]
+        items.sort(key=lambda item: item[1], reverse=True)
+        return items
+    
+    def server_timing(self) -> str:
+        """Server-Timing ヘッダーの値"""
+        return (
+            f'db;dur={self.total_seconds * 1000:.1f};desc="{self.count} queries", '
+            f"db-max;dur={self.max_seconds * 1000:.1f}"
+        )
+
+
+# 実行中のリクエストの計測（QueryProfilingMiddleware が設定する。計測しないリクエストはNone）
+current_profile: ContextVar[Optional[RequestQueryProfile]] = ContextVar("current_query_profile", default=None)
+
+
+class QueryProfilingMiddleware:
+    """
+    リクエストごとのSQLの計測（ASGIミドルウェア）
+    
+    抽出したリクエストについて、実行したSQLの件数・DB時間をレスポンスヘッダー
+    （X-DB-Query-Count / X-DB-Time-Ms / Server-Timing）に付け、同じSQLを
+    繰り返し実行した場合（N+1クエリの可能性）は警告ログを出力する。
+    抽出しないリクエストは乱数を1回引くだけで、SQLごとの処理も増えない。
+    ヘッダーはレスポンスの開始時の値のため、ストリーミングのレスポンスでは
+    それまでに実行したSQLのみ含む（警告はレスポンスの終了後に判定する）。
+    """
+    
+    def __init__(self, app, sample_rate: float = 1.0, repeat_threshold: int = 10, headers: bool = True):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.repeat_threshold = repeat_threshold
+        self.headers = headers
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or random.random() >= self.sample_rate:
+            await self.app(scope, receive, send)
+            return
+        
+        profile = RequestQueryProfile()
+        
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start" and self.headers:
+                headers = MutableHeaders(scope=message)
+                headers.append("X-DB-Query-Count", str(profile.count))
+                headers.append("X-DB-Time-Ms", f"{profile.total_seconds * 1000:.1f}")
+                headers.append("Server-Timing", profile.server_timing())
+            await send(message)
+        
+        token = current_profile.set(profile)
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            current_profile.reset(token)
+            # リクエストから開始したタスク（ジョブの実行など）は計測を引き継ぐため、以降は記録しない
+            profile.closed = True
+            self._report(scope, profile)
+    
+    def _report(self, scope, profile: RequestQueryProfile) -> None:
+        """同じSQLを繰り返し実行したリクエストを警告"""
+        for statement, count, seconds in profile.repeated(self.repeat_threshold):
+            logger.warning(
+                "%s %s で同じSQLを %d 回実行しました（合計 %.1f ms、リクエスト全体で %d 件。N+1クエリの可能性）: %s",
+                scope["method"], scope["path"], count, seconds * 1000, profile.count, _truncate(statement)
+            )
+
+
+def instrument_engine(engine: Engine, stats: QueryStats) -> None:
+    """
+    エンジンにSQLの実行時間を計測するイベントを登録
+    
+    開始時刻は接続の info に積み、終了（またはエラー）のイベントで取り出す。
+    
+    Args:
+        engine: 同期エンジン（非同期エンジンの場合は sync_engine）
+        stats: 記録先
+    """
+    
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+    
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = _pop_started(conn.info)
+        if started is not None:
+            seconds = time.perf_counter() - started
+            stats.record(statement, seconds)
+            profile = current_profile.get()
+            if profile is not None:
+                profile.record(statement, seconds)
+    
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        conn = context.connection
+        started = _pop_started(conn.info) if conn is not None else None
+        if started is not None:
+            seconds = time.perf_counter() - started
+            stats.record(context.statement or "", seconds, failed=True)
+            profile = current_profile.get()
+            if profile is not None:
+                profile.record(context.statement or "", seconds)
+
+
+def _pop_started(info: dict) -> Optional[float]:
+    """接続に積んだ開始時刻を取り出す"""
+    stack: Optional[List[float]] = info.get("query_started_at")
+    return stack.pop() if stack else None
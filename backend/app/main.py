@@ -8,7 +8,20 @@ from contextlib import asynccontextmanager
 
 from app.core.config import settings
 from app.core.database import init_db
-from app.api.v1 import servers, jobs, executions
+from app.core.query_stats import QueryProfilingMiddleware
+from app.api.v1 import servers, server_pools, jobs, executions, pipelines, webhooks, stats
+from app.services.ssh_service import ssh_service
+from app.services.pipeline_scheduler import pipeline_scheduler
+from app.services.trigger_coalescer import trigger_coalescer
+from app.services.execution_batcher import execution_batcher
+from app.services.execution_writer import execution_writer
+from app.services.webhook_service import webhook_processor
+from app.services.server_load import server_load_sampler
+from app.services.definition_cache import definition_cache
+from app.services.execution_events import execution_events
+from app.services.rollup_service import execution_rollup_worker
+from app.services.retention_service import execution_pruner
+from app.services.log_archive import log_archiver
 
 
 @asynccontextmanager
@@ -23,10 +36,39 @@ async def lifespan(app: FastAPI):
         # 本番環境ではAlembicマイグレーションを使用
         await init_db()
     
+    # Webhookイベントの処理ワーカーを開始
+    webhook_processor.start()
+    # サーバプールのメンバーの負荷収集を開始
+    server_load_sampler.start()
+    # 他のワーカーからの定義キャッシュの無効化通知の受信を開始
+    definition_cache.start()
+    # 他のワーカーとの実行イベントの中継を開始
+    execution_events.start()
+    # 終了した実行の集計を開始
+    execution_rollup_worker.start()
+    # 保持期間を過ぎた実行履歴の削除を開始
+    execution_pruner.start()
+    # 古い実行の出力のログアーカイブへの移動を開始
+    log_archiver.start()
+    
     yield
     
     # 終了時の処理
-    pass
+    await webhook_processor.stop()
+    await execution_rollup_worker.stop()
+    await execution_pruner.stop()
+    await log_archiver.stop()
+    await server_load_sampler.stop()
+    await definition_cache.stop()
+    await execution_events.stop()
+    # 実行中のパイプラインを中断
+    await pipeline_scheduler.shutdown()
+    # 実行待ち・実行中の実行要求を中断
+    await trigger_coalescer.shutdown()
+    await execution_batcher.shutdown()
+    await execution_writer.stop()
+    # プールしているSSH接続を閉じる
+    await ssh_service.close()
 
 
 # FastAPIアプリケーションの作成
@@ -46,6 +88,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# リクエストごとのSQLの計測
+if settings.query_profiling_enabled:
+    app.add_middleware(
+        QueryProfilingMiddleware,
+        sample_rate=settings.query_profiling_sample_rate,
+        repeat_threshold=settings.query_profiling_repeat_threshold,
+        headers=settings.query_profiling_headers,
+    )
+
 
 # ルーターの登録
 app.include_router(
@@ -54,6 +105,12 @@ app.include_router(
     tags=["servers"]
 )
 
+app.include_router(
+    server_pools.router,
+    prefix=f"/api/{settings.api_version}/server-pools",
+    tags=["server-pools"]
+)
+
 app.include_router(
     jobs.router,
     prefix=f"/api/{settings.api_version}/jobs",
@@ -66,6 +123,24 @@ app.include_router(
     tags=["executions"]
 )
 
+app.include_router(
+    pipelines.router,
+    prefix=f"/api/{settings.api_version}/pipelines",
+    tags=["pipelines"]
+)
+
+app.include_router(
+    webhooks.router,
+    prefix=f"/api/{settings.api_version}/webhooks",
+    tags=["webhooks"]
+)
+
+app.include_router(
+    stats.router,
+    prefix=f"/api/{settings.api_version}/stats",
+    tags=["stats"]
+)
+
 
 @app.get("/")
 async def root():
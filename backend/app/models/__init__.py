@@ -3,13 +3,30 @@
 すべてのSQLAlchemyモデルをインポート
 """
 from app.models.server import Server, AuthMethod
+from app.models.server_pool import ServerPool
 from app.models.job import Job
-from app.models.execution import JobExecution, ExecutionStatus
+from app.models.execution import JobExecution, ExecutionStatus, ExecutionIdempotencyKey
+from app.models.execution_rollup import ExecutionRollup
+from app.models.job_duration_model import JobDurationModel
+from app.models.artifact import ExecutionArtifact
+from app.models.pipeline import Pipeline, PipelineNode, PipelineRun
+from app.models.webhook import WebhookEvent, WebhookEventStatus, WebhookProvider
 
 __all__ = [
     "Server",
     "AuthMethod",
+    "ServerPool",
     "Job",
     "JobExecution",
     "ExecutionStatus",
+    "ExecutionIdempotencyKey",
+    "ExecutionRollup",
+    "JobDurationModel",
+    "ExecutionArtifact",
+    "Pipeline",
+    "PipelineNode",
+    "PipelineRun",
+    "WebhookEvent",
+    "WebhookEventStatus",
+    "WebhookProvider",
 ]
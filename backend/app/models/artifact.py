@@ -0,0 +1,42 @@
+"""
+実行成果物モデル
+ジョブ実行後にリモートから収集したファイルを管理
+"""
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, ForeignKey
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+
+from app.core.database import Base
+
+
+class ExecutionArtifact(Base):
+    """
+    実行成果物テーブル
+    ファイルの実体は内容のSHA-256をキーにローカルストレージへ保存し、
+    同一内容のファイルは実行をまたいで共有する
+    """
+    __tablename__ = "execution_artifacts"
+    
+    # 基本情報
+    id = Column(Integer, primary_key=True, index=True)
+    execution_id = Column(
+        Integer,
+        ForeignKey("job_executions.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+        comment="実行ID"
+    )
+    
+    # ファイル情報
+    path = Column(String(1024), nullable=False, comment="リモート上のパス")
+    size = Column(BigInteger, nullable=False, comment="ファイルサイズ（バイト）")
+    sha256 = Column(String(64), nullable=False, index=True, comment="内容のSHA-256（保存先キー）")
+    
+    # タイムスタンプ
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), comment="作成日時")
+    
+    # リレーション
+    execution = relationship("JobExecution", back_populates="artifacts")
+    
+    def __repr__(self):
+        return f"<ExecutionArtifact(id={self.id}, execution_id={self.execution_id}, path={self.path})>"
@@ -2,7 +2,10 @@
 ジョブ実行履歴モデル
 ジョブの実行結果とログを管理
 """
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Enum as SQLEnum
+from sqlalchemy import (
+    Column, Integer, BigInteger, Float, String, Text, Boolean, DateTime, ForeignKey, Index, JSON,
+    Enum as SQLEnum, false, text,
+)
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
@@ -26,6 +29,24 @@ class JobExecution(Base):
     各ジョブの実行結果とログを保存
     """
     __tablename__ = "job_executions"
+    __table_args__ = (
+        # ジョブごとの最新の実行を引くためのインデックス
+        Index("ix_job_executions_job_id_id", "job_id", "id"),
+        # 集計ワーカーが未集計の終了した実行を探すための部分インデックス
+        Index(
+            "ix_job_executions_rollup_pending",
+            "id",
+            postgresql_where=text("NOT rolled_up AND finished_at IS NOT NULL"),
+            sqlite_where=text("NOT rolled_up AND finished_at IS NOT NULL"),
+        ),
+        # 遅延した実行を終了日時の範囲で探すための部分インデックス
+        Index(
+            "ix_job_executions_duration_regressed",
+            "finished_at",
+            postgresql_where=text("duration_regressed"),
+            sqlite_where=text("duration_regressed"),
+        ),
+    )
     
     # 基本情報
     id = Column(Integer, primary_key=True, index=True)
@@ -37,6 +58,30 @@ class JobExecution(Base):
         comment="ジョブID"
     )
     
+    # パイプラインから実行された場合の所属
+    pipeline_run_id = Column(
+        Integer,
+        ForeignKey("pipeline_runs.id", ondelete="CASCADE"),
+        nullable=True,
+        index=True,
+        comment="パイプライン実行ID"
+    )
+    pipeline_node_id = Column(
+        Integer,
+        ForeignKey("pipeline_nodes.id", ondelete="SET NULL"),
+        nullable=True,
+        comment="パイプラインノードID"
+    )
+    
+    # 実行したサーバ（サーバプールを実行先とするジョブでは割り当てたメンバー）
+    server_id = Column(
+        Integer,
+        ForeignKey("servers.id", ondelete="SET NULL"),
+        nullable=True,
+        index=True,
+        comment="実行したサーバID"
+    )
+    
     # 実行状態
     status = Column(
         SQLEnum(ExecutionStatus),
@@ -51,6 +96,44 @@ class JobExecution(Base):
     stdout = Column(Text, nullable=True, comment="標準出力")
     stderr = Column(Text, nullable=True, comment="標準エラー出力")
     error_message = Column(Text, nullable=True, comment="エラーメッセージ")
+    # 出力をログアーカイブ（セグメントファイル）へ移した場合のストリームごとのインデックス
+    log_archive = Column(JSON(none_as_null=True), nullable=True, comment="ログアーカイブのインデックス")
+    # 出力を書き込んだセグメント（不要になったセグメントの削除・詰め直しに使う）
+    log_segment = Column(String(255), nullable=True, index=True, comment="ログアーカイブのセグメント名")
+    log_archive_bytes = Column(Integer, nullable=True, comment="セグメント内の出力の圧縮後のバイト数")
+    
+    # スクリプトが出力したステップマーカー（::step 名前::）ごとの開始・終了日時と実行時間
+    steps = Column(JSON, nullable=True, comment="ステップのリスト")
+    
+    # 実行要求の内容（パラメータと入力）のハッシュ。実行待ちへの合流に使う
+    trigger_hash = Column(String(64), nullable=True, comment="実行要求のハッシュ")
+    
+    # 実行結果キャッシュ
+    fingerprint = Column(String(64), nullable=True, index=True, comment="実行内容のフィンガープリント")
+    cached_from_execution_id = Column(
+        Integer,
+        ForeignKey("job_executions.id", ondelete="SET NULL"),
+        nullable=True,
+        index=True,
+        comment="結果を再利用した元の実行ID"
+    )
+    
+    # バッチ実行（同じバッチの実行は1回のリモートセッションで順に実行した）
+    batch_id = Column(String(32), nullable=True, index=True, comment="バッチID")
+    
+    # ワークスペース同期の結果
+    workspace_bytes_total = Column(BigInteger, nullable=True, comment="ワークスペースの総バイト数")
+    workspace_bytes_transferred = Column(BigInteger, nullable=True, comment="同期で転送したバイト数")
+    
+    # 実行集計（execution_rollups）に加算済みか
+    rolled_up = Column(Boolean, nullable=False, default=False, server_default=false(), comment="集計済みか")
+    
+    # 実行時間の遅延検知（集計時にジョブの実行時間モデルと比べた結果）
+    duration_expected_seconds = Column(Float, nullable=True, comment="この実行の前のモデルの平均実行時間（秒）")
+    duration_deviation = Column(Float, nullable=True, comment="平均からの乖離（標準偏差の何倍か）")
+    duration_regressed = Column(
+        Boolean, nullable=False, default=False, server_default=false(), comment="遅延した実行か"
+    )
     
     # タイムスタンプ
     created_at = Column(DateTime(timezone=True), server_default=func.now(), comment="作成日時")
@@ -59,6 +142,14 @@ class JobExecution(Base):
     
     # リレーション
     job = relationship("Job", back_populates="executions")
+    pipeline_run = relationship("PipelineRun", back_populates="executions")
+    cached_from = relationship("JobExecution", remote_side=[id])
+    artifacts = relationship(
+        "ExecutionArtifact",
+        back_populates="execution",
+        cascade="all, delete-orphan",
+        passive_deletes=True
+    )
     
     def __repr__(self):
         return f"<JobExecution(id={self.id}, job_id={self.job_id}, status={self.status})>"
@@ -69,3 +160,47 @@ class JobExecution(Base):
         if self.started_at and self.finished_at:
             return (self.finished_at - self.started_at).total_seconds()
         return None
+    
+    @property
+    def log_archived(self) -> bool:
+        """出力をログアーカイブへ移したか"""
+        return self.log_archive is not None
+    
+    @property
+    def cache_hit(self) -> bool:
+        """キャッシュした結果を再利用した実行か"""
+        return self.cached_from_execution_id is not None
+    
+    @property
+    def workspace_bytes_saved(self) -> int | None:
+        """差分同期で転送を省略したバイト数"""
+        if self.workspace_bytes_total is not None and self.workspace_bytes_transferred is not None:
+            return max(self.workspace_bytes_total - self.workspace_bytes_transferred, 0)
+        return None
+
+
+class ExecutionIdempotencyKey(Base):
+    """
+    冪等キーテーブル
+    実行要求の冪等キーと、その要求に対して返した実行履歴の対応を保存
+    キーは有効期限（IDEMPOTENCY_KEY_TTL_SECONDS）まで有効で、期限切れのキーは
+    実行履歴の削除ワーカーが削除する
+    """
+    __tablename__ = "execution_idempotency_keys"
+    
+    key = Column(String(255), primary_key=True, comment="冪等キー")
+    execution_id = Column(
+        Integer,
+        ForeignKey("job_executions.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+        comment="実行ID"
+    )
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), comment="作成日時")
+    expires_at = Column(DateTime(timezone=True), nullable=True, index=True, comment="有効期限")
+    
+    # リレーション
+    execution = relationship("JobExecution")
+    
+    def __repr__(self):
+        return f"<ExecutionIdempotencyKey(key={self.key}, execution_id={self.execution_id})>"
@@ -0,0 +1,61 @@
+"""
+実行集計モデル
+ジョブ・サーバ・時間帯ごとの実行件数と実行時間の集計を管理
+"""
+from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey, JSON, Index
+from sqlalchemy.sql import func
+
+from app.core.database import Base
+
+
+class ExecutionRollup(Base):
+    """
+    実行集計テーブル
+    終了した実行をジョブ・実行したサーバ・1時間ごとの時間帯（終了日時）で集計する。
+    実行の終了後に集計ワーカーが加算するため、集計の参照で実行履歴を走査しない。
+    同じジョブ・サーバ・時間帯の行が複数ある場合（複数ワーカーが同時に作成した場合）も
+    参照時に合算するため結果は変わらない。
+    """
+    __tablename__ = "execution_rollups"
+    __table_args__ = (
+        Index("ix_execution_rollups_bucket_job", "bucket_start", "job_id"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(
+        Integer,
+        ForeignKey("jobs.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+        comment="ジョブID"
+    )
+    server_id = Column(
+        Integer,
+        ForeignKey("servers.id", ondelete="SET NULL"),
+        nullable=True,
+        index=True,
+        comment="実行したサーバID（サーバで実行しなかった実行はNone）"
+    )
+    bucket_start = Column(DateTime(timezone=True), nullable=False, comment="時間帯の開始日時（1時間ごと）")
+    
+    # ステータスごとの件数
+    total = Column(Integer, nullable=False, default=0, comment="終了した実行数")
+    success = Column(Integer, nullable=False, default=0, comment="成功した実行数")
+    failed = Column(Integer, nullable=False, default=0, comment="失敗した実行数")
+    timeout = Column(Integer, nullable=False, default=0, comment="タイムアウトした実行数")
+    cancelled = Column(Integer, nullable=False, default=0, comment="キャンセルされた実行数")
+    cached = Column(Integer, nullable=False, default=0, comment="キャッシュした結果を再利用した実行数")
+    
+    # 実行時間（キャッシュした結果を再利用した実行は含まない）
+    duration_count = Column(Integer, nullable=False, default=0, comment="実行時間を集計した実行数")
+    duration_sum = Column(Float, nullable=False, default=0.0, comment="実行時間の合計（秒）")
+    duration_max = Column(Float, nullable=True, comment="実行時間の最大（秒）")
+    duration_sketch = Column(JSON, nullable=False, default=dict, comment="実行時間のスケッチ（精度とビンごとの件数）")
+    
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), comment="更新日時")
+    
+    def __repr__(self):
+        return (
+            f"<ExecutionRollup(job_id={self.job_id}, server_id={self.server_id}, "
+            f"bucket_start={self.bucket_start}, total={self.total})>"
+        )
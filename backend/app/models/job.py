@@ -2,7 +2,7 @@
 ジョブモデル
 実行するジョブの定義を管理
 """
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, Boolean, Float, DateTime, ForeignKey, JSON
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
@@ -24,14 +24,52 @@ class Job(Base):
     # スクリプト情報
     script = Column(Text, nullable=False, comment="実行するシェルスクリプト")
     
-    # 実行先サーバ
+    # 実行後に収集する成果物（リモートのglobパターンのリスト）
+    artifact_patterns = Column(JSON, nullable=False, default=list, comment="成果物のglobパターン")
+    
+    # 実行前にリモートへ差分同期するワークスペース
+    workspace_source = Column(String(1024), nullable=True, comment="同期元ワークスペース（ローカルのパス）")
+    workspace_dest = Column(String(1024), nullable=True, comment="同期先ディレクトリ（リモートのパス）")
+    
+    # 実行結果キャッシュ（同じフィンガープリントの成功結果を再利用する）
+    cache_enabled = Column(Boolean, nullable=False, default=False, comment="実行結果キャッシュを使うか")
+    cache_ttl_seconds = Column(Integer, nullable=True, comment="キャッシュの有効期間（秒）")
+    
+    # 実行要求の合流（この時間内の同じ要求は1回の実行にまとめる）
+    coalesce_window_seconds = Column(Float, nullable=True, comment="実行待ち時間（秒）")
+    
+    # 短いジョブを同じサーバの他の実行とまとめて1回のリモートセッションで実行するか
+    batch_enabled = Column(Boolean, nullable=False, default=False, comment="バッチ実行するか")
+    
+    # スケジューリング
+    priority = Column(Integer, nullable=False, default=0, comment="優先度（大きいほど先に実行）")
+    weight = Column(Float, nullable=False, default=1.0, comment="公平キューイングの重み")
+    owner = Column(String(255), nullable=True, index=True, comment="所有者（公平に扱う単位、未指定はジョブ単位）")
+    concurrency_group = Column(String(255), nullable=True, comment="同時に1件しか実行しないグループ")
+    
+    # 実行履歴の保持（未指定は設定値。0は無制限）
+    retention_max_executions = Column(Integer, nullable=True, comment="保持する実行履歴の件数（新しい順）")
+    retention_days = Column(Integer, nullable=True, comment="実行履歴を保持する日数")
+    
+    # Webhookのpushイベントで実行する対象
+    trigger_repository = Column(String(255), nullable=True, index=True, comment="対象リポジトリ（owner/name）")
+    trigger_branch = Column(String(255), nullable=True, comment="対象ブランチ（globパターン、未指定は全ブランチ）")
+    
+    # 実行先（サーバまたはサーバプールのどちらか一方）
     server_id = Column(
         Integer,
         ForeignKey("servers.id", ondelete="CASCADE"),
-        nullable=False,
+        nullable=True,
         index=True,
         comment="実行先サーバID"
     )
+    server_pool_id = Column(
+        Integer,
+        ForeignKey("server_pools.id", ondelete="CASCADE"),
+        nullable=True,
+        index=True,
+        comment="実行先サーバプールID（実行ごとに負荷の低いメンバーに割り当てる）"
+    )
     
     # タイムスタンプ
     created_at = Column(DateTime(timezone=True), server_default=func.now(), comment="作成日時")
@@ -39,6 +77,7 @@ class Job(Base):
     
     # リレーション
     server = relationship("Server", back_populates="jobs")
+    server_pool = relationship("ServerPool", back_populates="jobs")
     executions = relationship("JobExecution", back_populates="job", cascade="all, delete-orphan")
     
     def __repr__(self):
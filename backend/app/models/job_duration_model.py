@@ -0,0 +1,38 @@
+"""
+ジョブの実行時間モデル
+ジョブごとの実行時間の指数移動平均と分散を管理
+"""
+from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey
+from sqlalchemy.sql import func
+
+from app.core.database import Base
+
+
+class JobDurationModel(Base):
+    """
+    ジョブの実行時間モデルテーブル
+    成功した実行が終了するたびに、実行時間の指数移動平均（EWMA）と分散を更新する。
+    新しい実行の実行時間をこのモデルと比べ、大きく外れた実行を遅延として記録する。
+    """
+    __tablename__ = "job_duration_models"
+    
+    job_id = Column(
+        Integer,
+        ForeignKey("jobs.id", ondelete="CASCADE"),
+        primary_key=True,
+        comment="ジョブID"
+    )
+    samples = Column(Integer, nullable=False, default=0, comment="モデルに加えた実行数")
+    mean_seconds = Column(Float, nullable=False, default=0.0, comment="実行時間の指数移動平均（秒）")
+    variance = Column(Float, nullable=False, default=0.0, comment="実行時間の指数移動分散（秒^2）")
+    last_execution_id = Column(Integer, nullable=True, comment="最後にモデルに加えた実行ID")
+    
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), comment="更新日時")
+    
+    @property
+    def stddev_seconds(self) -> float:
+        """実行時間の標準偏差（秒）"""
+        return max(self.variance or 0.0, 0.0) ** 0.5
+    
+    def __repr__(self):
+        return f"<JobDurationModel(job_id={self.job_id}, samples={self.samples}, mean={self.mean_seconds})>"
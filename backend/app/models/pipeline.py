@@ -0,0 +1,130 @@
+"""
+パイプラインモデル
+ジョブを依存関係付きで組み合わせた多段ワークフローを管理
+"""
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, JSON, Enum as SQLEnum
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+
+from app.core.database import Base
+from app.models.execution import ExecutionStatus
+
+
+class Pipeline(Base):
+    """
+    パイプラインテーブル
+    ジョブをノードとする有向非巡回グラフ（DAG）の定義を保存
+    """
+    __tablename__ = "pipelines"
+    
+    # 基本情報
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(255), nullable=False, index=True, comment="パイプライン名")
+    description = Column(String(500), nullable=True, comment="パイプラインの説明")
+    
+    # 実行設定
+    max_parallel = Column(Integer, nullable=False, default=4, comment="同時に実行するノード数の上限")
+    
+    # タイムスタンプ
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), comment="作成日時")
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now(), comment="更新日時")
+    
+    # リレーション
+    nodes = relationship(
+        "PipelineNode",
+        back_populates="pipeline",
+        cascade="all, delete-orphan",
+        order_by="PipelineNode.id"
+    )
+    runs = relationship("PipelineRun", back_populates="pipeline", cascade="all, delete-orphan")
+    
+    def __repr__(self):
+        return f"<Pipeline(id={self.id}, name={self.name})>"
+
+
+class PipelineNode(Base):
+    """
+    パイプラインノードテーブル
+    DAGの各ノード（実行するジョブと、先に成功している必要があるノード）を保存
+    """
+    __tablename__ = "pipeline_nodes"
+    
+    # 基本情報
+    id = Column(Integer, primary_key=True, index=True)
+    pipeline_id = Column(
+        Integer,
+        ForeignKey("pipelines.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+        comment="パイプラインID"
+    )
+    name = Column(String(255), nullable=False, comment="ノード名（パイプライン内で一意）")
+    job_id = Column(
+        Integer,
+        ForeignKey("jobs.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+        comment="実行するジョブID"
+    )
+    depends_on = Column(JSON, nullable=False, default=list, comment="依存するノード名のリスト")
+    
+    # リレーション
+    pipeline = relationship("Pipeline", back_populates="nodes")
+    job = relationship("Job")
+    
+    def __repr__(self):
+        return f"<PipelineNode(id={self.id}, name={self.name}, job_id={self.job_id})>"
+
+
+class PipelineRun(Base):
+    """
+    パイプライン実行テーブル
+    パイプライン1回分の実行状態とクリティカルパスを保存
+    """
+    __tablename__ = "pipeline_runs"
+    
+    # 基本情報
+    id = Column(Integer, primary_key=True, index=True)
+    pipeline_id = Column(
+        Integer,
+        ForeignKey("pipelines.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+        comment="パイプラインID"
+    )
+    
+    # 実行状態
+    status = Column(
+        SQLEnum(ExecutionStatus),
+        nullable=False,
+        default=ExecutionStatus.PENDING,
+        index=True,
+        comment="実行ステータス"
+    )
+    
+    # クリティカルパス（実行時間が最長となる依存経路）
+    critical_path = Column(JSON, nullable=True, comment="クリティカルパス上のノード名のリスト")
+    critical_path_seconds = Column(Float, nullable=True, comment="クリティカルパスの所要時間（秒）")
+    
+    # タイムスタンプ
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), comment="作成日時")
+    started_at = Column(DateTime(timezone=True), nullable=True, comment="実行開始日時")
+    finished_at = Column(DateTime(timezone=True), nullable=True, comment="実行終了日時")
+    
+    # リレーション
+    pipeline = relationship("Pipeline", back_populates="runs")
+    executions = relationship(
+        "JobExecution",
+        back_populates="pipeline_run",
+        order_by="JobExecution.id"
+    )
+    
+    def __repr__(self):
+        return f"<PipelineRun(id={self.id}, pipeline_id={self.pipeline_id}, status={self.status})>"
+    
+    @property
+    def duration_seconds(self) -> float | None:
+        """実行時間を秒で取得"""
+        if self.started_at and self.finished_at:
+            return (self.finished_at - self.started_at).total_seconds()
+        return None
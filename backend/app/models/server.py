@@ -2,7 +2,7 @@
 サーバモデル
 SSH接続先サーバの情報を管理
 """
-from sqlalchemy import Column, Integer, String, DateTime, Enum as SQLEnum
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Enum as SQLEnum
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
@@ -43,12 +43,39 @@ class Server(Base):
     password_encrypted = Column(String(500), nullable=True, comment="暗号化されたパスワード")
     private_key_encrypted = Column(String(5000), nullable=True, comment="暗号化された秘密鍵")
     
+    # 踏み台サーバ（このサーバへはジャンプホスト経由で接続する）
+    jump_server_id = Column(
+        Integer,
+        ForeignKey("servers.id", ondelete="SET NULL"),
+        nullable=True,
+        index=True,
+        comment="踏み台サーバID"
+    )
+    
+    # 所属するサーバプール（プールを実行先とするジョブの割り当て候補になる）
+    pool_id = Column(
+        Integer,
+        ForeignKey("server_pools.id", ondelete="SET NULL"),
+        nullable=True,
+        index=True,
+        comment="サーバプールID"
+    )
+    
+    # 同時実行数の上限（未指定の場合は設定の既定値）
+    # 適応型制御を有効にした場合は min_concurrency〜max_concurrency の範囲で自動調整する
+    max_concurrency = Column(Integer, nullable=True, comment="同時実行数の上限")
+    min_concurrency = Column(Integer, nullable=True, comment="適応型制御での同時実行数の下限")
+    adaptive_concurrency = Column(Boolean, nullable=False, default=False, comment="同時実行数を自動調整するか")
+    
     # タイムスタンプ
     created_at = Column(DateTime(timezone=True), server_default=func.now(), comment="作成日時")
     updated_at = Column(DateTime(timezone=True), onupdate=func.now(), comment="更新日時")
     
     # リレーション
     jobs = relationship("Job", back_populates="server", cascade="all, delete-orphan")
+    pool = relationship("ServerPool", back_populates="servers")
+    # 接続時に必ず参照するため常に一緒に読み込む（踏み台は1段のみ）
+    jump_server = relationship("Server", remote_side=[id], lazy="selectin", join_depth=2)
     
     def __repr__(self):
         return f"<Server(id={self.id}, name={self.name}, host={self.host})>"
@@ -0,0 +1,39 @@
+"""
+サーバプールモデル
+互いに置き換え可能なサーバのグループを管理
+"""
+from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+
+from app.core.database import Base
+
+
+class ServerPool(Base):
+    """
+    サーバプールテーブル
+    プールを実行先とするジョブは、実行のたびに負荷の低いメンバーに割り当てる
+    """
+    __tablename__ = "server_pools"
+    
+    # 基本情報
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(255), nullable=False, unique=True, comment="プール名")
+    description = Column(String(500), nullable=True, comment="プールの説明")
+    
+    # タイムスタンプ
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), comment="作成日時")
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now(), comment="更新日時")
+    
+    # リレーション
+    # 割り当て先の候補として常に参照するため一緒に読み込む
+    servers = relationship("Server", back_populates="pool", lazy="selectin", order_by="Server.id")
+    jobs = relationship("Job", back_populates="server_pool", cascade="all, delete-orphan")
+    
+    @property
+    def server_ids(self) -> list[int]:
+        """メンバーのサーバIDのリスト"""
+        return [server.id for server in self.servers]
+    
+    def __repr__(self):
+        return f"<ServerPool(id={self.id}, name={self.name})>"
@@ -0,0 +1,61 @@
+"""
+Webhookイベントモデル
+受信したWebhookイベントと処理状態を管理
+"""
+from sqlalchemy import Column, Integer, String, Text, DateTime, JSON, UniqueConstraint, Enum as SQLEnum
+from sqlalchemy.sql import func
+import enum
+
+from app.core.database import Base
+
+
+class WebhookProvider(str, enum.Enum):
+    """Webhookの送信元"""
+    GITHUB = "github"
+    GITEA = "gitea"
+    GITLAB = "gitlab"
+
+
+class WebhookEventStatus(str, enum.Enum):
+    """Webhookイベントの処理ステータス"""
+    PENDING = "pending"      # 処理待ち
+    PROCESSED = "processed"  # ジョブの実行を予約済み
+    IGNORED = "ignored"      # 対象外（push以外・対応するジョブなし）
+    FAILED = "failed"        # 処理失敗
+
+
+class WebhookEvent(Base):
+    """
+    Webhookイベントテーブル
+    受信時は生のイベントを1件挿入するだけにし、ジョブへの対応付けは後でまとめて行う
+    """
+    __tablename__ = "webhook_events"
+    __table_args__ = (
+        # 送信元の再送による重複を除く
+        UniqueConstraint("provider", "delivery_id", name="uq_webhook_events_delivery"),
+    )
+    
+    # 基本情報
+    id = Column(Integer, primary_key=True, index=True)
+    provider = Column(SQLEnum(WebhookProvider), nullable=False, comment="送信元")
+    event_type = Column(String(100), nullable=True, comment="イベント種別")
+    delivery_id = Column(String(255), nullable=True, comment="送信元の配信ID")
+    payload = Column(Text, nullable=False, comment="受信したリクエストボディ")
+    
+    # 処理状態
+    status = Column(
+        SQLEnum(WebhookEventStatus),
+        nullable=False,
+        default=WebhookEventStatus.PENDING,
+        index=True,
+        comment="処理ステータス"
+    )
+    execution_ids = Column(JSON, nullable=True, comment="予約した実行IDのリスト")
+    error_message = Column(Text, nullable=True, comment="エラーメッセージ")
+    
+    # タイムスタンプ
+    received_at = Column(DateTime(timezone=True), server_default=func.now(), comment="受信日時")
+    processed_at = Column(DateTime(timezone=True), nullable=True, comment="処理日時")
+    
+    def __repr__(self):
+        return f"<WebhookEvent(id={self.id}, provider={self.provider}, status={self.status})>"
@@ -0,0 +1,19 @@
+"""
+実行成果物スキーマ
+API リクエスト/レスポンスの型定義
+"""
+from pydantic import BaseModel, ConfigDict
+from datetime import datetime
+
+
+# レスポンススキーマ
+class ArtifactResponse(BaseModel):
+    """実行成果物のレスポンス"""
+    id: int
+    execution_id: int
+    path: str
+    size: int
+    sha256: str
+    created_at: datetime
+    
+    model_config = ConfigDict(from_attributes=True)
@@ -2,27 +2,57 @@
 ジョブ実行履歴スキーマ
 API リクエスト/レスポンスの型定義
 """
-from pydantic import BaseModel, Field, ConfigDict
-from typing import Optional
+from pydantic import BaseModel, Field, ConfigDict, field_validator
+from typing import Optional, Dict, List
 from datetime import datetime
+import re
 
 from app.models.execution import ExecutionStatus
 
 
+# パラメータ名（環境変数名）の形式
+PARAMETER_NAME_PATTERN = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+
+
+# ステップ
+class ExecutionStep(BaseModel):
+    """スクリプトが出力したステップマーカー（::step 名前::）で区切ったステップ"""
+    name: str
+    started_at: datetime
+    finished_at: Optional[datetime] = Field(None, description="終了日時（実行中のステップはNone）")
+    duration_seconds: Optional[float] = None
+
+
 # レスポンススキーマ
 class ExecutionResponse(BaseModel):
     """ジョブ実行履歴のレスポンス"""
     id: int
     job_id: int
+    pipeline_run_id: Optional[int] = None
+    pipeline_node_id: Optional[int] = None
+    server_id: Optional[int] = Field(None, description="実行したサーバID（実行開始時に記録）")
     status: ExecutionStatus
     exit_code: Optional[int] = None
     stdout: Optional[str] = None
     stderr: Optional[str] = None
     error_message: Optional[str] = None
+    log_archived: bool = Field(False, description="出力をログアーカイブへ移したか（一覧では出力を返さない）")
     created_at: datetime
     started_at: Optional[datetime] = None
     finished_at: Optional[datetime] = None
     duration_seconds: Optional[float] = None
+    steps: Optional[List[ExecutionStep]] = Field(
+        None, description="ステップのタイムライン（出力の順。ステップマーカーを出力しなかった実行はNone）"
+    )
+    fingerprint: Optional[str] = None
+    cached_from_execution_id: Optional[int] = None
+    cache_hit: bool = False
+    batch_id: Optional[str] = Field(None, description="バッチ実行した場合のバッチID")
+    queue_position: Optional[int] = Field(None, description="実行待ちの順番（1始まり）")
+    estimated_start_at: Optional[datetime] = Field(None, description="開始予定時刻（概算）")
+    workspace_bytes_total: Optional[int] = None
+    workspace_bytes_transferred: Optional[int] = None
+    workspace_bytes_saved: Optional[int] = None
     
     model_config = ConfigDict(from_attributes=True)
 
@@ -39,6 +69,53 @@ class ExecutionWithJobResponse(ExecutionResponse):
 class ExecutionCreateRequest(BaseModel):
     """ジョブ実行リクエスト"""
     job_id: int = Field(..., gt=0, description="実行するジョブID")
+    parameters: Dict[str, str] = Field(
+        default_factory=dict,
+        description="パラメータ（環境変数としてスクリプトに渡す）"
+    )
+    input_hashes: Dict[str, str] = Field(
+        default_factory=dict,
+        description="入力（ファイル・依存物など）の名前とハッシュ値。キャッシュのフィンガープリントに含める"
+    )
+    
+    @field_validator("parameters")
+    @classmethod
+    def validate_parameter_names(cls, value: Dict[str, str]) -> Dict[str, str]:
+        """パラメータ名は環境変数名として使える形式に限る"""
+        for name in value:
+            if not PARAMETER_NAME_PATTERN.fullmatch(name):
+                raise ValueError(f"パラメータ名が不正です: {name}")
+        return value
+
+
+# 実行結果キャッシュの統計
+class CacheStatsResponse(BaseModel):
+    """実行結果キャッシュの統計"""
+    executions: int = Field(..., description="キャッシュ対象の実行数")
+    hits: int = Field(..., description="キャッシュを再利用した実行数")
+    hit_rate: float = Field(..., description="ヒット率（0〜1）")
+    saved_seconds: float = Field(..., description="再実行を省略したことで節約した実行時間（秒）")
+
+
+# 実行履歴の削除の結果
+class RetentionReport(BaseModel):
+    """保持期間を過ぎた実行履歴の削除の結果"""
+    started_at: datetime
+    finished_at: Optional[datetime] = None
+    deleted_executions: int = Field(..., description="削除した実行履歴の数")
+    bytes_reclaimed: int = Field(..., description="削除した出力（ログアーカイブへ移した出力を含む）・エラーメッセージの量（バイト、概算）")
+    archived_files: List[str] = Field(default_factory=list, description="削除する前に保存したファイル")
+    archived_bytes: int = Field(0, description="保存したファイルの合計バイト数（圧縮後）")
+    deleted_idempotency_keys: int = Field(0, description="削除した期限切れの冪等キーの数")
+
+
+class RetentionStatsResponse(BaseModel):
+    """実行履歴の削除の統計（このワーカーが起動してから）"""
+    last_run: Optional[RetentionReport] = Field(None, description="前回の削除の結果")
+    total_deleted_executions: int
+    total_bytes_reclaimed: int
+    total_archived_bytes: int
+    total_deleted_idempotency_keys: int = 0
 
 
 # WebSocketメッセージ
@@ -53,6 +130,7 @@ class ExecutionStatusMessage(BaseModel):
     """WebSocketで送信するステータス更新メッセージ"""
     type: str = Field(default="status", description="メッセージタイプ")
     execution_id: int
+    job_id: Optional[int] = None
     status: ExecutionStatus
     exit_code: Optional[int] = None
     timestamp: datetime = Field(default_factory=datetime.utcnow, description="タイムスタンプ")
@@ -2,10 +2,12 @@
 ジョブスキーマ
 API リクエスト/レスポンスの型定義
 """
-from pydantic import BaseModel, Field, ConfigDict
-from typing import Optional
+from pydantic import BaseModel, Field, ConfigDict, field_validator, model_validator
+from typing import Optional, List
 from datetime import datetime
 
+from app.models.execution import ExecutionStatus
+
 
 # 基本スキーマ
 class JobBase(BaseModel):
@@ -13,13 +15,65 @@ class JobBase(BaseModel):
     name: str = Field(..., min_length=1, max_length=255, description="ジョブ名")
     description: Optional[str] = Field(None, max_length=500, description="ジョブの説明")
     script: str = Field(..., min_length=1, description="実行するシェルスクリプト")
-    server_id: int = Field(..., gt=0, description="実行先サーバID")
+    server_id: Optional[int] = Field(None, gt=0, description="実行先サーバID")
+    server_pool_id: Optional[int] = Field(
+        None, gt=0, description="実行先サーバプールID（実行ごとに負荷の低いメンバーに割り当てる）"
+    )
+    artifact_patterns: List[str] = Field(
+        default_factory=list,
+        description="実行後に収集する成果物のglobパターン（リモートのホームディレクトリ基準）"
+    )
+    workspace_source: Optional[str] = Field(
+        None, max_length=1024, description="実行前に同期するワークスペース（ローカルのパス）"
+    )
+    workspace_dest: Optional[str] = Field(
+        None, max_length=1024, description="ワークスペースの同期先ディレクトリ（リモートのパス）"
+    )
+    cache_enabled: bool = Field(
+        False, description="同じ内容で成功した実行結果があれば再実行せずに再利用する"
+    )
+    cache_ttl_seconds: Optional[int] = Field(
+        None, ge=1, description="キャッシュの有効期間（秒）、未指定の場合は既定値"
+    )
+    coalesce_window_seconds: Optional[float] = Field(
+        None, ge=0, le=3600,
+        description="実行要求から実行開始までの待ち時間（秒）。この間の同じ要求は1回の実行にまとめる"
+    )
+    batch_enabled: bool = Field(
+        False, description="同じサーバへの実行とまとめて1回のリモートセッションで実行する（短いジョブ向け）"
+    )
+    priority: int = Field(0, ge=-100, le=100, description="優先度（大きいほど先に実行）")
+    weight: float = Field(1.0, gt=0, le=100, description="同じ優先度の実行の間で公平に割り当てる際の重み")
+    owner: Optional[str] = Field(
+        None, max_length=255, description="所有者（同じ所有者のジョブをまとめて公平に扱う、未指定はジョブ単位）"
+    )
+    concurrency_group: Optional[str] = Field(
+        None, max_length=255, description="同時実行グループ（同じグループの実行は同時に1件のみ）"
+    )
+    retention_max_executions: Optional[int] = Field(
+        None, ge=0, description="保持する実行履歴の件数（新しい順。未指定は設定値、0は無制限）"
+    )
+    retention_days: Optional[int] = Field(
+        None, ge=0, description="実行履歴を保持する日数（未指定は設定値、0は無制限）"
+    )
+    trigger_repository: Optional[str] = Field(
+        None, max_length=255, description="Webhookのpushで実行するリポジトリ（owner/name）"
+    )
+    trigger_branch: Optional[str] = Field(
+        None, max_length=255, description="Webhookのpushで実行するブランチ（globパターン、未指定は全ブランチ）"
+    )
 
 
 # 作成時のスキーマ
 class JobCreate(JobBase):
     """ジョブ作成時のリクエストボディ"""
-    pass
+    
+    @model_validator(mode="after")
+    def validate_target(self) -> "JobCreate":
+        """実行先はサーバとサーバプールのどちらか一方のみ指定する"""
+        if (self.server_id is None) == (self.server_pool_id is None):
+            raise ValueError("server_id と server_pool_id のどちらか一方を指定してください")
+        return self
 
 
 # 更新時のスキーマ
@@ -29,6 +83,47 @@ class JobUpdate(BaseModel):
     description: Optional[str] = Field(None, max_length=500)
     script: Optional[str] = Field(None, min_length=1)
     server_id: Optional[int] = Field(None, gt=0)
+    server_pool_id: Optional[int] = Field(None, gt=0)
+    artifact_patterns: Optional[List[str]] = None
+    workspace_source: Optional[str] = Field(None, max_length=1024)
+    workspace_dest: Optional[str] = Field(None, max_length=1024)
+    cache_enabled: Optional[bool] = None
+    cache_ttl_seconds: Optional[int] = Field(None, ge=1)
+    coalesce_window_seconds: Optional[float] = Field(None, ge=0, le=3600)
+    batch_enabled: Optional[bool] = None
+    priority: Optional[int] = Field(None, ge=-100, le=100)
+    weight: Optional[float] = Field(None, gt=0, le=100)
+    owner: Optional[str] = Field(None, max_length=255)
+    concurrency_group: Optional[str] = Field(None, max_length=255)
+    retention_max_executions: Optional[int] = Field(None, ge=0)
+    retention_days: Optional[int] = Field(None, ge=0)
+    trigger_repository: Optional[str] = Field(None, max_length=255)
+    trigger_branch: Optional[str] = Field(None, max_length=255)
+    
+    @field_validator("artifact_patterns", mode="before")
+    @classmethod
+    def clear_artifact_patterns(cls, value):
+        """null は成果物のパターンをすべて外す指定として空のリストにする"""
+        return [] if value is None else value
+    
+    @field_validator("name", "script", "cache_enabled", "batch_enabled", "priority", "weight")
+    @classmethod
+    def reject_null(cls, value):
+        """省略できるが null にはできない項目（指定した場合のみ検証される）"""
+        if value is None:
+            raise ValueError("null は指定できません")
+        return value
+
+
+# 最新の実行の概要
+class LastExecutionSummary(BaseModel):
+    """ジョブの最新の実行の概要"""
+    id: int
+    status: ExecutionStatus
+    exit_code: Optional[int] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
 
 
 # レスポンススキーマ
@@ -37,6 +132,9 @@ class JobResponse(JobBase):
     id: int
     created_at: datetime
     updated_at: Optional[datetime] = None
+    last_execution: Optional[LastExecutionSummary] = Field(
+        None, description="最新の実行の概要（include=last_execution を指定した場合のみ。実行がなければNone）"
+    )
     
     model_config = ConfigDict(from_attributes=True)
 
@@ -44,6 +142,17 @@ class JobResponse(JobBase):
 # サーバ情報を含むレスポンス
 class JobWithServerResponse(JobResponse):
     """サーバ情報を含むジョブレスポンス"""
-    server: dict = Field(..., description="サーバ情報")
+    server: Optional[dict] = Field(None, description="サーバ情報（サーバプールを実行先とする場合はNone）")
     
     model_config = ConfigDict(from_attributes=True)
+
+
+# 定義キャッシュの統計
+class DefinitionCacheStatsResponse(BaseModel):
+    """定義キャッシュ（ジョブ・サーバ）の統計（このワーカーの起動後の累計）"""
+    kind: str = Field(..., description="定義の種類: job, server")
+    hits: int = Field(..., description="キャッシュから取得した回数")
+    misses: int = Field(..., description="データベースから読み込んだ回数")
+    hit_rate: float = Field(..., description="ヒット率（0〜1）")
+    invalidations: int = Field(..., description="無効化の回数")
+    entries: int = Field(..., description="キャッシュしている件数")
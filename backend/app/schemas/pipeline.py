@@ -0,0 +1,76 @@
+"""
+パイプラインスキーマ
+API リクエスト/レスポンスの型定義
+"""
+from pydantic import BaseModel, Field, ConfigDict
+from typing import Optional, List
+from datetime import datetime
+
+from app.models.execution import ExecutionStatus
+from app.schemas.execution import ExecutionResponse
+
+
+# ノードスキーマ
+class PipelineNodeBase(BaseModel):
+    """パイプラインノードの基本情報"""
+    name: str = Field(..., min_length=1, max_length=255, description="ノード名（パイプライン内で一意）")
+    job_id: int = Field(..., gt=0, description="実行するジョブID")
+    depends_on: List[str] = Field(default_factory=list, description="先に成功している必要があるノード名")
+
+
+class PipelineNodeResponse(PipelineNodeBase):
+    """パイプラインノードのレスポンス"""
+    id: int
+    
+    model_config = ConfigDict(from_attributes=True)
+
+
+# 基本スキーマ
+class PipelineBase(BaseModel):
+    """パイプラインの基本情報"""
+    name: str = Field(..., min_length=1, max_length=255, description="パイプライン名")
+    description: Optional[str] = Field(None, max_length=500, description="パイプラインの説明")
+    max_parallel: int = Field(4, ge=1, le=100, description="同時に実行するノード数の上限")
+
+
+# 作成時のスキーマ
+class PipelineCreate(PipelineBase):
+    """パイプライン作成時のリクエストボディ"""
+    nodes: List[PipelineNodeBase] = Field(..., min_length=1, description="ノードのリスト")
+
+
+# 更新時のスキーマ
+class PipelineUpdate(BaseModel):
+    """パイプライン更新時のリクエストボディ（nodes 指定時は全ノードを置き換える）"""
+    name: Optional[str] = Field(None, min_length=1, max_length=255)
+    description: Optional[str] = Field(None, max_length=500)
+    max_parallel: Optional[int] = Field(None, ge=1, le=100)
+    nodes: Optional[List[PipelineNodeBase]] = Field(None, min_length=1)
+
+
+# レスポンススキーマ
+class PipelineResponse(PipelineBase):
+    """パイプライン情報のレスポンス"""
+    id: int
+    nodes: List[PipelineNodeResponse]
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+    
+    model_config = ConfigDict(from_attributes=True)
+
+
+# 実行スキーマ
+class PipelineRunResponse(BaseModel):
+    """パイプライン実行のレスポンス"""
+    id: int
+    pipeline_id: int
+    status: ExecutionStatus
+    critical_path: Optional[List[str]] = None
+    critical_path_seconds: Optional[float] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    duration_seconds: Optional[float] = None
+    executions: List[ExecutionResponse] = Field(default_factory=list, description="ノードごとの実行履歴")
+    
+    model_config = ConfigDict(from_attributes=True)
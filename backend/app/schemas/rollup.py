@@ -0,0 +1,79 @@
+"""
+実行集計スキーマ
+API リクエスト/レスポンスの型定義
+"""
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from datetime import datetime
+
+from app.models.execution import ExecutionStatus
+
+
+class RollupStats(BaseModel):
+    """時間帯ごとの実行件数・成功率・実行時間"""
+    bucket_start: datetime = Field(..., description="時間帯の開始日時（UTC）")
+    total: int = Field(..., description="終了した実行数")
+    success: int = Field(..., description="成功した実行数")
+    failed: int = Field(..., description="失敗した実行数")
+    timeout: int = Field(..., description="タイムアウトした実行数")
+    cancelled: int = Field(..., description="キャンセルされた実行数")
+    cached: int = Field(..., description="キャッシュした結果を再利用した実行数")
+    success_rate: Optional[float] = Field(None, description="成功率（0〜1）")
+    duration_avg: Optional[float] = Field(None, description="平均実行時間（秒）")
+    duration_p50: Optional[float] = Field(None, description="実行時間の中央値（秒）")
+    duration_p95: Optional[float] = Field(None, description="実行時間の95パーセンタイル（秒）")
+    duration_p99: Optional[float] = Field(None, description="実行時間の99パーセンタイル（秒）")
+    duration_max: Optional[float] = Field(None, description="最大実行時間（秒）")
+
+
+class JobRollupStats(RollupStats):
+    """ジョブ・時間帯ごとの集計"""
+    job_id: int
+
+
+class ServerRollupStats(RollupStats):
+    """実行したサーバ・時間帯ごとの集計"""
+    server_id: Optional[int] = Field(None, description="サーバID（サーバで実行しなかった実行はNone）")
+
+
+class DurationRegression(BaseModel):
+    """実行時間が遅延した実行"""
+    execution_id: int
+    job_id: int
+    server_id: Optional[int] = None
+    status: ExecutionStatus
+    started_at: datetime
+    finished_at: datetime
+    duration_seconds: float = Field(..., description="実行時間（秒）")
+    expected_seconds: Optional[float] = Field(None, description="この実行の前のジョブの平均実行時間（秒）")
+    deviation: Optional[float] = Field(None, description="平均からの乖離（標準偏差の何倍か）")
+    slowdown: Optional[float] = Field(None, description="平均の何倍かかったか")
+
+
+class SlowQuery(BaseModel):
+    """遅いSQL"""
+    statement: str = Field(..., description="SQL文（最大500文字）")
+    seconds: float = Field(..., description="実行時間（秒）")
+    at: float = Field(..., description="実行した時刻（UNIX時刻）")
+
+
+class DatabasePoolStatus(BaseModel):
+    """接続プールの状態"""
+    status: str
+    size: Optional[int] = Field(None, description="プールに保持する接続数")
+    checked_out: Optional[int] = Field(None, description="貸し出し中の接続数")
+    overflow: Optional[int] = Field(None, description="プールを超えて開いている接続数（負の値は未作成の枠）")
+
+
+class DatabaseStats(BaseModel):
+    """エンジンのSQLの実行時間の統計（このワーカーが起動してから）"""
+    engine: str = Field(..., description="primary または replica")
+    count: int = Field(..., description="実行したSQLの数")
+    errors: int = Field(..., description="エラーになったSQLの数")
+    total_seconds: float
+    mean_seconds: float
+    max_seconds: float
+    slow_threshold: float = Field(..., description="遅いSQLとして記録する秒数（0は無効）")
+    slow_count: int
+    slow_queries: List[SlowQuery] = Field(default_factory=list, description="直近の遅いSQL（新しい順）")
+    pool: DatabasePoolStatus
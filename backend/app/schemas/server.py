@@ -18,6 +18,12 @@ class ServerBase(BaseModel):
     port: int = Field(22, ge=1, le=65535, description="SSHポート")
     username: str = Field(..., min_length=1, max_length=255, description="SSHユーザー名")
     auth_method: AuthMethod = Field(..., description="認証方式")
+    jump_server_id: Optional[int] = Field(None, gt=0, description="踏み台サーバID（直接接続の場合はNone）")
+    max_concurrency: Optional[int] = Field(None, ge=1, le=1000, description="同時実行数の上限（未指定の場合は既定値）")
+    min_concurrency: Optional[int] = Field(None, ge=1, le=1000, description="適応型制御での同時実行数の下限")
+    adaptive_concurrency: bool = Field(
+        False, description="接続時間・エラー・実行時間の伸びから同時実行数を自動調整する"
+    )
 
 
 # 作成時のスキーマ
@@ -36,6 +42,10 @@ class ServerUpdate(BaseModel):
     port: Optional[int] = Field(None, ge=1, le=65535)
     username: Optional[str] = Field(None, min_length=1, max_length=255)
     auth_method: Optional[AuthMethod] = None
+    jump_server_id: Optional[int] = Field(None, gt=0, description="踏み台サーバID（Noneで直接接続に戻す）")
+    max_concurrency: Optional[int] = Field(None, ge=1, le=1000)
+    min_concurrency: Optional[int] = Field(None, ge=1, le=1000)
+    adaptive_concurrency: Optional[bool] = None
     password: Optional[str] = Field(None, description="新しいパスワード")
     private_key: Optional[str] = Field(None, description="新しい秘密鍵")
 
@@ -44,12 +54,31 @@ class ServerUpdate(BaseModel):
 class ServerResponse(ServerBase):
     """サーバ情報のレスポンス"""
     id: int
+    pool_id: Optional[int] = Field(None, description="所属するサーバプールID")
     created_at: datetime
     updated_at: Optional[datetime] = None
     
     model_config = ConfigDict(from_attributes=True)
 
 
+# 同時実行数の状態
+class ServerConcurrencyResponse(BaseModel):
+    """サーバの同時実行数の状態"""
+    server_id: int
+    name: str
+    host: str
+    adaptive: bool = Field(..., description="適応型制御が有効か")
+    limit: Optional[int] = Field(None, description="現在の同時実行数の上限（Noneは無制限）")
+    floor: Optional[int] = Field(None, description="適応型制御の下限")
+    ceiling: Optional[int] = Field(None, description="適応型制御の上限")
+    running: int = Field(..., description="実行中の件数")
+    baseline_connect_seconds: Optional[float] = Field(None, description="基準となる接続時間（秒）")
+    last_connect_seconds: Optional[float] = Field(None, description="直近の接続時間（秒）")
+    successes: int = 0
+    errors: int = 0
+    decreases: int = Field(0, description="上限を下げた回数")
+
+
 # SSH接続テスト用スキーマ
 class ServerTestRequest(BaseModel):
     """SSH接続テストリクエスト"""
@@ -59,6 +88,7 @@ class ServerTestRequest(BaseModel):
     auth_method: AuthMethod
     password: Optional[str] = None
     private_key: Optional[str] = None
+    jump_server_id: Optional[int] = Field(None, gt=0, description="経由する踏み台サーバID")
 
 
 class ServerTestResponse(BaseModel):
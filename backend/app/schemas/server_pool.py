@@ -0,0 +1,59 @@
+"""
+サーバプールスキーマ
+API リクエスト/レスポンスの型定義
+"""
+from pydantic import BaseModel, Field, ConfigDict
+from typing import Optional, List
+from datetime import datetime
+
+
+# 基本スキーマ
+class ServerPoolBase(BaseModel):
+    """サーバプールの基本情報"""
+    name: str = Field(..., min_length=1, max_length=255, description="プール名")
+    description: Optional[str] = Field(None, max_length=500, description="プールの説明")
+
+
+# 作成時のスキーマ
+class ServerPoolCreate(ServerPoolBase):
+    """サーバプール作成時のリクエストボディ"""
+    server_ids: List[int] = Field(
+        default_factory=list,
+        description="メンバーのサーバID（他のプールに所属しているサーバはこのプールに移る）"
+    )
+
+
+# 更新時のスキーマ
+class ServerPoolUpdate(BaseModel):
+    """サーバプール更新時のリクエストボディ"""
+    name: Optional[str] = Field(None, min_length=1, max_length=255)
+    description: Optional[str] = Field(None, max_length=500)
+    server_ids: Optional[List[int]] = Field(None, description="メンバーのサーバID（指定した場合は置き換える）")
+
+
+# レスポンススキーマ
+class ServerPoolResponse(ServerPoolBase):
+    """サーバプール情報のレスポンス"""
+    id: int
+    server_ids: List[int] = Field(default_factory=list, description="メンバーのサーバID")
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+    
+    model_config = ConfigDict(from_attributes=True)
+
+
+# メンバーの負荷
+class ServerPoolMemberLoad(BaseModel):
+    """サーバプールのメンバーの負荷"""
+    server_id: int
+    name: str
+    host: str
+    queued: int = Field(..., description="割り当て済みの件数（実行中と開始待ち）")
+    running: int = Field(..., description="実行中の件数")
+    capacity: Optional[int] = Field(None, description="同時実行数の上限（Noneは未指定）")
+    load1: Optional[float] = Field(None, description="ロードアベレージ（1分）")
+    cpus: Optional[int] = Field(None, description="CPU数")
+    memory_available_ratio: Optional[float] = Field(None, description="空きメモリの割合")
+    sampled_seconds_ago: Optional[float] = Field(None, description="負荷を収集してからの経過秒数")
+    reachable: bool = Field(..., description="直近の負荷の収集に成功したか")
+    score: float = Field(..., description="割り当てのスコア（小さいほど優先して割り当てる）")
@@ -0,0 +1,32 @@
+"""
+Webhookスキーマ
+API リクエスト/レスポンスの型定義
+"""
+from pydantic import BaseModel, Field, ConfigDict
+from typing import Optional, List
+from datetime import datetime
+
+from app.models.webhook import WebhookEventStatus, WebhookProvider
+
+
+# 受信応答
+class WebhookAckResponse(BaseModel):
+    """Webhook受信時のレスポンス"""
+    event_id: Optional[int] = Field(None, description="保存したイベントID（重複時はなし）")
+    duplicate: bool = Field(False, description="同じ配信IDのイベントを受信済みか")
+
+
+# レスポンススキーマ
+class WebhookEventResponse(BaseModel):
+    """Webhookイベントのレスポンス"""
+    id: int
+    provider: WebhookProvider
+    event_type: Optional[str] = None
+    delivery_id: Optional[str] = None
+    status: WebhookEventStatus
+    execution_ids: Optional[List[int]] = None
+    error_message: Optional[str] = None
+    received_at: datetime
+    processed_at: Optional[datetime] = None
+    
+    model_config = ConfigDict(from_attributes=True)
@@ -0,0 +1,195 @@
+"""
+成果物サービス
+ジョブ実行後にリモートの成果物をSFTPで収集し、内容アドレス方式で保存する
+"""
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from typing import Dict, List
+from pathlib import Path
+import asyncio
+import hashlib
+import os
+import uuid
+
+import asyncssh
+
+from app.core.config import settings
+from app.models.artifact import ExecutionArtifact
+from app.models.execution import JobExecution
+from app.models.server import Server
+from app.services.ssh_service import ssh_service
+
+
+class ArtifactNotFoundError(Exception):
+    """成果物が見つからない"""
+    pass
+
+
+def _ignore_no_match(exc: Exception) -> None:
+    """globでマッチしなかったパターンは無視し、それ以外のエラーは送出する"""
+    if not isinstance(exc, (asyncssh.SFTPNoSuchFile, asyncssh.SFTPNoSuchPath)):
+        raise exc
+
+
+class ArtifactService:
+    """成果物管理サービス"""
+    
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self.storage_dir = Path(settings.artifact_storage_dir)
+    
+    def blob_path(self, sha256: str) -> Path:
+        """
+        成果物の保存先パス
+        
+        Args:
+            sha256: 内容のSHA-256
+            
+        Returns:
+            ローカルストレージ上のパス（先頭2文字でディレクトリを分ける）
+        """
+        return self.storage_dir / sha256[:2] / sha256
+    
+    async def get_by_execution_id(self, execution_id: int) -> List[ExecutionArtifact]:
+        """
+        実行IDで成果物一覧を取得
+        
+        Args:
+            execution_id: 実行ID
+            
+        Returns:
+            成果物のリスト
+        """
+        result = await self.db.execute(
+            select(ExecutionArtifact)
+            .where(ExecutionArtifact.execution_id == execution_id)
+            .order_by(ExecutionArtifact.path)
+        )
+        return list(result.scalars().all())
+    
+    async def get_by_id(self, execution_id: int, artifact_id: int) -> ExecutionArtifact:
+        """
+        IDで成果物を取得
+        
+        Args:
+            execution_id: 実行ID
+            artifact_id: 成果物ID
+            
+        Returns:
+            成果物オブジェクト
+            
+        Raises:
+            ArtifactNotFoundError: 成果物が見つからない
+        """
+        result = await self.db.execute(
+            select(ExecutionArtifact).where(
+                ExecutionArtifact.id == artifact_id,
+                ExecutionArtifact.execution_id == execution_id
+            )
+        )
+        artifact = result.scalar_one_or_none()
+        
+        if not artifact:
+            raise ArtifactNotFoundError(f"成果物ID {artifact_id} が見つかりません")
+        
+        return artifact
+    
+    async def collect(
+        self,
+        execution: JobExecution,
+        server: Server,
+        patterns: List[str]
+    ) -> List[ExecutionArtifact]:
+        """
+        リモートから成果物を収集
+        
+        1本のSFTPセッション上で複数ファイルを並列に、各ファイルは
+        読み込み要求をパイプライン化して取得し、ハッシュを計算しながら保存する。
+        既に同じ内容のファイルが保存済みであれば新たには保存しない。
+        
+        Args:
+            execution: 対象の実行
+            server: 成果物のあるサーバ
+            patterns: globパターンのリスト
+            
+        Returns:
+            登録した成果物のリスト（コミットは呼び出し側で行う）
+            
+        Raises:
+            SSHConnectionError: 接続エラー・SFTPエラー
+        """
+        async with ssh_service.open_sftp(server) as sftp:
+            files = await self._match(sftp, patterns)
+            semaphore = asyncio.Semaphore(settings.artifact_download_concurrency)
+            
+            async def fetch(path: str) -> ExecutionArtifact:
+                async with semaphore:
+                    size, sha256 = await self._download(sftp, path)
+                return ExecutionArtifact(
+                    execution_id=execution.id,
+                    path=path,
+                    size=size,
+                    sha256=sha256
+                )
+            
+            artifacts = await asyncio.gather(*[fetch(path) for path in files])
+        
+        self.db.add_all(artifacts)
+        return list(artifacts)
+    
+    async def _match(self, sftp: asyncssh.SFTPClient, patterns: List[str]) -> List[str]:
+        """パターンにマッチする通常ファイルのパスを重複なく取得"""
+        files: Dict[str, None] = {}
+        for pattern in patterns:
+            names = await sftp.glob_sftpname(pattern, error_handler=_ignore_no_match)
+            for name in names:
+                if name.attrs.type == asyncssh.FILEXFER_TYPE_REGULAR:
+                    files[name.filename] = None
+        return list(files)
+    
+    async def _download(self, sftp: asyncssh.SFTPClient, path: str) -> tuple[int, str]:
+        """
+        ファイルをダウンロードして内容アドレスで保存
+        
+        Returns:
+            (サイズ, SHA-256) のタプル
+        """
+        block_size = settings.sftp_block_size
+        max_requests = settings.sftp_max_requests
+        # 1回の read で max_requests 個の要求が並列に発行される
+        chunk_size = block_size * max_requests
+        
+        tmp_dir = self.storage_dir / "tmp"
+        tmp_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = tmp_dir / uuid.uuid4().hex
+        
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            async with sftp.open(
+                path,
+                "rb",
+                block_size=block_size,
+                max_requests=max_requests
+            ) as remote:
+                with open(tmp_path, "wb") as local:
+                    while True:
+                        data = await remote.read(chunk_size)
+                        if not data:
+                            break
+                        digest.update(data)
+                        local.write(data)
+                        size += len(data)
+            
+            sha256 = digest.hexdigest()
+            dest = self.blob_path(sha256)
+            if dest.exists():
+                # 同じ内容が保存済み: 重複排除
+                tmp_path.unlink()
+            else:
+                dest.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(tmp_path, dest)
+            return size, sha256
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
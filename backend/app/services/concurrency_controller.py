@@ -0,0 +1,168 @@
+"""
+適応型同時実行数制御
+サーバごとの同時実行数の上限を、接続の遅延・エラー・実行時間の伸びから調整する
+"""
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from app.core.config import settings
+
+
+# 減少時に掛ける係数
+DECREASE_FACTOR = 0.7
+# 連続した減少をまとめる間隔（同時に走っていた実行の失敗で何度も下げない）
+DECREASE_COOLDOWN_SECONDS = 5.0
+# 接続時間が基準値の何倍を超えたら混雑とみなすか
+LATENCY_TOLERANCE = 2.0
+# 基準値からの増加がこれ未満なら誤差とみなす（秒）
+LATENCY_FLOOR_SECONDS = 0.05
+# 実行時間が推定値の何倍を超えたら混雑とみなすか
+SLOWDOWN_TOLERANCE = 2.0
+# 基準となる接続時間を新しい観測値へ寄せる割合
+BASELINE_SMOOTHING = 0.05
+
+
+@dataclass
+class ServerConcurrency:
+    """サーバごとの制御状態"""
+    limit: float
+    floor: int
+    ceiling: int
+    baseline_connect_seconds: Optional[float] = None  # 新しい接続のハンドシェイクの時間の基準値
+    last_connect_seconds: Optional[float] = None
+    successes: int = 0
+    errors: int = 0
+    decreases: int = 0
+    last_decrease_at: float = 0.0
+
+
+class AdaptiveConcurrencyController:
+    """
+    適応型同時実行数制御（AIMD）
+    
+    実行が問題なく終わるたびに上限を 1/上限 ずつ増やし（上限分の実行が終われば
+    およそ1増える）、接続エラー・タイムアウト・接続時間の悪化・実行時間の伸びを
+    観測したら上限に係数を掛けて減らす。上限は下限（floor）と上限（ceiling）の
+    範囲に収める。状態はプロセス内に持ち、再起動すると初期値に戻る。
+    """
+    
+    def __init__(self):
+        self._servers: Dict[int, ServerConcurrency] = {}
+    
+    def configure(self, server_id: int, floor: Optional[int], ceiling: Optional[int]) -> ServerConcurrency:
+        """
+        サーバの下限・上限を設定（初回は初期値で状態を作成）
+        
+        Args:
+            server_id: サーバID
+            floor: 同時実行数の下限（未指定の場合は1）
+            ceiling: 同時実行数の上限（未指定の場合は既定値）
+            
+        Returns:
+            サーバの制御状態
+        """
+        state = self._servers.get(server_id)
+        if state is None:
+            state = self.initial_state(floor, ceiling)
+            self._servers[server_id] = state
+            return state
+        state.floor = floor or 1
+        state.ceiling = max(ceiling or settings.adaptive_concurrency_max, state.floor)
+        state.limit = min(max(state.limit, state.floor), state.ceiling)
+        return state
+    
+    @staticmethod
+    def initial_state(floor: Optional[int], ceiling: Optional[int]) -> ServerConcurrency:
+        """
+        初期状態を作成（制御対象には登録しない）
+        
+        Args:
+            floor: 同時実行数の下限（未指定の場合は1）
+            ceiling: 同時実行数の上限（未指定の場合は既定値）
+            
+        Returns:
+            初期値の制御状態
+        """
+        floor = floor or 1
+        ceiling = max(ceiling or settings.adaptive_concurrency_max, floor)
+        limit = min(max(float(settings.adaptive_concurrency_initial), floor), ceiling)
+        return ServerConcurrency(limit=limit, floor=floor, ceiling=ceiling)
+    
+    def current_limit(self, server_id: int) -> Optional[int]:
+        """
+        サーバの現在の同時実行数の上限
+        
+        Args:
+            server_id: サーバID
+            
+        Returns:
+            上限、制御対象でない場合はNone
+        """
+        state = self._servers.get(server_id)
+        if state is None:
+            return None
+        return int(state.limit)
+    
+    def get(self, server_id: int) -> Optional[ServerConcurrency]:
+        """サーバの制御状態を取得"""
+        return self._servers.get(server_id)
+    
+    def observe(
+        self,
+        server_id: int,
+        connect_seconds: Optional[float] = None,
+        duration_seconds: Optional[float] = None,
+        estimated_seconds: Optional[float] = None,
+        error: bool = False
+    ) -> None:
+        """
+        実行1件の観測結果を反映
+        
+        接続時間は新しい接続のハンドシェイクの時間のみ渡す。プールの接続を使い回した
+        場合（ほぼ0秒）を含めると基準値が0に近づき、新しい接続のたびに混雑とみなしてしまう。
+        
+        Args:
+            server_id: サーバID
+            connect_seconds: 新しい接続のハンドシェイクにかかった秒数（使い回した場合はNone）
+            duration_seconds: 実行にかかった秒数
+            estimated_seconds: 実行時間の推定値
+            error: 接続エラー・タイムアウトが発生したか
+        """
+        state = self._servers.get(server_id)
+        if state is None:
+            return
+        
+        congested = error
+        if connect_seconds is not None:
+            state.last_connect_seconds = connect_seconds
+            baseline = state.baseline_connect_seconds
+            if baseline is not None and connect_seconds > max(baseline * LATENCY_TOLERANCE, baseline + LATENCY_FLOOR_SECONDS):
+                congested = True
+            # 基準値は低い観測値にすぐ追従し、高い観測値にはゆっくり寄せる
+            if baseline is None or connect_seconds < baseline:
+                state.baseline_connect_seconds = connect_seconds
+            else:
+                state.baseline_connect_seconds = baseline + (connect_seconds - baseline) * BASELINE_SMOOTHING
+        
+        if duration_seconds is not None and estimated_seconds:
+            if duration_seconds > estimated_seconds * SLOWDOWN_TOLERANCE:
+                congested = True
+        
+        if error:
+            state.errors += 1
+        else:
+            state.successes += 1
+        
+        if congested:
+            now = time.monotonic()
+            if now - state.last_decrease_at >= DECREASE_COOLDOWN_SECONDS:
+                state.limit = max(state.limit * DECREASE_FACTOR, float(state.floor))
+                state.decreases += 1
+                state.last_decrease_at = now
+        else:
+            state.limit = min(state.limit + 1.0 / state.limit, float(state.ceiling))
+
+
+# シングルトンインスタンス
+concurrency_controller = AdaptiveConcurrencyController()
@@ -0,0 +1,202 @@
+"""
+定義キャッシュ
+実行のたびに参照するジョブ・サーバの定義を、上限件数と有効期限付きでプロセス内にキャッシュする
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, engine
+
+logger = logging.getLogger(__name__)
+
+# キャッシュする定義の種類
+KINDS = ("job", "server")
+
+# 全件を無効化する通知のID
+ALL = "*"
+
+
+@dataclass
+class CacheCounters:
+    """定義の種類ごとのキャッシュの統計"""
+    hits: int = 0
+    misses: int = 0
+    invalidations: int = 0
+
+
+class DefinitionCache:
+    """
+    定義キャッシュ（読み込み時にキャッシュ）
+    
+    キャッシュには読み込み用のセッションを閉じた（切り離した）オブジェクトを保持し、
+    取得時は呼び出し元のセッションに merge(load=False) で取り込む（SELECTを発行しない）。
+    サービス経由の変更はコミット後にこのプロセスのキャッシュを無効化し、PostgreSQL の
+    場合は同じトランザクションで NOTIFY を発行して、LISTEN している他のワーカーの
+    キャッシュも無効化する。
+    """
+    
+    def __init__(self):
+        self._entries: "OrderedDict[Tuple[str, int], Tuple[float, Any]]" = OrderedDict()
+        self._counters: Dict[str, CacheCounters] = {kind: CacheCounters() for kind in KINDS}
+        self._generation = 0  # 無効化のたびに増やす
+        self._coherent = True  # 他のワーカーの変更を反映できる状態か
+        self._task: Optional[asyncio.Task] = None
+    
+    def start(self) -> None:
+        """他のワーカーからの無効化通知の受信を開始（PostgreSQL の場合のみ）"""
+        if self._task is None and engine.dialect.name == "postgresql":
+            # 受信を始めるまでは他のワーカーの変更を反映できないためキャッシュしない
+            self._coherent = False
+            self._task = asyncio.create_task(self._listen())
+    
+    async def stop(self) -> None:
+        """無効化通知の受信を停止"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+    
+    async def get(
+        self,
+        db: AsyncSession,
+        kind: str,
+        key: int,
+        loader: Callable[[AsyncSession], Awaitable[Any]]
+    ) -> Any:
+        """
+        定義を取得（キャッシュになければ読み込んでキャッシュする）
+        
+        Args:
+            db: 取得したオブジェクトを取り込むセッション
+            kind: 定義の種類（"job" / "server"）
+            key: 定義のID
+            loader: 定義を読み込む関数（読み込み用のセッションを受け取り、見つからなければNone）
+            
+        Returns:
+            db に取り込んだオブジェクト（見つからなければNone）
+        """
+        if not settings.definition_cache_enabled:
+            return await loader(db)
+        
+        counters = self._counters[kind]
+        entry = self._entries.get((kind, key))
+        if entry is not None and entry[0] > time.monotonic():
+            counters.hits += 1
+            self._entries.move_to_end((kind, key))
+            return await db.merge(entry[1], load=False)
+        
+        counters.misses += 1
+        generation = self._generation
+        async with AsyncSessionLocal() as session:
+            instance = await loader(session)
+        if instance is None:
+            return None
+        
+        # 読み込み中に無効化された場合や、他のワーカーの変更を受信できない間はキャッシュしない
+        if generation == self._generation and self._coherent:
+            self._entries[(kind, key)] = (time.monotonic() + settings.definition_cache_ttl, instance)
+            self._entries.move_to_end((kind, key))
+            while len(self._entries) > settings.definition_cache_max_entries:
+                self._entries.popitem(last=False)
+        return await db.merge(instance, load=False)
+    
+    def invalidate(self, kind: str, key: Any = ALL) -> None:
+        """
+        このプロセスのキャッシュを無効化
+        
+        Args:
+            kind: 定義の種類（ALL の場合はすべての種類）
+            key: 定義のID（ALL の場合はその種類のすべて）
+        """
+        self._generation += 1
+        kinds = KINDS if kind == ALL else (kind,)
+        for name in kinds:
+            self._counters[name].invalidations += 1
+            if key == ALL:
+                for entry_key in [entry_key for entry_key in self._entries if entry_key[0] == name]:
+                    del self._entries[entry_key]
+            else:
+                self._entries.pop((name, key), None)
+    
+    async def publish(self, db: AsyncSession, kind: str, key: Any = ALL) -> None:
+        """
+        他のワーカーへ無効化を通知（コミット時に配信される。PostgreSQL の場合のみ）
+        
+        Args:
+            db: 変更を行っているセッション
+            kind: 定義の種類（ALL の場合はすべての種類）
+            key: 定義のID（ALL の場合はその種類のすべて）
+        """
+        if db.bind.dialect.name != "postgresql":
+            return
+        await db.execute(
+            text("SELECT pg_notify(:channel, :payload)"),
+            {"channel": settings.definition_cache_channel, "payload": f"{kind}:{key}"}
+        )
+    
+    def stats(self) -> List[dict]:
+        """
+        定義の種類ごとのキャッシュの統計を取得
+        
+        Returns:
+            種類・ヒット数・ミス数・ヒット率・無効化の回数・キャッシュ件数の辞書のリスト
+        """
+        stats = []
+        for kind, counters in self._counters.items():
+            lookups = counters.hits + counters.misses
+            stats.append({
+                "kind": kind,
+                "hits": counters.hits,
+                "misses": counters.misses,
+                "hit_rate": counters.hits / lookups if lookups else 0.0,
+                "invalidations": counters.invalidations,
+                "entries": sum(1 for entry_key in self._entries if entry_key[0] == kind),
+            })
+        return stats
+    
+    def _on_notify(self, connection, pid: int, channel: str, payload: str) -> None:
+        """無効化通知を受信（"種類:ID"、ID・種類が "*" の場合はすべて）"""
+        kind, _, key = payload.partition(":")
+        if kind != ALL and kind not in KINDS:
+            return
+        self.invalidate(kind, ALL if key in ("", ALL) else int(key))
+    
+    async def _listen(self) -> None:
+        """無効化通知を受信し続ける（接続が切れた場合は接続し直す）"""
+        while True:
+            try:
+                async with engine.connect() as conn:
+                    raw = await conn.get_raw_connection()
+                    driver = raw.driver_connection
+                    await driver.add_listener(settings.definition_cache_channel, self._on_notify)
+                    # 接続していない間の通知は受け取れないため、全件を無効化してから使い始める
+                    self.invalidate(ALL)
+                    self._coherent = True
+                    try:
+                        while not driver.is_closed():
+                            await asyncio.sleep(settings.definition_cache_listen_check_interval)
+                    finally:
+                        if not driver.is_closed():
+                            await driver.remove_listener(
+                                settings.definition_cache_channel, self._on_notify
+                            )
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("定義キャッシュの無効化通知の受信に失敗しました")
+            # 受信できない間は他のワーカーの変更を反映できないため、キャッシュを使わない
+            self._coherent = False
+            self.invalidate(ALL)
+            await asyncio.sleep(settings.definition_cache_listen_check_interval)
+
+
+# シングルトンインスタンス
+definition_cache = DefinitionCache()
@@ -0,0 +1,110 @@
+"""
+実行時間のスケッチ
+相対誤差を保証する対数ヒストグラムで実行時間の分布を近似し、パーセンタイルを求める
+"""
+import math
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+
+# これより短い実行時間（秒）は同じビンにまとめる
+MIN_SECONDS = 0.001
+
+
+class DurationSketch:
+    """
+    実行時間のスケッチ（DDSketch と同じ考え方の対数ヒストグラム）
+    
+    ビンの境界を公比 gamma = (1 + α) / (1 - α) の等比数列にとり、値をビンの番号ごとの
+    件数として保持する。パーセンタイルの相対誤差は α 以内で、スケッチ同士は
+    ビンごとの件数を足すだけで結合できる（時間帯・ジョブ・サーバをまたいで集計できる）。
+    ビンの数は値の範囲の対数に比例するため、件数が増えても大きくならない。
+    ビンの境界は精度で決まるため、保存する形式には精度も含める。
+    """
+    
+    def __init__(self, bins: Optional[Dict[str, int]] = None, accuracy: Optional[float] = None):
+        self.accuracy = accuracy if accuracy is not None else settings.rollup_sketch_accuracy
+        self.gamma = (1 + self.accuracy) / (1 - self.accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.bins: Dict[int, int] = {int(index): count for index, count in (bins or {}).items()}
+    
+    @classmethod
+    def from_json(cls, data: Optional[Dict[str, Any]]) -> "DurationSketch":
+        """
+        JSON列に保存した形式から復元
+        
+        精度を含まない形式（ビンごとの件数のみ）は現在の設定の精度で作成したものとみなす。
+        
+        Args:
+            data: to_json の値
+            
+        Returns:
+            保存したときの精度のスケッチ
+        """
+        if not data:
+            return cls()
+        if "bins" not in data:
+            return cls(data)
+        return cls(data["bins"], accuracy=data.get("accuracy"))
+    
+    @property
+    def count(self) -> int:
+        """件数"""
+        return sum(self.bins.values())
+    
+    def add(self, seconds: float, count: int = 1) -> None:
+        """実行時間を追加"""
+        index = self._index(seconds)
+        self.bins[index] = self.bins.get(index, 0) + count
+    
+    def merge(self, other: "DurationSketch") -> None:
+        """
+        別のスケッチを結合
+        
+        精度が異なる場合は、相手の各ビンの代表値をこのスケッチのビンに入れ直す
+        （そのビンの誤差は両方の精度の誤差を合わせたものになる）。
+        """
+        if math.isclose(other.accuracy, self.accuracy):
+            for index, count in other.bins.items():
+                self.bins[index] = self.bins.get(index, 0) + count
+            return
+        for index, count in other.bins.items():
+            self.add(other._value(index), count)
+    
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        パーセンタイルを求める
+        
+        Args:
+            q: 0〜1 の分位（0.95 で p95）
+            
+        Returns:
+            実行時間（秒）。件数が0の場合はNone
+        """
+        total = self.count
+        if total == 0:
+            return None
+        rank = q * (total - 1)
+        seen = 0
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if seen > rank:
+                return self._value(index)
+        return self._value(max(self.bins))
+    
+    def to_json(self) -> Dict[str, Any]:
+        """JSON列に保存する形式（精度とビンごとの件数）"""
+        return {
+            "accuracy": self.accuracy,
+            "bins": {str(index): count for index, count in self.bins.items()},
+        }
+    
+    def _index(self, seconds: float) -> int:
+        """値が入るビンの番号（MIN_SECONDS 以下は同じビン）"""
+        if seconds <= MIN_SECONDS:
+            return math.ceil(math.log(MIN_SECONDS) / self._log_gamma)
+        return math.ceil(math.log(seconds) / self._log_gamma)
+    
+    def _value(self, index: int) -> float:
+        """ビンの代表値（ビンの範囲 (γ^(i-1), γ^i] のどの値とも相対誤差 α 以内）"""
+        return 2 * self.gamma ** index / (self.gamma + 1)
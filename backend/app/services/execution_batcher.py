@@ -0,0 +1,374 @@
+"""
+実行のバッチ
+同じサーバへの短い実行をまとめ、1回のリモートセッションで順に実行する
+"""
+import asyncio
+import re
+import secrets
+import time
+from dataclasses import dataclass, replace
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import select, update
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.execution import JobExecution, ExecutionStatus
+from app.schemas.execution import ExecutionStatusMessage
+from app.models.server import Server
+from app.services.execution_scheduler import execution_scheduler, ExecutionTicket
+from app.services.concurrency_controller import concurrency_controller
+from app.services.execution_events import execution_events
+from app.services.ssh_service import ssh_service, SSHConnectionError, SSHExecutionError
+
+
+# バッチ全体を実行するコマンド（バッチのスクリプトは標準入力で渡す）
+BATCH_COMMAND = "/bin/sh -s"
+
+
+@dataclass
+class BatchResult:
+    """バッチ内の1件の実行結果"""
+    exit_code: int
+    stdout: str
+    stderr: str
+    started: Optional[float] = None  # リモートの時刻（UNIX時間）
+    finished: Optional[float] = None
+
+
+@dataclass
+class _BatchItem:
+    """バッチの実行待ち"""
+    execution_id: int
+    job_id: int
+    script: str
+    ticket: ExecutionTicket
+    future: asyncio.Future
+
+
+def build_batch_script(marker: str, scripts: List[str]) -> str:
+    """
+    複数のスクリプトを順に実行するバッチのスクリプトを作成
+    
+    各スクリプトは一時ファイルに書き出して通常の実行と同じシェルで別プロセスとして
+    実行し（cd や exit は他のスクリプトに影響しない）、終了ごとに
+    「マーカー 番号 終了コード 開始時刻 終了時刻」の行・標準出力・標準エラー出力を
+    マーカーで区切って出力する。
+    
+    Args:
+        marker: 出力の区切りに使う文字列（バッチごとに推測できない値にする）
+        scripts: 実行するスクリプトのリスト
+        
+    Returns:
+        /bin/sh で実行するスクリプト
+    """
+    lines = [
+        'd=$(mktemp -d 2>/dev/null) || d="${TMPDIR:-/tmp}/tsubame-batch.$$"',
+        'mkdir -p "$d" || exit 1',
+        "trap 'rm -rf \"$d\"' EXIT",
+    ]
+    for index, script in enumerate(scripts):
+        if not script.endswith("\n"):
+            script += "\n"
+        lines += [
+            f"cat > \"$d/{index}.sh\" <<'{marker}-{index}'",
+            script + f"{marker}-{index}",
+            "s=$(date +%s.%N)",
+            f'"${{SHELL:-/bin/sh}}" "$d/{index}.sh" > "$d/{index}.out" 2> "$d/{index}.err" < /dev/null',
+            "c=$?",
+            "e=$(date +%s.%N)",
+            f"printf '%s %s %s %s %s\\n' '{marker}' {index} \"$c\" \"$s\" \"$e\"",
+            f"cat \"$d/{index}.out\"; printf '\\n%s\\n' '{marker}-ERR'",
+            f"cat \"$d/{index}.err\"; printf '\\n%s\\n' '{marker}-END'",
+        ]
+    return "\n".join(lines) + "\n"
+
+
+def parse_batch_output(marker: str, stdout: str) -> Dict[int, BatchResult]:
+    """
+    バッチの出力を実行ごとの結果に分ける
+    
+    Args:
+        marker: build_batch_script に渡したマーカー
+        stdout: バッチの標準出力
+        
+    Returns:
+        スクリプトの番号ごとの結果（出力が途中で切れた実行は含まない）
+    """
+    header = re.compile(rf"^{re.escape(marker)} (\d+) (-?\d+) (\S+) (\S+)\n", re.MULTILINE)
+    err_separator = f"\n{marker}-ERR\n"
+    end_separator = f"\n{marker}-END\n"
+    
+    results: Dict[int, BatchResult] = {}
+    position = 0
+    while True:
+        match = header.search(stdout, position)
+        if match is None:
+            break
+        err_at = stdout.find(err_separator, match.end())
+        end_at = stdout.find(end_separator, err_at + len(err_separator)) if err_at >= 0 else -1
+        if end_at < 0:
+            break
+        results[int(match.group(1))] = BatchResult(
+            exit_code=int(match.group(2)),
+            stdout=stdout[match.end():err_at],
+            stderr=stdout[err_at + len(err_separator):end_at],
+            started=_parse_time(match.group(3)),
+            finished=_parse_time(match.group(4))
+        )
+        position = end_at + len(end_separator)
+    return results
+
+
+def _parse_time(value: str) -> Optional[float]:
+    """date +%s.%N の出力を解析（%N に対応していない date の場合はNone）"""
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+class ExecutionBatcher:
+    """
+    実行のバッチ
+    
+    同じサーバへの実行を一定時間（または最大件数まで）ためてから、1本のチャネル上で
+    まとめて実行する。バッチは実行スケジューラの枠を1つだけ使い、開始時の状態更新と
+    全件の結果の保存をそれぞれ1回のトランザクションで行う。
+    バッチ全体に SSH のタイムアウトを適用するため、短いジョブにのみ使う。
+    """
+    
+    def __init__(self):
+        # (サーバID, 同時実行グループ) ごとにためる（グループの異なる実行を同じバッチにしない）
+        self._pending: Dict[Tuple[int, Optional[str]], List[_BatchItem]] = {}
+        self._servers: Dict[int, Server] = {}
+        self._timers: Dict[Tuple[int, Optional[str]], asyncio.TimerHandle] = {}
+        self._tasks: Set[asyncio.Task] = set()
+    
+    async def submit(
+        self,
+        server: Server,
+        execution_id: int,
+        job_id: int,
+        script: str,
+        ticket: ExecutionTicket
+    ) -> None:
+        """
+        実行をバッチに追加し、バッチの結果が保存されるまで待つ
+        
+        Args:
+            server: 実行先サーバ
+            execution_id: 実行ID（実行待ちの実行履歴）
+            job_id: ジョブID
+            script: 実行するスクリプト（パラメータを展開済み）
+            ticket: 実行スケジューラの開始待ち（バッチの実行枠はバッチ全体で1つ確保する）
+        """
+        loop = asyncio.get_running_loop()
+        item = _BatchItem(
+            execution_id=execution_id,
+            job_id=job_id,
+            script=script,
+            ticket=ticket,
+            future=loop.create_future()
+        )
+        key = (server.id, ticket.group)
+        items = self._pending.setdefault(key, [])
+        items.append(item)
+        self._servers[server.id] = server
+        
+        if len(items) >= settings.execution_batch_max_size:
+            self._flush(key)
+        elif len(items) == 1:
+            self._timers[key] = loop.call_later(
+                settings.execution_batch_window, self._flush, key
+            )
+        
+        await item.future
+    
+    async def shutdown(self) -> None:
+        """ためている実行と実行中のバッチを中断（アプリケーション終了時）"""
+        for timer in self._timers.values():
+            timer.cancel()
+        self._timers.clear()
+        for items in self._pending.values():
+            for item in items:
+                item.future.cancel()
+        self._pending.clear()
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*list(self._tasks), return_exceptions=True)
+    
+    def _flush(self, key: Tuple[int, Optional[str]]) -> None:
+        """サーバ（同時実行グループ）にためている実行をバッチとして開始"""
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        items = self._pending.pop(key, None)
+        if not items:
+            return
+        task = asyncio.create_task(self._run_batch(self._servers[key[0]], items))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def _run_batch(self, server: Server, items: List[_BatchItem]) -> None:
+        """
+        バッチを実行して結果を保存し、待っている実行に完了を通知
+        
+        Args:
+            server: 実行先サーバ
+            items: バッチの実行待ち
+        """
+        batch_id = secrets.token_hex(8)
+        marker = f"@@tsubame-batch-{batch_id}"
+        execution_ids = [item.execution_id for item in items]
+        # バッチ全体で実行枠を1つ使う（優先度はバッチ内で最も高いもの、推定時間は合計。
+        # 同時実行グループはバッチ内で同じ）
+        ticket = replace(
+            items[0].ticket,
+            priority=max(item.ticket.priority for item in items),
+            estimated_seconds=sum(item.ticket.estimated_seconds for item in items)
+        )
+        
+        try:
+            async with execution_scheduler.slot(ticket):
+                started_at = datetime.utcnow()
+                async with AsyncSessionLocal() as db:
+                    # 実行先のサーバもここで保存する（呼び出し元のセッションの変更は保存されない）
+                    await db.execute(
+                        update(JobExecution)
+                        .where(JobExecution.id.in_(execution_ids))
+                        .values(
+                            status=ExecutionStatus.RUNNING,
+                            started_at=started_at,
+                            batch_id=batch_id,
+                            server_id=server.id
+                        )
+                    )
+                    await db.commit()
+                for item in items:
+                    execution_events.publish(ExecutionStatusMessage(
+                        execution_id=item.execution_id,
+                        job_id=item.job_id,
+                        status=ExecutionStatus.RUNNING
+                    ))
+                
+                results: Dict[int, BatchResult] = {}
+                error = None
+                error_status = ExecutionStatus.FAILED
+                connection_failed = False
+                timings: Dict[str, float] = {}
+                batch_started = time.monotonic()
+                try:
+                    exit_code, stdout, stderr = await ssh_service.run_command(
+                        server,
+                        BATCH_COMMAND,
+                        input=build_batch_script(marker, [item.script for item in items]),
+                        timings=timings
+                    )
+                    results = parse_batch_output(marker, stdout)
+                    if len(results) < len(items):
+                        error = f"バッチが途中で終了しました（終了コード {exit_code}）: {stderr.strip()}"
+                except SSHConnectionError as e:
+                    error = str(e)
+                    connection_failed = True
+                except SSHExecutionError as e:
+                    error = str(e)
+                    if "タイムアウト" in error:
+                        error_status = ExecutionStatus.TIMEOUT
+                        connection_failed = True
+                except Exception as e:
+                    error = f"予期しないエラー: {str(e)}"
+                
+                if ticket.adaptive:
+                    # バッチ全体を1件の実行として観測する（接続できない・タイムアウトは混雑とみなす）
+                    concurrency_controller.observe(
+                        server.id,
+                        connect_seconds=timings.get("connect_seconds"),
+                        duration_seconds=time.monotonic() - batch_started if error is None else None,
+                        estimated_seconds=ticket.estimated_seconds,
+                        error=connection_failed
+                    )
+                
+                await self._save(
+                    items, results, started_at, datetime.utcnow(), error, error_status
+                )
+        except BaseException as e:
+            for item in items:
+                if item.future.done():
+                    continue
+                if isinstance(e, asyncio.CancelledError):
+                    item.future.cancel()
+                else:
+                    item.future.set_exception(e)
+            raise
+        
+        for item in items:
+            if not item.future.done():
+                item.future.set_result(None)
+    
+    async def _save(
+        self,
+        items: List[_BatchItem],
+        results: Dict[int, BatchResult],
+        started_at: datetime,
+        finished_at: datetime,
+        error: Optional[str],
+        error_status: ExecutionStatus
+    ) -> None:
+        """
+        バッチの全件の結果を1回のトランザクションで保存
+        
+        開始・終了時刻は、リモートで計測した時刻の差をバッチの開始時刻に足して求める
+        （サーバとの時計のずれの影響を受けない）。
+        
+        Args:
+            items: バッチの実行待ち
+            results: スクリプトの番号ごとの結果
+            started_at: バッチの開始時刻
+            finished_at: バッチの終了時刻
+            error: 結果のない実行に記録するエラーメッセージ
+            error_status: 結果のない実行のステータス
+        """
+        origins = [result.started for result in results.values() if result.started is not None]
+        origin = min(origins) if origins else None
+        
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(JobExecution).where(JobExecution.id.in_([item.execution_id for item in items]))
+            )
+            executions = {execution.id: execution for execution in result.scalars().all()}
+            
+            for index, item in enumerate(items):
+                execution = executions.get(item.execution_id)
+                if execution is None:
+                    continue
+                batch_result = results.get(index)
+                if batch_result is None:
+                    execution.status = error_status
+                    execution.error_message = error or "バッチの実行結果がありません"
+                    execution.finished_at = finished_at
+                    continue
+                
+                execution.status = (
+                    ExecutionStatus.SUCCESS if batch_result.exit_code == 0 else ExecutionStatus.FAILED
+                )
+                execution.exit_code = batch_result.exit_code
+                execution.stdout = batch_result.stdout
+                execution.stderr = batch_result.stderr
+                if origin is not None and batch_result.started is not None and batch_result.finished is not None:
+                    execution.started_at = started_at + timedelta(seconds=batch_result.started - origin)
+                    execution.finished_at = execution.started_at + timedelta(
+                        seconds=max(batch_result.finished - batch_result.started, 0.0)
+                    )
+                else:
+                    execution.finished_at = finished_at
+            
+            await db.commit()
+        
+        for execution in executions.values():
+            execution_events.publish_execution(execution)
+
+
+# シングルトンインスタンス
+execution_batcher = ExecutionBatcher()
@@ -0,0 +1,264 @@
+"""
+実行イベント
+実行のステータス変更をプロセス内の購読者に配信し、PostgreSQL の LISTEN/NOTIFY で他のワーカーにも中継する
+"""
+import asyncio
+import json
+import logging
+import secrets
+import time
+from collections import OrderedDict
+from typing import Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.core.database import engine
+from app.models.execution import JobExecution
+from app.schemas.execution import ExecutionStatusMessage
+
+logger = logging.getLogger(__name__)
+
+# NOTIFY のペイロードの上限（8000バイト）に収めるための1通あたりの目安
+MAX_PAYLOAD_BYTES = 7500
+
+
+class ExecutionEventSubscription:
+    """
+    実行イベントの購読
+    
+    対象のジョブ・実行で絞り込んだイベントを受け取る。受け取りが追いつかず
+    キューが一杯になった場合は古いイベントから破棄する（dropped に件数を数える）。
+    """
+    
+    def __init__(
+        self,
+        bus: "ExecutionEventBus",
+        job_ids: Optional[Iterable[int]] = None,
+        execution_ids: Optional[Iterable[int]] = None
+    ):
+        self._bus = bus
+        self.job_ids: Optional[Set[int]] = set(job_ids) if job_ids else None
+        self.execution_ids: Optional[Set[int]] = set(execution_ids) if execution_ids else None
+        self.dropped = 0
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=settings.execution_events_queue_size)
+    
+    def matches(self, message: ExecutionStatusMessage) -> bool:
+        """購読の対象のイベントか（ジョブ・実行の両方を指定した場合はいずれかに一致すれば対象）"""
+        if self.job_ids is None and self.execution_ids is None:
+            return True
+        return (
+            (self.job_ids is not None and message.job_id in self.job_ids)
+            or (self.execution_ids is not None and message.execution_id in self.execution_ids)
+        )
+    
+    def put(self, message: ExecutionStatusMessage) -> None:
+        """イベントを追加（一杯の場合は最も古いイベントを破棄）"""
+        if self._queue.full():
+            self._queue.get_nowait()
+            self.dropped += 1
+        self._queue.put_nowait(message)
+    
+    async def get(self) -> ExecutionStatusMessage:
+        """次のイベントを待って取得"""
+        return await self._queue.get()
+    
+    def close(self) -> None:
+        """購読を終了"""
+        self._bus._subscribers.discard(self)
+    
+    def __enter__(self) -> "ExecutionEventSubscription":
+        return self
+    
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class ExecutionEventBus:
+    """
+    実行イベントのバス
+    
+    publish したイベントはこのプロセスの購読者にすぐ配信する。PostgreSQL を使う場合は
+    まとめて NOTIFY し、LISTEN している他のワーカーの購読者にも配信する
+    （自分が送った通知は送信元の識別子で除外する）。
+    PostgreSQL 以外（テストや単一プロセスでの SQLite 等）ではプロセス内の配信のみ行う。
+    イベントは通知のみで永続化しないため、接続が切れている間の他のワーカーの
+    イベントは届かない。
+    直近（READ_YOUR_WRITES_WINDOW 秒以内）にイベントがあった実行を覚えておき、
+    レプリカに反映されていない可能性がある実行の判定に使う。
+    """
+    
+    def __init__(self):
+        self._subscribers: Set[ExecutionEventSubscription] = set()
+        self._recent: "OrderedDict[int, Tuple[float, Optional[int]]]" = OrderedDict()
+        self._origin = secrets.token_hex(8)
+        self._outbox: List[dict] = []
+        self._outbox_ready: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+    
+    @property
+    def remote(self) -> bool:
+        """他のワーカーへ中継するか"""
+        backend = settings.execution_events_backend
+        if backend == "auto":
+            return engine.dialect.name == "postgresql"
+        return backend == "postgres"
+    
+    def start(self) -> None:
+        """他のワーカーとの中継を開始（PostgreSQL を使う場合のみ）"""
+        if self._task is None and self.remote:
+            self._outbox_ready = asyncio.Event()
+            self._task = asyncio.create_task(self._relay())
+    
+    async def stop(self) -> None:
+        """他のワーカーとの中継を停止"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self._outbox.clear()
+    
+    def subscribe(
+        self,
+        job_ids: Optional[Iterable[int]] = None,
+        execution_ids: Optional[Iterable[int]] = None
+    ) -> ExecutionEventSubscription:
+        """
+        イベントを購読
+        
+        Args:
+            job_ids: 対象のジョブID（Noneはすべて）
+            execution_ids: 対象の実行ID（Noneはすべて）
+            
+        Returns:
+            購読（終了時は close する。with 文でも使える）
+        """
+        subscription = ExecutionEventSubscription(self, job_ids, execution_ids)
+        self._subscribers.add(subscription)
+        return subscription
+    
+    def publish(self, message: ExecutionStatusMessage) -> None:
+        """
+        イベントを配信
+        
+        Args:
+            message: ステータス更新メッセージ
+        """
+        self._deliver(message)
+        if self._task is not None:
+            self._outbox.append(message.model_dump(mode="json"))
+            self._outbox_ready.set()
+    
+    def publish_execution(self, execution: JobExecution) -> None:
+        """
+        実行履歴の現在のステータスを配信（変更をコミットした後に呼ぶ）
+        
+        Args:
+            execution: 実行履歴
+        """
+        self.publish(ExecutionStatusMessage(
+            execution_id=execution.id,
+            job_id=execution.job_id,
+            status=execution.status,
+            exit_code=execution.exit_code
+        ))
+    
+    def recent_executions(self, job_id: Optional[int] = None) -> List[int]:
+        """
+        直近に変更された実行（レプリカに反映されていない可能性がある実行）を取得
+        
+        Args:
+            job_id: ジョブIDで絞り込み
+            
+        Returns:
+            READ_YOUR_WRITES_WINDOW 秒以内にイベントがあった実行IDのリスト
+        """
+        self._expire_recent(time.monotonic())
+        return [
+            execution_id for execution_id, (_, recent_job_id) in self._recent.items()
+            if job_id is None or recent_job_id == job_id
+        ]
+    
+    def _expire_recent(self, now: float) -> None:
+        """覚えておく時間を過ぎた実行を忘れる"""
+        deadline = now - settings.read_your_writes_window
+        while self._recent and next(iter(self._recent.values()))[0] < deadline:
+            self._recent.popitem(last=False)
+    
+    def _deliver(self, message: ExecutionStatusMessage) -> None:
+        """このプロセスの購読者に配信"""
+        now = time.monotonic()
+        self._recent[message.execution_id] = (now, message.job_id)
+        self._recent.move_to_end(message.execution_id)
+        self._expire_recent(now)
+        for subscription in list(self._subscribers):
+            if subscription.matches(message):
+                subscription.put(message)
+    
+    def _on_notify(self, connection, pid: int, channel: str, payload: str) -> None:
+        """他のワーカーのイベントを受信"""
+        try:
+            data = json.loads(payload)
+            if data.get("origin") == self._origin:
+                return
+            for event in data.get("events", []):
+                self._deliver(ExecutionStatusMessage.model_validate(event))
+        except Exception:
+            logger.exception("実行イベントの通知を解析できませんでした")
+    
+    def _take_payloads(self) -> List[str]:
+        """送信待ちのイベントを NOTIFY のペイロードの上限に収まるようにまとめる"""
+        payloads = []
+        events: List[dict] = []
+        size = 0
+        for event in self._outbox:
+            event_size = len(json.dumps(event))
+            if events and size + event_size > MAX_PAYLOAD_BYTES:
+                payloads.append(json.dumps({"origin": self._origin, "events": events}))
+                events, size = [], 0
+            events.append(event)
+            size += event_size + 1
+        if events:
+            payloads.append(json.dumps({"origin": self._origin, "events": events}))
+        self._outbox.clear()
+        return payloads
+    
+    async def _relay(self) -> None:
+        """1本の接続で他のワーカーのイベントを受信し、このプロセスのイベントを送信する"""
+        channel = settings.execution_events_channel
+        while True:
+            try:
+                async with engine.connect() as conn:
+                    raw = await conn.get_raw_connection()
+                    driver = raw.driver_connection
+                    await driver.add_listener(channel, self._on_notify)
+                    try:
+                        while not driver.is_closed():
+                            try:
+                                await asyncio.wait_for(
+                                    self._outbox_ready.wait(),
+                                    timeout=settings.execution_events_reconnect_interval
+                                )
+                            except asyncio.TimeoutError:
+                                continue
+                            self._outbox_ready.clear()
+                            for payload in self._take_payloads():
+                                await conn.execute(
+                                    text("SELECT pg_notify(:channel, :payload)"),
+                                    {"channel": channel, "payload": payload}
+                                )
+                            await conn.commit()
+                    finally:
+                        if not driver.is_closed():
+                            await driver.remove_listener(channel, self._on_notify)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("実行イベントの中継に失敗しました")
+            # 接続できない間のイベントは他のワーカーへ送れないため破棄する
+            self._outbox.clear()
+            await asyncio.sleep(settings.execution_events_reconnect_interval)
+
+
+# シングルトンインスタンス
+execution_events = ExecutionEventBus()
@@ -0,0 +1,253 @@
+"""
+実行スケジューラ
+優先度・重み付き公平キューイング・同時実行数の上限で実行の開始順を決める
+"""
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.services.concurrency_controller import concurrency_controller
+
+
+@dataclass
+class ExecutionTicket:
+    """実行の開始待ち"""
+    execution_id: int
+    server_id: int
+    flow: str  # 公平に扱う単位（所有者、未指定の場合はジョブ）
+    priority: int = 0
+    weight: float = 1.0
+    server_limit: int = 0  # サーバの同時実行数の上限（0は無制限）
+    adaptive: bool = False  # サーバの上限を適応型制御から取得するか
+    group: Optional[str] = None  # 同時に1件しか実行しないグループ
+    estimated_seconds: float = 60.0
+    tag: float = 0.0
+    seq: int = 0
+    started_at: float = 0.0
+    future: asyncio.Future = field(default=None, repr=False)
+    
+    def sort_key(self) -> Tuple[int, float, int]:
+        """開始順の比較キー（優先度が高い順、同じ優先度では仮想終了時刻が早い順）"""
+        return (-self.priority, self.tag, self.seq)
+
+
+class ExecutionScheduler:
+    """
+    実行スケジューラ
+    
+    優先度が同じ実行の間では、フローごとに仮想時刻を進めるスタート時刻公平
+    キューイング（SFQ）で順番を決める。重みの大きいフローほど仮想時刻の進みが
+    遅いため、大量に投入したフローがあっても他のフローの実行が割り込める。
+    開始できるのは全体・サーバごとの同時実行数の上限に空きがあり、
+    同じ同時実行グループの実行が動いていない場合のみ。
+    開始待ちはサーバ・同時実行グループの組（レーン）ごとに開始順のヒープで持つ。
+    同じレーンの実行は開始できる条件が同じため、各レーンの先頭だけを比べればよく、
+    開始待ちが多くても実行の開始・終了ごとに全体を並べ替えない。
+    状態はプロセス内に持つため、複数プロセス間では調整しない。
+    """
+    
+    def __init__(self):
+        self._waiting: Dict[int, ExecutionTicket] = {}
+        # (サーバID, 同時実行グループ) ごとの開始待ちのヒープ（キャンセル済みは先頭に来たときに取り除く）
+        self._lanes: Dict[Tuple[int, Optional[str]], List[Tuple[Tuple[int, float, int], ExecutionTicket]]] = {}
+        self._server_waiting: Dict[int, int] = {}
+        self._running: Dict[int, ExecutionTicket] = {}
+        self._server_running: Dict[int, int] = {}
+        self._active_groups: Set[str] = set()
+        self._flow_tags: Dict[str, float] = {}
+        self._virtual_time = 0.0
+        self._seq = itertools.count()
+    
+    @asynccontextmanager
+    async def slot(self, ticket: ExecutionTicket) -> AsyncIterator[None]:
+        """
+        実行枠を確保し、ブロックを抜けると解放する
+        
+        Args:
+            ticket: 開始待ちの実行
+        """
+        ticket.future = asyncio.get_running_loop().create_future()
+        self._enqueue(ticket)
+        try:
+            await ticket.future
+        except asyncio.CancelledError:
+            if self._waiting.pop(ticket.execution_id, None) is None:
+                # 枠を割り当てた直後にキャンセルされた
+                self._release(ticket)
+            else:
+                self._server_waiting[ticket.server_id] -= 1
+            raise
+        
+        try:
+            yield
+        finally:
+            self._release(ticket)
+    
+    def queue_info(self, execution_ids: Iterable[int]) -> Dict[int, Tuple[int, datetime]]:
+        """
+        開始待ちの実行の順番と開始予定時刻を取得
+        
+        開始予定時刻は、実行中の残り時間と先に開始する実行の推定時間の合計を
+        同時に実行できる数で割った概算。開始待ちを1回だけ並べて、指定した実行の
+        順番と先に開始する実行の推定時間の合計をまとめて求める。
+        
+        Args:
+            execution_ids: 実行IDのリスト
+            
+        Returns:
+            実行IDごとの (順番（1始まり）, 開始予定時刻)（開始待ちでない実行は含まない）
+        """
+        targets = {execution_id for execution_id in execution_ids if execution_id in self._waiting}
+        if not targets:
+            return {}
+        
+        now = time.monotonic()
+        remaining = sum(
+            max(running.estimated_seconds - (now - running.started_at), 0.0)
+            for running in self._running.values()
+        )
+        capacity = settings.scheduler_max_concurrency or max(len(self._running), 1)
+        utcnow = datetime.utcnow()
+        
+        info: Dict[int, Tuple[int, datetime]] = {}
+        ahead_seconds = 0.0
+        for position, ticket in enumerate(sorted(self._waiting.values(), key=ExecutionTicket.sort_key), 1):
+            if ticket.execution_id in targets:
+                ticket_capacity = capacity
+                server_limit = self._server_limit(ticket)
+                if server_limit:
+                    ticket_capacity = min(ticket_capacity, server_limit)
+                if ticket.group:
+                    ticket_capacity = 1
+                work = remaining + ahead_seconds
+                info[ticket.execution_id] = (position, utcnow + timedelta(seconds=work / ticket_capacity))
+                if len(info) == len(targets):
+                    break
+            ahead_seconds += ticket.estimated_seconds
+        return info
+    
+    def stats(self) -> dict:
+        """待ち・実行中の件数を取得"""
+        return {"waiting": len(self._waiting), "running": len(self._running)}
+    
+    def running_on(self, server_id: int) -> int:
+        """サーバで実行中の件数"""
+        return self._server_running.get(server_id, 0)
+    
+    def queued_on(self, server_id: int) -> int:
+        """サーバに割り当て済みの件数（実行中と開始待ち）"""
+        return self.running_on(server_id) + self._server_waiting.get(server_id, 0)
+    
+    def kick(self, server_id: int, server_limit: int, adaptive: bool) -> None:
+        """
+        サーバの同時実行数の設定を開始待ちの実行に反映し、開始できる実行を開始する
+        
+        Args:
+            server_id: サーバID
+            server_limit: サーバの同時実行数の上限（0は無制限）
+            adaptive: 上限を適応型制御から取得するか
+        """
+        for ticket in self._waiting.values():
+            if ticket.server_id == server_id:
+                ticket.server_limit = server_limit
+                ticket.adaptive = adaptive
+        self._dispatch()
+    
+    @staticmethod
+    def _server_limit(ticket: ExecutionTicket) -> int:
+        """サーバの同時実行数の上限（0は無制限）"""
+        if ticket.adaptive:
+            return concurrency_controller.current_limit(ticket.server_id) or ticket.server_limit
+        return ticket.server_limit
+    
+    def _enqueue(self, ticket: ExecutionTicket) -> None:
+        """開始待ちに追加して、開始できる実行を開始する"""
+        start = max(self._virtual_time, self._flow_tags.get(ticket.flow, 0.0))
+        ticket.tag = start + 1.0 / max(ticket.weight, 0.001)
+        ticket.seq = next(self._seq)
+        self._flow_tags[ticket.flow] = ticket.tag
+        self._waiting[ticket.execution_id] = ticket
+        self._server_waiting[ticket.server_id] = self._server_waiting.get(ticket.server_id, 0) + 1
+        heapq.heappush(self._lanes.setdefault((ticket.server_id, ticket.group), []), (ticket.sort_key(), ticket))
+        self._dispatch()
+    
+    def _release(self, ticket: ExecutionTicket) -> None:
+        """実行枠を解放して、次の実行を開始する"""
+        if self._running.pop(ticket.execution_id, None) is None:
+            return
+        self._server_running[ticket.server_id] -= 1
+        if ticket.group:
+            self._active_groups.discard(ticket.group)
+        self._dispatch()
+    
+    def _eligible(self, ticket: ExecutionTicket) -> bool:
+        """上限・同時実行グループの条件を満たすか"""
+        limit = settings.scheduler_max_concurrency
+        if limit and len(self._running) >= limit:
+            return False
+        server_limit = self._server_limit(ticket)
+        if server_limit and self._server_running.get(ticket.server_id, 0) >= server_limit:
+            return False
+        return not (ticket.group and ticket.group in self._active_groups)
+    
+    def _lane_head(self, lane: Tuple[int, Optional[str]]) -> Optional[ExecutionTicket]:
+        """レーンの先頭の開始待ち（キャンセル済みは取り除く。空のレーンは削除する）"""
+        heap = self._lanes[lane]
+        while heap:
+            ticket = heap[0][1]
+            if self._waiting.get(ticket.execution_id) is ticket and not ticket.future.done():
+                return ticket
+            # 待っている側がキャンセル済み（slot で取り除かれる）
+            heapq.heappop(heap)
+        del self._lanes[lane]
+        return None
+    
+    def _dispatch(self) -> None:
+        """開始できる実行を順に開始する"""
+        limit = settings.scheduler_max_concurrency
+        if limit and len(self._running) >= limit:
+            return
+        
+        # 開始できるレーンの先頭を開始順に取り出す
+        candidates = []
+        for lane in list(self._lanes):
+            ticket = self._lane_head(lane)
+            if ticket is not None and self._eligible(ticket):
+                candidates.append((ticket.sort_key(), lane))
+        heapq.heapify(candidates)
+        
+        while candidates:
+            if limit and len(self._running) >= limit:
+                break
+            _, lane = heapq.heappop(candidates)
+            ticket = self._lane_head(lane)
+            # 先に開始した実行でサーバの上限・グループが埋まった場合は開始しない
+            if ticket is None or not self._eligible(ticket):
+                continue
+            heapq.heappop(self._lanes[lane])
+            self._start(ticket)
+            ticket = self._lane_head(lane)
+            if ticket is not None and self._eligible(ticket):
+                heapq.heappush(candidates, (ticket.sort_key(), lane))
+    
+    def _start(self, ticket: ExecutionTicket) -> None:
+        """開始待ちの実行に実行枠を割り当てる"""
+        del self._waiting[ticket.execution_id]
+        self._server_waiting[ticket.server_id] -= 1
+        self._running[ticket.execution_id] = ticket
+        self._server_running[ticket.server_id] = self._server_running.get(ticket.server_id, 0) + 1
+        if ticket.group:
+            self._active_groups.add(ticket.group)
+        ticket.started_at = time.monotonic()
+        self._virtual_time = max(self._virtual_time, ticket.tag - 1.0 / max(ticket.weight, 0.001))
+        ticket.future.set_result(None)
+
+
+# シングルトンインスタンス
+execution_scheduler = ExecutionScheduler()
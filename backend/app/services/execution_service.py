@@ -3,14 +3,33 @@
 ジョブの実行と実行履歴の管理
 """
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, desc
+from sqlalchemy import select, delete, desc
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import selectinload
-from typing import List
-from datetime import datetime
+from sqlalchemy.orm.attributes import set_committed_value
+from typing import Dict, List, Optional
+from datetime import datetime, timedelta
+import asyncio
+import shlex
 
-from app.models.execution import JobExecution, ExecutionStatus
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.execution import JobExecution, ExecutionStatus, ExecutionIdempotencyKey
+from app.models.server import Server
 from app.services.job_service import JobService, JobNotFoundError
+from app.services.artifact_service import ArtifactService
+from app.services.result_cache import ResultCacheService, compute_fingerprint
+from app.services.trigger_coalescer import trigger_coalescer, compute_trigger_hash
+from app.services.execution_scheduler import execution_scheduler, ExecutionTicket
+from app.services.execution_batcher import execution_batcher
+from app.services.execution_writer import execution_writer
+from app.services.execution_events import execution_events
+from app.services.concurrency_controller import concurrency_controller
+from app.services.server_load import server_load_sampler
+from app.services.workspace_sync import workspace_sync_service, WorkspaceError
 from app.services.ssh_service import ssh_service, SSHConnectionError, SSHExecutionError
+from app.services.step_markers import StepTracker
+from app.services.log_archive import log_archive
 
 
 class ExecutionNotFoundError(Exception):
@@ -18,12 +37,40 @@ class ExecutionNotFoundError(Exception):
     pass
 
 
+class IdempotencyKeyConflictError(Exception):
+    """冪等キーが別のジョブの実行で使われている"""
+    pass
+
+
+async def _execute_pending(execution_id: int, parameters: Dict[str, str], delay: float) -> None:
+    """
+    待機時間の経過後、実行待ちの実行を独立したセッションで実行
+    
+    Args:
+        execution_id: 実行ID
+        parameters: パラメータ
+        delay: 実行までの待機時間（秒）。この間の同じ要求は同じ実行に合流する
+    """
+    if delay > 0:
+        await asyncio.sleep(delay)
+    async with AsyncSessionLocal() as db:
+        await ExecutionService(db).execute_pending(execution_id, parameters)
+
+
 class ExecutionService:
     """ジョブ実行サービス"""
     
-    def __init__(self, db: AsyncSession):
+    def __init__(self, db: AsyncSession, read_db: Optional[AsyncSession] = None):
+        """
+        Args:
+            db: プライマリのセッション
+            read_db: 履歴・一覧の参照に使うレプリカのセッション（Noneはプライマリを使う）
+        """
         self.db = db
+        self.read_db = read_db if read_db is not None else db
         self.job_service = JobService(db)
+        self.artifact_service = ArtifactService(db)
+        self.result_cache = ResultCacheService(db)
     
     async def get_all(
         self,
@@ -52,20 +99,29 @@ class ExecutionService:
         if include_job:
             query = query.options(selectinload(JobExecution.job))
         
-        result = await self.db.execute(query)
-        return list(result.scalars().all())
+        result = await self.read_db.execute(query)
+        return await self._with_recent_writes(
+            list(result.scalars().all()), limit, include_new=offset == 0, include_job=include_job
+        )
     
     async def get_by_id(
         self,
         execution_id: int,
-        include_job: bool = False
+        include_job: bool = False,
+        load_logs: bool = True,
+        from_replica: bool = False
     ) -> JobExecution:
         """
         IDで実行履歴を取得
         
+        出力をログアーカイブへ移した実行は、アーカイブから読んだ出力を stdout / stderr に設定する
+        （変更としては扱わないため、DBには書き戻さない）。
+        
         Args:
             execution_id: 実行ID
             include_job: ジョブ情報を含めるか
+            load_logs: ログアーカイブへ移した出力を読むか
+            from_replica: レプリカから読むか（直近に変更された実行やレプリカにない実行はプライマリから読む）
             
         Returns:
             実行履歴オブジェクト
@@ -78,14 +134,71 @@ class ExecutionService:
         if include_job:
             query = query.options(selectinload(JobExecution.job))
         
-        result = await self.db.execute(query)
-        execution = result.scalar_one_or_none()
+        sessions = [self.db]
+        if (
+            from_replica
+            and self.read_db is not self.db
+            and execution_id not in execution_events.recent_executions()
+        ):
+            sessions.insert(0, self.read_db)
+        execution = None
+        for db in sessions:
+            result = await db.execute(query)
+            execution = result.scalar_one_or_none()
+            if execution:
+                break
         
         if not execution:
             raise ExecutionNotFoundError(f"実行ID {execution_id} が見つかりません")
         
+        if load_logs and execution.log_archive:
+            logs = await asyncio.to_thread(log_archive.read_logs, execution.log_archive)
+            for stream, text in logs.items():
+                set_committed_value(execution, stream, text)
+        
         return execution
     
+    async def read_log(
+        self,
+        execution: JobExecution,
+        stream: str,
+        start: int = 0,
+        end: Optional[int] = None
+    ) -> bytes:
+        """
+        実行の出力の範囲を読む（ログアーカイブへ移した出力は範囲を含むブロックのみ展開する）
+        
+        Args:
+            execution: 実行履歴（get_by_id(load_logs=False) で取得したもの）
+            stream: "stdout" または "stderr"
+            start: 開始位置（バイト）
+            end: 終了位置（バイト、含まない。Noneは末尾）
+            
+        Returns:
+            出力の範囲（UTF-8）
+        """
+        entry = (execution.log_archive or {}).get(stream)
+        if entry is not None:
+            return await asyncio.to_thread(log_archive.read, entry, start, end)
+        return (getattr(execution, stream) or "").encode()[start:end]
+    
+    @staticmethod
+    def log_size(execution: JobExecution, stream: str) -> int:
+        """
+        実行の出力のサイズ
+        
+        Args:
+            execution: 実行履歴
+            stream: "stdout" または "stderr"
+            
+        Returns:
+            出力のバイト数（UTF-8）
+        """
+        entry = (execution.log_archive or {}).get(stream)
+        if entry is not None:
+            return entry["size"]
+        return len((getattr(execution, stream) or "").encode())
+    
     async def get_by_job_id(
         self,
         job_id: int,
@@ -101,20 +214,79 @@ class ExecutionService:
         Returns:
             実行履歴のリスト
         """
-        result = await self.db.execute(
+        result = await self.read_db.execute(
             select(JobExecution)
             .where(JobExecution.job_id == job_id)
             .order_by(desc(JobExecution.created_at))
             .limit(limit)
         )
-        return list(result.scalars().all())
+        return await self._with_recent_writes(list(result.scalars().all()), limit, job_id=job_id)
+    
+    async def _with_recent_writes(
+        self,
+        executions: List[JobExecution],
+        limit: int,
+        job_id: Optional[int] = None,
+        include_new: bool = True,
+        include_job: bool = False
+    ) -> List[JobExecution]:
+        """
+        レプリカから読んだ実行履歴のうち、直近に変更された実行をプライマリから読み直す
+        
+        直前に作成・更新した実行がレプリカに反映されていなくても、最新の状態を返すため。
+        
+        Args:
+            executions: レプリカから読んだ実行履歴（最新順）
+            limit: 取得件数
+            job_id: ジョブIDで絞り込んでいる場合のジョブID
+            include_new: レプリカにない直近の実行も加えるか（先頭のページの場合）
+            include_job: ジョブ情報を含めるか
+            
+        Returns:
+            実行履歴のリスト（最新順）
+        """
+        if self.read_db is self.db:
+            return executions
+        recent = execution_events.recent_executions(job_id)
+        if not include_new:
+            listed = {execution.id for execution in executions}
+            recent = [execution_id for execution_id in recent if execution_id in listed]
+        if not recent:
+            return executions
+        
+        query = select(JobExecution).where(JobExecution.id.in_(recent))
+        if include_job:
+            query = query.options(selectinload(JobExecution.job))
+        result = await self.db.execute(query)
+        fresh = {execution.id: execution for execution in result.scalars().all()}
+        
+        merged = [fresh.pop(execution.id, execution) for execution in executions]
+        if include_new and fresh:
+            merged.extend(fresh.values())
+            merged.sort(key=lambda execution: execution.created_at, reverse=True)
+            merged = merged[:limit]
+        return merged
     
-    async def create_and_execute(self, job_id: int) -> JobExecution:
+    async def create_and_execute(
+        self,
+        job_id: int,
+        parameters: Optional[Dict[str, str]] = None,
+        input_hashes: Optional[Dict[str, str]] = None,
+        pipeline_run_id: Optional[int] = None,
+        pipeline_node_id: Optional[int] = None
+    ) -> JobExecution:
         """
         ジョブを実行し、実行履歴を作成
         
+        ジョブで実行結果キャッシュが有効な場合、同じフィンガープリントで成功した
+        実行が有効期間内にあれば、再実行せずにその結果を参照する実行履歴を作成する。
+        
         Args:
             job_id: 実行するジョブID
+            parameters: パラメータ（環境変数としてスクリプトに渡す）
+            input_hashes: 入力の名前とハッシュ値（フィンガープリントに含める）
+            pipeline_run_id: パイプラインから実行する場合のパイプライン実行ID
+            pipeline_node_id: パイプラインから実行する場合のノードID
             
         Returns:
             実行履歴オブジェクト
@@ -123,29 +295,474 @@ class ExecutionService:
             JobNotFoundError: ジョブが見つからない
         """
         # ジョブとサーバ情報を取得
-        job = await self.job_service.get_by_id(job_id, include_server=True)
+        job = await self.job_service.get_by_id(job_id, cached=True)
+        parameters = parameters or {}
+        
+        # キャッシュ済みの結果があれば再利用
+        fingerprint = None
+        if job.cache_enabled:
+            fingerprint = compute_fingerprint(job, parameters, input_hashes or {})
+            cached = await self.result_cache.find(fingerprint, job.cache_ttl_seconds)
+            if cached:
+                execution = self._build_cached(
+                    job_id, fingerprint, cached, pipeline_run_id, pipeline_node_id
+                )
+                self.db.add(execution)
+                await self.db.commit()
+                await self.db.refresh(execution)
+                execution_events.publish_execution(execution)
+                return execution
         
         # 実行履歴レコードを作成
         execution = JobExecution(
             job_id=job_id,
+            pipeline_run_id=pipeline_run_id,
+            pipeline_node_id=pipeline_node_id,
+            fingerprint=fingerprint,
             status=ExecutionStatus.PENDING,
         )
         
         self.db.add(execution)
         await self.db.commit()
         await self.db.refresh(execution)
+        execution_events.publish_execution(execution)
+        
+        return await self._run(execution, job, parameters)
+    
+    async def trigger(
+        self,
+        job_id: int,
+        parameters: Optional[Dict[str, str]] = None,
+        input_hashes: Optional[Dict[str, str]] = None,
+        idempotency_key: Optional[str] = None
+    ) -> JobExecution:
+        """
+        ジョブの実行を要求し、実行完了まで待って実行履歴を返す
+        
+        同じ冪等キーの要求には、最初の要求で作成した実行履歴を返す。
+        同じジョブ・パラメータ・入力で実行待ち（PENDING）の実行がある場合は
+        新しく実行せずにそれに合流させるため、短時間に集中した要求は1回の実行にまとまる。
+        実行待ちの時間はジョブの coalesce_window_seconds で指定する。
+        
+        Args:
+            job_id: 実行するジョブID
+            parameters: パラメータ（環境変数としてスクリプトに渡す）
+            input_hashes: 入力の名前とハッシュ値（フィンガープリントに含める）
+            idempotency_key: 冪等キー
+            
+        Returns:
+            実行履歴オブジェクト
+            
+        Raises:
+            JobNotFoundError: ジョブが見つからない
+            IdempotencyKeyConflictError: 冪等キーが別のジョブの実行で使われている
+        """
+        execution = await self.enqueue(job_id, parameters, input_hashes, idempotency_key)
+        
+        # 実行が終わるまで待つ（別プロセスで作成された実行は現在の状態を返す）
+        await trigger_coalescer.wait(execution.id)
+        await self.db.refresh(execution)
+        
+        return execution
+    
+    async def enqueue(
+        self,
+        job_id: int,
+        parameters: Optional[Dict[str, str]] = None,
+        input_hashes: Optional[Dict[str, str]] = None,
+        idempotency_key: Optional[str] = None
+    ) -> JobExecution:
+        """
+        ジョブの実行を予約し、完了を待たずに実行履歴を返す
+        
+        冪等キーと実行待ちへの合流は trigger と同じ。
+        
+        Args:
+            job_id: 実行するジョブID
+            parameters: パラメータ（環境変数としてスクリプトに渡す）
+            input_hashes: 入力の名前とハッシュ値（フィンガープリントに含める）
+            idempotency_key: 冪等キー
+            
+        Returns:
+            実行待ち（キャッシュを再利用した場合は成功）の実行履歴
+            
+        Raises:
+            JobNotFoundError: ジョブが見つからない
+            IdempotencyKeyConflictError: 冪等キーが別のジョブの実行で使われている
+        """
+        parameters = parameters or {}
+        input_hashes = input_hashes or {}
+        
+        # 同じジョブへの要求は直列に処理し、実行待ちの確認と作成の間に割り込ませない
+        async with trigger_coalescer.lock(job_id):
+            execution = None
+            if idempotency_key:
+                execution = await self._find_by_idempotency_key(idempotency_key, job_id)
+            if execution is None:
+                execution = await self._find_or_create_pending(
+                    job_id, parameters, input_hashes, idempotency_key
+                )
+        
+        return execution
+    
+    async def execute_pending(self, execution_id: int, parameters: Dict[str, str]) -> JobExecution:
+        """
+        実行待ちの実行履歴のジョブを実行
+        
+        Args:
+            execution_id: 実行ID
+            parameters: パラメータ
+            
+        Returns:
+            実行履歴オブジェクト
+            
+        Raises:
+            ExecutionNotFoundError: 実行履歴が見つからない
+        """
+        execution = await self.get_by_id(execution_id)
+        if execution.status != ExecutionStatus.PENDING:
+            return execution
         
-        # 非同期でジョブを実行
+        try:
+            job = await self.job_service.get_by_id(execution.job_id, cached=True)
+        except JobNotFoundError as e:
+            execution.status = ExecutionStatus.FAILED
+            execution.error_message = str(e)
+            execution.finished_at = datetime.utcnow()
+            await self.db.commit()
+            execution_events.publish_execution(execution)
+            return execution
+        
+        return await self._run(execution, job, parameters)
+    
+    async def _find_by_idempotency_key(self, key: str, job_id: int) -> Optional[JobExecution]:
+        """
+        冪等キーで実行履歴を取得
+        
+        有効期限を過ぎたキーは削除し（コミットは呼び出し元）、新しい要求として扱う。
+        
+        Raises:
+            IdempotencyKeyConflictError: 冪等キーが別のジョブの実行で使われている
+        """
+        result = await self.db.execute(
+            select(JobExecution, ExecutionIdempotencyKey.expires_at <= datetime.utcnow())
+            .join(ExecutionIdempotencyKey, ExecutionIdempotencyKey.execution_id == JobExecution.id)
+            .where(ExecutionIdempotencyKey.key == key)
+        )
+        row = result.one_or_none()
+        if row is None:
+            return None
+        execution, expired = row
+        if expired:
+            await self.db.execute(delete(ExecutionIdempotencyKey).where(ExecutionIdempotencyKey.key == key))
+            return None
+        
+        if execution.job_id != job_id:
+            raise IdempotencyKeyConflictError(
+                f"冪等キー {key} は別のジョブの実行で使用されています"
+            )
+        
+        return execution
+    
+    async def _find_or_create_pending(
+        self,
+        job_id: int,
+        parameters: Dict[str, str],
+        input_hashes: Dict[str, str],
+        idempotency_key: Optional[str]
+    ) -> JobExecution:
+        """
+        同じ内容の実行待ちの実行履歴を取得し、なければ作成して実行を予約
+        
+        Raises:
+            JobNotFoundError: ジョブが見つからない
+            IdempotencyKeyConflictError: 冪等キーが別のジョブの実行で使われている
+        """
+        job = await self.job_service.get_by_id(job_id, cached=True)
+        trigger_hash = compute_trigger_hash(parameters, input_hashes)
+        
+        result = await self.db.execute(
+            select(JobExecution)
+            .where(
+                JobExecution.job_id == job_id,
+                JobExecution.trigger_hash == trigger_hash,
+                JobExecution.status == ExecutionStatus.PENDING
+            )
+            .order_by(JobExecution.id)
+            .limit(1)
+        )
+        execution = result.scalar_one_or_none()
+        dispatch = False
+        created = execution is None
+        
+        if execution is None:
+            fingerprint = None
+            cached = None
+            if job.cache_enabled:
+                fingerprint = compute_fingerprint(job, parameters, input_hashes)
+                cached = await self.result_cache.find(fingerprint, job.cache_ttl_seconds)
+            
+            if cached:
+                execution = self._build_cached(job_id, fingerprint, cached)
+            else:
+                execution = JobExecution(
+                    job_id=job_id,
+                    fingerprint=fingerprint,
+                    status=ExecutionStatus.PENDING,
+                )
+                dispatch = True
+            execution.trigger_hash = trigger_hash
+            self.db.add(execution)
+        
+        if idempotency_key:
+            self.db.add(ExecutionIdempotencyKey(
+                key=idempotency_key,
+                execution=execution,
+                expires_at=datetime.utcnow() + timedelta(seconds=settings.idempotency_key_ttl_seconds),
+            ))
+        
+        try:
+            await self.db.commit()
+        except IntegrityError:
+            if not idempotency_key:
+                raise
+            # 同じ冪等キーの要求が別のジョブ・別プロセスで先に登録された
+            await self.db.rollback()
+            execution = await self._find_by_idempotency_key(idempotency_key, job_id)
+            if execution is None:
+                raise
+            return execution
+        
+        if created:
+            execution_events.publish_execution(execution)
+        if dispatch:
+            window = job.coalesce_window_seconds
+            if window is None:
+                window = settings.execution_coalesce_window_seconds
+            trigger_coalescer.dispatch(
+                execution.id,
+                _execute_pending(execution.id, parameters, window)
+            )
+        
+        return execution
+    
+    async def _run(
+        self,
+        execution: JobExecution,
+        job,
+        parameters: Dict[str, str]
+    ) -> JobExecution:
+        """
+        実行スケジューラで開始順が来るまで待ってから、ジョブを実行
+        
+        待っている間、実行履歴は実行待ち（PENDING）のまま。
+        サーバプールを実行先とするジョブは、ここで最も空いているメンバーに割り当てる。
+        バッチ実行が有効なジョブは、同じサーバへの他の実行とまとめて実行する。
+        
+        Args:
+            execution: 実行待ちの実行履歴
+            job: ジョブ（サーバ・サーバプールの情報を含む）
+            parameters: パラメータ
+            
+        Returns:
+            実行履歴オブジェクト
+        """
+        estimated_seconds = await self._estimate_seconds(job.id)
+        
+        # 開始を待っている間はDB接続を保持しない
+        await self.db.commit()
+        
+        # 割り当てた件数が開始待ちに反映されるまでの間に他の実行が同じ件数を見て
+        # 同じサーバを選ばないよう、ここから slot に入るまでは await しない
+        server = self._place(job)
+        if server is None:
+            execution.status = ExecutionStatus.FAILED
+            execution.error_message = f"サーバプールID {job.server_pool_id} にサーバがありません"
+            execution.finished_at = datetime.utcnow()
+            await self.db.commit()
+            execution_events.publish_execution(execution)
+            return execution
+        # 実行開始時のコミットで保存される（バッチ実行ではバッチの開始時に保存される）
+        execution.server_id = server.id
+        
+        ticket = ExecutionTicket(
+            execution_id=execution.id,
+            server_id=server.id,
+            flow=job.owner or f"job:{job.id}",
+            priority=job.priority or 0,
+            weight=job.weight or 1.0,
+            server_limit=server.max_concurrency or settings.scheduler_server_max_concurrency,
+            adaptive=bool(server.adaptive_concurrency),
+            group=job.concurrency_group,
+            estimated_seconds=estimated_seconds
+        )
+        if ticket.adaptive:
+            # 上限は min_concurrency〜max_concurrency の範囲で調整する
+            concurrency_controller.configure(server.id, server.min_concurrency, server.max_concurrency)
+        
+        if self._batchable(job):
+            # 同じサーバへの実行とまとめて実行し、結果はバッチ側で保存される
+            await execution_batcher.submit(
+                server, execution.id, job.id, self._render_script(job.script, parameters), ticket
+            )
+            await self.db.refresh(execution)
+            return execution
+        
+        timings: Dict[str, float] = {}
+        async with execution_scheduler.slot(ticket):
+            await self._execute(execution, job, server, parameters, timings)
+            
+            if ticket.adaptive:
+                # 接続できない・タイムアウトはサーバの混雑とみなす
+                connection_failed = (
+                    execution.status == ExecutionStatus.TIMEOUT
+                    or (execution.status == ExecutionStatus.FAILED and execution.exit_code is None)
+                )
+                concurrency_controller.observe(
+                    server.id,
+                    connect_seconds=timings.get("connect_seconds"),
+                    duration_seconds=(
+                        execution.duration_seconds
+                        if execution.status == ExecutionStatus.SUCCESS else None
+                    ),
+                    estimated_seconds=ticket.estimated_seconds,
+                    error=connection_failed
+                )
+        
+        return execution
+    
+    @staticmethod
+    def _batchable(job) -> bool:
+        """
+        バッチ実行できるジョブか
+        
+        ワークスペース同期・成果物収集は実行ごとにSFTPセッションを使うため対象外。
+        同時実行グループを指定したジョブは、グループの排他を実行ごとに扱うため対象外。
+        """
+        return bool(
+            job.batch_enabled
+            and not (job.workspace_source and job.workspace_dest)
+            and not job.artifact_patterns
+            and not job.concurrency_group
+        )
+    
+    def _place(self, job) -> Optional[Server]:
+        """
+        ジョブの実行先サーバを決める
+        
+        サーバプールを実行先とするジョブは、このプロセスで割り当て済みの件数と
+        直近の負荷の収集結果から、最も空いているメンバーを選ぶ。
+        
+        Args:
+            job: ジョブ（サーバ・サーバプールの情報を含む）
+            
+        Returns:
+            実行先サーバ、プールにメンバーがない場合はNone
+        """
+        if job.server_pool_id is None:
+            return job.server
+        
+        servers = list(job.server_pool.servers) if job.server_pool else []
+        if not servers:
+            return None
+        
+        return server_load_sampler.choose(servers)
+    
+    async def _estimate_seconds(self, job_id: int) -> float:
+        """
+        ジョブの実行時間を直近の成功した実行から推定
+        
+        Args:
+            job_id: ジョブID
+            
+        Returns:
+            推定実行時間（秒）。実績がない場合は既定値
+        """
+        result = await self.db.execute(
+            select(JobExecution.started_at, JobExecution.finished_at)
+            .where(
+                JobExecution.job_id == job_id,
+                JobExecution.status == ExecutionStatus.SUCCESS,
+                JobExecution.cached_from_execution_id.is_(None),
+                JobExecution.started_at.is_not(None),
+                JobExecution.finished_at.is_not(None)
+            )
+            .order_by(desc(JobExecution.id))
+            .limit(20)
+        )
+        durations = [
+            (finished_at - started_at).total_seconds()
+            for started_at, finished_at in result.all()
+        ]
+        if not durations:
+            return settings.scheduler_default_estimate_seconds
+        return sum(durations) / len(durations)
+    
+    def with_queue_info(self, executions: List[JobExecution]) -> List[JobExecution]:
+        """
+        実行待ちの実行履歴に順番と開始予定時刻を設定
+        
+        Args:
+            executions: 実行履歴のリスト
+            
+        Returns:
+            同じリスト（queue_position・estimated_start_at を設定済み）
+        """
+        infos = execution_scheduler.queue_info(
+            execution.id for execution in executions
+            if execution.status == ExecutionStatus.PENDING
+        )
+        for execution in executions:
+            info = infos.get(execution.id)
+            if info:
+                execution.queue_position, execution.estimated_start_at = info
+        return executions
+    
+    async def _execute(
+        self,
+        execution: JobExecution,
+        job,
+        server: Server,
+        parameters: Dict[str, str],
+        timings: Optional[Dict[str, float]] = None
+    ) -> JobExecution:
+        """
+        実行履歴に対応するジョブを実行し、結果を保存
+        
+        Args:
+            execution: 実行待ちの実行履歴
+            job: ジョブ
+            server: 実行先サーバ
+            parameters: パラメータ
+            timings: SSH接続にかかった時間の記録先
+            
+        Returns:
+            実行履歴オブジェクト
+        """
+        steps = StepTracker()
         try:
             # ステータスを実行中に更新
             execution.status = ExecutionStatus.RUNNING
             execution.started_at = datetime.utcnow()
-            await self.db.commit()
+            execution_writer.stage(execution.id, execution_writer.take_changes(execution))
+            execution_events.publish_execution(execution)
+            
+            # ワークスペースを差分同期
+            if job.workspace_source and job.workspace_dest:
+                sync_result = await workspace_sync_service.sync(
+                    server=server,
+                    source=job.workspace_source,
+                    dest=job.workspace_dest
+                )
+                execution.workspace_bytes_total = sync_result.bytes_total
+                execution.workspace_bytes_transferred = sync_result.bytes_transferred
             
             # SSH経由でスクリプト実行
             exit_code, stdout, stderr = await ssh_service.execute_script(
-                server=job.server,
-                script=job.script
+                server=server,
+                script=self._render_script(job.script, parameters),
+                timings=timings,
+                on_output=lambda stream, data: self._on_output(execution, steps, stream, data)
             )
             
             # 実行結果を保存
@@ -155,6 +772,11 @@ class ExecutionService:
             execution.exit_code = exit_code
             execution.stdout = stdout
             execution.stderr = stderr
+            
+            # 成果物を収集（失敗しても実行結果は変えない）
+            if job.artifact_patterns:
+                await self._collect_artifacts(execution, job, server)
+            
             execution.finished_at = datetime.utcnow()
             
         except SSHConnectionError as e:
@@ -163,6 +785,12 @@ class ExecutionService:
             execution.error_message = str(e)
             execution.finished_at = datetime.utcnow()
             
+        except WorkspaceError as e:
+            # ワークスペースが WORKSPACE_ROOT の外・存在しない
+            execution.status = ExecutionStatus.FAILED
+            execution.error_message = str(e)
+            execution.finished_at = datetime.utcnow()
+            
         except SSHExecutionError as e:
             # SSH実行エラー（タイムアウト等）
             if "タイムアウト" in str(e):
@@ -179,11 +807,102 @@ class ExecutionService:
             execution.finished_at = datetime.utcnow()
         
         finally:
-            await self.db.commit()
-            await self.db.refresh(execution)
+            # 途中で終了した場合（タイムアウト等）はそれまでに受信した出力を残す
+            for stream, data in execution_writer.take_output(execution.id).items():
+                if getattr(execution, stream) is None:
+                    setattr(execution, stream, data)
+            if steps.steps:
+                execution.steps = steps.finish(execution.finished_at)
+            
+            # 成果物の行を先にコミットし、終了状態は書き込みがコミットされるまで待つ
+            changes = execution_writer.take_changes(execution)
+            if self.db.new or self.db.dirty:
+                await self.db.commit()
+            await execution_writer.write(execution.id, changes)
+            execution_events.publish_execution(execution)
         
         return execution
     
+    @staticmethod
+    def _on_output(execution: JobExecution, steps: StepTracker, stream: str, data: str) -> None:
+        """
+        実行中に受信した出力をためて、ステップが始まった場合はステップの記録もためる
+        
+        Args:
+            execution: 実行履歴
+            steps: 実行のステップの検出
+            stream: "stdout" または "stderr"
+            data: 受信した出力
+        """
+        execution_writer.append_output(execution.id, stream, data)
+        if steps.feed(stream, data):
+            execution_writer.stage(execution.id, {"steps": [dict(step) for step in steps.steps]})
+    
+    def _build_cached(
+        self,
+        job_id: int,
+        fingerprint: str,
+        cached: JobExecution,
+        pipeline_run_id: Optional[int] = None,
+        pipeline_node_id: Optional[int] = None
+    ) -> JobExecution:
+        """
+        キャッシュした実行を参照する実行履歴を作成（未保存）
+        
+        出力と成果物は元の実行に残し、cached_from_execution_id で参照する。
+        
+        Args:
+            job_id: ジョブID
+            fingerprint: フィンガープリント
+            cached: 再利用する実行
+            pipeline_run_id: パイプライン実行ID
+            pipeline_node_id: パイプラインノードID
+            
+        Returns:
+            作成された実行履歴
+        """
+        now = datetime.utcnow()
+        return JobExecution(
+            job_id=job_id,
+            pipeline_run_id=pipeline_run_id,
+            pipeline_node_id=pipeline_node_id,
+            fingerprint=fingerprint,
+            cached_from_execution_id=cached.id,
+            status=ExecutionStatus.SUCCESS,
+            exit_code=cached.exit_code,
+            started_at=now,
+            finished_at=now,
+        )
+    
+    @staticmethod
+    def _render_script(script: str, parameters: Dict[str, str]) -> str:
+        """パラメータを環境変数として設定する行をスクリプトの先頭に追加"""
+        if not parameters:
+            return script
+        exports = "".join(
+            f"export {name}={shlex.quote(value)}\n"
+            for name, value in sorted(parameters.items())
+        )
+        return exports + script
+    
+    async def _collect_artifacts(self, execution: JobExecution, job, server: Server) -> None:
+        """
+        ジョブの成果物を収集し、失敗した場合はエラーメッセージに記録
+        
+        Args:
+            execution: 実行履歴
+            job: ジョブ
+            server: 実行したサーバ
+        """
+        try:
+            await self.artifact_service.collect(
+                execution=execution,
+                server=server,
+                patterns=job.artifact_patterns
+            )
+        except Exception as e:
+            execution.error_message = f"成果物の収集に失敗: {str(e)}"
+    
     async def cancel_execution(self, execution_id: int) -> JobExecution:
         """
         実行をキャンセル（将来的な実装）
@@ -207,5 +926,6 @@ class ExecutionService:
             
             await self.db.commit()
             await self.db.refresh(execution)
+            execution_events.publish_execution(execution)
         
         return execution
@@ -0,0 +1,218 @@
+"""
+実行状態の書き込み
+多数の実行の状態遷移と出力を短い間隔でまとめ、1回のトランザクションで更新する
+"""
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import inspect, update
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.execution import JobExecution
+
+logger = logging.getLogger(__name__)
+
+
+class ExecutionWriter:
+    """
+    実行状態の書き込み
+    
+    実行中への遷移や実行中の出力は stage / append_output でためておき、一定間隔
+    （または一定件数に達した時点）で全実行分を主キー指定のまとめた UPDATE として
+    1回のトランザクションでコミットする。同じ実行への複数の変更は最新の値に合流する。
+    終了状態は write で書き込み、コミットされるまで待つため、呼び出し元が完了を
+    返す時点で結果は永続化されている。
+    """
+    
+    def __init__(self):
+        self._pending: Dict[int, Dict[str, Any]] = {}
+        self._outputs: Dict[int, Dict[str, List[str]]] = {}
+        self._dirty_outputs: Dict[int, set] = {}
+        self._waiters: Dict[int, List[asyncio.Future]] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+    
+    @staticmethod
+    def take_changes(execution: JobExecution) -> Dict[str, Any]:
+        """
+        実行履歴のうち未保存の変更を取り出し、保存済みとして扱う
+        
+        セッションのコミットでは書き込まず、このクラスで書き込むために使う。
+        
+        Args:
+            execution: 実行履歴（セッションに属していること）
+            
+        Returns:
+            変更された列と値の辞書
+        """
+        state = inspect(execution)
+        changes = {}
+        for attr in state.mapper.column_attrs:
+            history = state.attrs[attr.key].history
+            if history.added:
+                changes[attr.key] = history.added[0]
+        for key, value in changes.items():
+            set_committed_value(execution, key, value)
+        return changes
+    
+    def stage(self, execution_id: int, values: Dict[str, Any]) -> None:
+        """
+        実行状態の変更をためる（次の書き込みでコミットする。完了は待たない）
+        
+        Args:
+            execution_id: 実行ID
+            values: 変更する列と値
+        """
+        if not values:
+            return
+        self._pending.setdefault(execution_id, {}).update(values)
+        self._notify()
+    
+    def append_output(self, execution_id: int, stream: str, data: str) -> None:
+        """
+        実行中に受信した出力を追加（次の書き込みでそれまでの出力全体を保存する）
+        
+        Args:
+            execution_id: 実行ID
+            stream: "stdout" または "stderr"
+            data: 受信した出力
+        """
+        self._outputs.setdefault(execution_id, {}).setdefault(stream, []).append(data)
+        self._dirty_outputs.setdefault(execution_id, set()).add(stream)
+        self._notify()
+    
+    def take_output(self, execution_id: int) -> Dict[str, str]:
+        """
+        実行中に受信した出力を取り出す（以降は書き込まない）
+        
+        Args:
+            execution_id: 実行ID
+            
+        Returns:
+            ストリーム名ごとのそれまでの出力全体
+        """
+        self._dirty_outputs.pop(execution_id, None)
+        outputs = self._outputs.pop(execution_id, {})
+        return {stream: "".join(chunks) for stream, chunks in outputs.items()}
+    
+    async def write(self, execution_id: int, values: Dict[str, Any]) -> None:
+        """
+        実行状態の変更を書き込み、コミットされるまで待つ
+        
+        ためている変更も同じトランザクションでコミットする。
+        実行中に受信した出力は破棄する（最終的な出力は values に含める）。
+        
+        Args:
+            execution_id: 実行ID
+            values: 変更する列と値
+            
+        Raises:
+            Exception: 書き込みに失敗した（変更は次の書き込みで再試行する）
+        """
+        self.take_output(execution_id)
+        self._pending.setdefault(execution_id, {}).update(values)
+        
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(execution_id, []).append(future)
+        self._notify()
+        await future
+    
+    async def stop(self) -> None:
+        """ためている変更を書き込んで停止（アプリケーション終了時）"""
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        if self._pending or self._dirty_outputs:
+            try:
+                await self._flush()
+            except Exception:
+                logger.exception("実行状態の書き込みに失敗しました")
+    
+    def _notify(self) -> None:
+        """書き込みループを起こす（未起動なら起動する）"""
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._loop())
+        self._wakeup.set()
+    
+    def _size(self) -> int:
+        """ためている変更の実行数"""
+        return len(self._pending.keys() | self._dirty_outputs.keys())
+    
+    async def _loop(self) -> None:
+        """変更があれば一定間隔（または一定件数に達した時点）で書き込む"""
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            
+            # 間隔の間に届いた変更をまとめる（件数に達したらすぐ書き込む）
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + settings.execution_write_interval
+            while self._size() < settings.execution_write_batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+                self._wakeup.clear()
+            
+            try:
+                await self._flush()
+            except Exception:
+                logger.exception("実行状態の書き込みに失敗しました")
+                await asyncio.sleep(settings.execution_write_interval)
+                if self._pending or self._dirty_outputs:
+                    self._wakeup.set()
+    
+    async def _flush(self) -> None:
+        """
+        ためている変更を1回のトランザクションで書き込み、待っている呼び出しに通知
+        
+        失敗した場合は変更を戻し（その後の変更を優先する）、待っている呼び出しに例外を渡す。
+        """
+        pending, self._pending = self._pending, {}
+        waiters, self._waiters = self._waiters, {}
+        dirty, self._dirty_outputs = self._dirty_outputs, {}
+        
+        for execution_id, streams in dirty.items():
+            outputs = self._outputs.get(execution_id, {})
+            values = pending.setdefault(execution_id, {})
+            for stream in streams:
+                values[stream] = "".join(outputs.get(stream, []))
+        
+        if pending:
+            try:
+                async with AsyncSessionLocal() as db:
+                    await db.execute(
+                        update(JobExecution),
+                        [{"id": execution_id, **values} for execution_id, values in pending.items()]
+                    )
+                    await db.commit()
+            except BaseException as e:
+                for execution_id, values in pending.items():
+                    values.update(self._pending.get(execution_id, {}))
+                    self._pending[execution_id] = values
+                for futures in waiters.values():
+                    for future in futures:
+                        if future.done():
+                            continue
+                        if isinstance(e, asyncio.CancelledError):
+                            future.cancel()
+                        else:
+                            future.set_exception(e)
+                raise
+        
+        for futures in waiters.values():
+            for future in futures:
+                if not future.done():
+                    future.set_result(None)
+
+
+# シングルトンインスタンス
+execution_writer = ExecutionWriter()
@@ -5,11 +5,15 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from sqlalchemy.orm import selectinload
-from typing import List
+from typing import List, Optional
 
 from app.models.job import Job
+from app.models.execution import JobExecution
 from app.schemas.job import JobCreate, JobUpdate
 from app.services.server_service import ServerService, ServerNotFoundError
+from app.services.server_pool_service import ServerPoolService, ServerPoolNotFoundError
+from app.services.definition_cache import definition_cache
+from app.services.workspace_sync import resolve_workspace
 
 
 class JobNotFoundError(Exception):
@@ -17,38 +21,49 @@ class JobNotFoundError(Exception):
     pass
 
 
+class InvalidJobTargetError(Exception):
+    """実行先（サーバ・サーバプール）の指定が不正"""
+    pass
+
+
 class JobService:
     """ジョブ管理サービス"""
     
     def __init__(self, db: AsyncSession):
         self.db = db
         self.server_service = ServerService(db)
+        self.server_pool_service = ServerPoolService(db)
     
-    async def get_all(self, include_server: bool = False) -> List[Job]:
+    async def get_all(self, include_server: bool = False, include_last_execution: bool = False) -> List[Job] | List[dict]:
         """
         全ジョブを取得
         
         Args:
-            include_server: サーバ情報を含めるか
+            include_server: サーバ・サーバプール情報を含めるか（include_last_execution と同時には使えない）
+            include_last_execution: 最新の実行の概要（last_execution）を含めるか
             
         Returns:
-            ジョブのリスト
+            ジョブのリスト（include_last_execution の場合は辞書のリスト）
         """
         query = select(Job)
         
         if include_server:
-            query = query.options(selectinload(Job.server))
+            query = query.options(selectinload(Job.server), selectinload(Job.server_pool))
+        
+        if include_last_execution:
+            return await self._with_last_execution(query)
         
         result = await self.db.execute(query)
         return list(result.scalars().all())
     
-    async def get_by_id(self, job_id: int, include_server: bool = False) -> Job:
+    async def get_by_id(self, job_id: int, include_server: bool = False, cached: bool = False) -> Job:
         """
         IDでジョブを取得
         
         Args:
             job_id: ジョブID
-            include_server: サーバ情報を含めるか
+            include_server: サーバ・サーバプール情報を含めるか
+            cached: 定義キャッシュを使うか（サーバ・サーバプール情報を含む。参照のみの場合に使う）
             
         Returns:
             ジョブオブジェクト
@@ -58,31 +73,101 @@ class JobService:
         """
         query = select(Job).where(Job.id == job_id)
         
-        if include_server:
-            query = query.options(selectinload(Job.server))
+        if include_server or cached:
+            query = query.options(selectinload(Job.server), selectinload(Job.server_pool))
         
-        result = await self.db.execute(query)
-        job = result.scalar_one_or_none()
+        async def load(db: AsyncSession) -> Optional[Job]:
+            result = await db.execute(query)
+            return result.scalar_one_or_none()
+        
+        if cached:
+            job = await definition_cache.get(self.db, "job", job_id, load)
+        else:
+            job = await load(self.db)
         
         if not job:
             raise JobNotFoundError(f"ジョブID {job_id} が見つかりません")
         
         return job
     
-    async def get_by_server_id(self, server_id: int) -> List[Job]:
+    def get_definition_cache_stats(self) -> List[dict]:
+        """
+        定義キャッシュ（ジョブ・サーバ）の統計を取得
+        
+        Returns:
+            定義の種類ごとのヒット数・ミス数・ヒット率等の辞書のリスト
+        """
+        return definition_cache.stats()
+    
+    async def get_by_server_id(self, server_id: int, include_last_execution: bool = False) -> List[Job] | List[dict]:
         """
         サーバIDでジョブを取得
         
         Args:
             server_id: サーバID
+            include_last_execution: 最新の実行の概要（last_execution）を含めるか
             
         Returns:
-            ジョブのリスト
+            ジョブのリスト（include_last_execution の場合は辞書のリスト）
         """
+        query = select(Job).where(Job.server_id == server_id)
+        
+        if include_last_execution:
+            return await self._with_last_execution(query)
+        
+        result = await self.db.execute(query)
+        return list(result.scalars().all())
+    
+    async def _with_last_execution(self, query) -> List[dict]:
+        """
+        ジョブと最新の実行の概要を1回のクエリで取得
+        
+        ジョブごとに (job_id, id) のインデックスで最新の実行IDだけを引き、その実行の
+        概要の列（出力は含まない）を結合する。一覧は件数が多いため、ORMのオブジェクトを
+        組み立てずに列の値をそのまま辞書にする。
+        
+        Args:
+            query: ジョブを取得するクエリ
+            
+        Returns:
+            ジョブの列と last_execution（LastExecutionSummary と同じ項目の辞書。
+            実行がなければNone）の辞書のリスト
+        """
+        latest_id = (
+            select(JobExecution.id)
+            .where(JobExecution.job_id == Job.id)
+            .order_by(JobExecution.id.desc())
+            .limit(1)
+            .correlate(Job)
+            .scalar_subquery()
+        )
+        summary_columns = [
+            JobExecution.id,
+            JobExecution.status,
+            JobExecution.exit_code,
+            JobExecution.created_at,
+            JobExecution.started_at,
+            JobExecution.finished_at,
+        ]
         result = await self.db.execute(
-            select(Job).where(Job.server_id == server_id)
+            query
+            .with_only_columns(
+                *Job.__table__.columns,
+                *(column.label(f"last_execution_{column.key}") for column in summary_columns)
+            )
+            .outerjoin(JobExecution, JobExecution.id == latest_id)
+            .order_by(Job.id)
         )
-        return list(result.scalars().all())
+        
+        job_keys = [column.key for column in Job.__table__.columns]
+        summary_keys = [column.key for column in summary_columns]
+        jobs = []
+        for row in result.all():
+            job = dict(zip(job_keys, row))
+            summary = row[len(job_keys):]
+            job["last_execution"] = None if summary[0] is None else dict(zip(summary_keys, summary))
+            jobs.append(job)
+        return jobs
     
     async def create(self, job_data: JobCreate) -> Job:
         """
@@ -96,16 +181,34 @@ class JobService:
             
         Raises:
             ServerNotFoundError: サーバが見つからない
+            ServerPoolNotFoundError: サーバプールが見つからない
+            WorkspaceError: ワークスペースが WORKSPACE_ROOT の外
         """
-        # サーバの存在確認
-        await self.server_service.get_by_id(job_data.server_id)
+        # 実行先の存在確認
+        await self._validate_target(job_data.server_id, job_data.server_pool_id)
+        if job_data.workspace_source:
+            resolve_workspace(job_data.workspace_source)
         
         # ジョブオブジェクトを作成
         job = Job(
             name=job_data.name,
             description=job_data.description,
             script=job_data.script,
-            server_id=job_data.server_id
+            server_id=job_data.server_id,
+            server_pool_id=job_data.server_pool_id,
+            artifact_patterns=job_data.artifact_patterns,
+            workspace_source=job_data.workspace_source,
+            workspace_dest=job_data.workspace_dest,
+            cache_enabled=job_data.cache_enabled,
+            cache_ttl_seconds=job_data.cache_ttl_seconds,
+            coalesce_window_seconds=job_data.coalesce_window_seconds,
+            batch_enabled=job_data.batch_enabled,
+            priority=job_data.priority,
+            weight=job_data.weight,
+            owner=job_data.owner,
+            concurrency_group=job_data.concurrency_group,
+            trigger_repository=job_data.trigger_repository,
+            trigger_branch=job_data.trigger_branch
         )
         
         self.db.add(job)
@@ -128,22 +231,38 @@ class JobService:
         Raises:
             JobNotFoundError: ジョブが見つからない
             ServerNotFoundError: サーバが見つからない
+            ServerPoolNotFoundError: サーバプールが見つからない
+            InvalidJobTargetError: 実行先の指定が不正
+            WorkspaceError: ワークスペースが WORKSPACE_ROOT の外
         """
         job = await self.get_by_id(job_id)
         
         # 更新データを適用
         update_dict = job_data.model_dump(exclude_unset=True)
+        if update_dict.get("workspace_source"):
+            resolve_workspace(update_dict["workspace_source"])
         
-        # サーバIDの変更がある場合は存在確認
-        if "server_id" in update_dict:
-            await self.server_service.get_by_id(update_dict["server_id"])
+        # 実行先の変更がある場合は存在確認（サーバとプールは一方のみ）
+        if "server_id" in update_dict or "server_pool_id" in update_dict:
+            server_id = update_dict.get("server_id", job.server_id)
+            server_pool_id = update_dict.get("server_pool_id", job.server_pool_id)
+            if "server_id" in update_dict and "server_pool_id" not in update_dict and server_id is not None:
+                # サーバを指定した場合はプールの指定を外す
+                server_pool_id = update_dict["server_pool_id"] = None
+            elif "server_pool_id" in update_dict and "server_id" not in update_dict and server_pool_id is not None:
+                server_id = update_dict["server_id"] = None
+            if (server_id is None) == (server_pool_id is None):
+                raise InvalidJobTargetError("server_id と server_pool_id のどちらか一方を指定してください")
+            await self._validate_target(server_id, server_pool_id)
         
         # フィールドを更新
         for key, value in update_dict.items():
             if hasattr(job, key):
                 setattr(job, key, value)
         
+        await definition_cache.publish(self.db, "job", job_id)
         await self.db.commit()
+        definition_cache.invalidate("job", job_id)
         await self.db.refresh(job)
         
         return job
@@ -161,4 +280,19 @@ class JobService:
         job = await self.get_by_id(job_id)
         
         await self.db.delete(job)
+        await definition_cache.publish(self.db, "job", job_id)
         await self.db.commit()
+        definition_cache.invalidate("job", job_id)
+    
+    async def _validate_target(self, server_id: Optional[int], server_pool_id: Optional[int]) -> None:
+        """
+        実行先の存在確認
+        
+        Raises:
+            ServerNotFoundError: サーバが見つからない
+            ServerPoolNotFoundError: サーバプールが見つからない
+        """
+        if server_id is not None:
+            await self.server_service.get_by_id(server_id, cached=True)
+        if server_pool_id is not None:
+            await self.server_pool_service.get_by_id(server_pool_id)
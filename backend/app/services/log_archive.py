@@ -0,0 +1,489 @@
+"""
+ログアーカイブ
+古い実行の出力をDBから追記専用のセグメントファイルへ移し、必要なブロックだけを展開して読む
+"""
+import asyncio
+import logging
+import mmap
+import os
+import secrets
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Hashable, List, Optional, Tuple
+
+from sqlalchemy import select, update, or_, func
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.execution import JobExecution
+from app.services.rollup_service import FINAL_STATUSES
+
+logger = logging.getLogger(__name__)
+
+# アーカイブするストリーム
+STREAMS = ("stdout", "stderr")
+
+# この時間（秒）追記していないセグメントには追記せず、新しいセグメントにする
+SEGMENT_IDLE_SECONDS = 3600.0
+# 削除・詰め直しの対象にするセグメントの最終更新からの時間（秒）
+# 追記をやめるまでの時間より十分長くし、書き込み中のセグメントを対象にしない
+COMPACT_MIN_AGE_SECONDS = SEGMENT_IDLE_SECONDS * 2
+
+
+def archived_bytes(log_archive: dict) -> int:
+    """実行のインデックスが参照するセグメント内のバイト数（圧縮後）"""
+    return sum(length for entry in log_archive.values() for _, length in entry["blocks"])
+
+
+def archived_size(log_archive: dict) -> int:
+    """実行のインデックスが参照する出力のバイト数（圧縮前）"""
+    return sum(entry["size"] for entry in log_archive.values())
+
+
+class LogArchive:
+    """
+    ログのセグメントファイル
+    
+    出力は一定サイズ（LOG_ARCHIVE_BLOCK_SIZE）のブロックに分けてブロックごとに zlib で圧縮し、
+    セグメントファイルの末尾に追記する。実行ごとのインデックス（セグメント名と各ブロックの
+    位置・圧縮後の長さ）は JobExecution.log_archive に保存する。
+    読み込みはセグメントファイルをメモリマップし、要求された範囲を含むブロックだけを展開する。
+    セグメントはプロセスごとに別のファイルに書くため、複数のワーカーが同じディレクトリに
+    追記しても衝突しない（ワーカー間でディレクトリを共有している前提）。
+    しばらく追記していないセグメントには追記しないため、最終更新から十分時間の経った
+    セグメントは書き込み中でないとみなして削除・詰め直しができる。
+    """
+    
+    def __init__(self):
+        self._segment: Optional[Path] = None
+        self._maps: "OrderedDict[str, Tuple[object, mmap.mmap]]" = OrderedDict()
+        self._write_lock = threading.Lock()
+        self._map_lock = threading.Lock()
+    
+    @property
+    def directory(self) -> Path:
+        """セグメントファイルのディレクトリ"""
+        return Path(settings.log_archive_dir)
+    
+    def append(self, logs: Dict[Tuple[int, str], str]) -> Dict[Tuple[int, str], dict]:
+        """
+        出力をセグメントファイルに追記（ディスクに書き込んでから返す）
+        
+        Args:
+            logs: (実行ID, ストリーム名) ごとの出力
+            
+        Returns:
+            (実行ID, ストリーム名) ごとのインデックス
+        """
+        block_size = settings.log_archive_block_size
+        items = {}
+        for key, text in logs.items():
+            data = text.encode()
+            items[key] = (len(data), block_size, [
+                zlib.compress(data[start:start + block_size], settings.log_archive_compression_level)
+                for start in range(0, len(data), block_size)
+            ])
+        return self._write(items)
+    
+    def copy(self, entries: Dict[Hashable, dict]) -> Dict[Hashable, dict]:
+        """
+        アーカイブした出力を圧縮したまま現在のセグメントへ複製（詰め直しに使う）
+        
+        Args:
+            entries: キーごとのインデックス
+            
+        Returns:
+            キーごとの複製先のインデックス
+        """
+        return self._write({
+            key: (
+                entry["size"],
+                entry["block_size"],
+                self._read_blocks(entry["segment"], entry["blocks"]) if entry["blocks"] else [],
+            )
+            for key, entry in entries.items()
+        })
+    
+    def idle_segments(self) -> List[Tuple[str, int]]:
+        """
+        削除・詰め直しの対象にできるセグメント（最終更新から十分時間の経ったもの）
+        
+        Returns:
+            (セグメント名, バイト数) のリスト
+        """
+        if not self.directory.is_dir():
+            return []
+        segments = []
+        for path in self.directory.glob("segment-*.log"):
+            stat = path.stat()
+            if time.time() - stat.st_mtime >= COMPACT_MIN_AGE_SECONDS:
+                segments.append((path.name, stat.st_size))
+        return segments
+    
+    def remove(self, segment: str) -> None:
+        """
+        セグメントを削除（削除の直前に書き込まれていないことを確認する）
+        
+        Args:
+            segment: セグメント名
+        """
+        path = self.directory / segment
+        with self._map_lock:
+            item = self._maps.pop(segment, None)
+            if item is not None:
+                item[1].close()
+                item[0].close()
+        try:
+            if time.time() - path.stat().st_mtime >= COMPACT_MIN_AGE_SECONDS:
+                path.unlink()
+        except FileNotFoundError:
+            # 他のワーカーが削除した
+            pass
+    
+    def read(self, entry: dict, start: int = 0, end: Optional[int] = None) -> bytes:
+        """
+        アーカイブした出力の範囲を読む（範囲を含むブロックのみ展開する）
+        
+        Args:
+            entry: インデックス
+            start: 開始位置（バイト）
+            end: 終了位置（バイト、含まない。Noneは末尾）
+            
+        Returns:
+            出力の範囲（UTF-8）
+        """
+        end = entry["size"] if end is None else min(end, entry["size"])
+        if start >= end:
+            return b""
+        block_size = entry["block_size"]
+        first, last = start // block_size, (end - 1) // block_size
+        data = b"".join(
+            zlib.decompress(block)
+            for block in self._read_blocks(entry["segment"], entry["blocks"][first:last + 1])
+        )
+        skip = first * block_size
+        return data[start - skip:end - skip]
+    
+    def read_logs(self, log_archive: dict) -> Dict[str, str]:
+        """
+        アーカイブした出力をすべて読む
+        
+        Args:
+            log_archive: JobExecution.log_archive（ストリーム名ごとのインデックス）
+            
+        Returns:
+            ストリーム名ごとの出力
+        """
+        return {
+            stream: self.read(entry).decode(errors="replace")
+            for stream, entry in log_archive.items()
+        }
+    
+    def close(self) -> None:
+        """メモリマップを閉じる"""
+        with self._map_lock:
+            while self._maps:
+                _, (f, mapped) = self._maps.popitem()
+                mapped.close()
+                f.close()
+    
+    def _write(self, items: Dict[Hashable, Tuple[int, int, List[bytes]]]) -> Dict[Hashable, dict]:
+        """
+        圧縮したブロックをセグメントファイルに追記（ディスクに書き込んでから返す）
+        
+        Args:
+            items: キーごとの (出力のバイト数, ブロックのサイズ, 圧縮したブロックのリスト)
+            
+        Returns:
+            キーごとのインデックス
+        """
+        with self._write_lock:
+            path = self._writable_segment()
+            entries = {}
+            with open(path, "ab") as f:
+                offset = f.tell()
+                for key, (size, block_size, blocks) in items.items():
+                    positions = []
+                    for block in blocks:
+                        f.write(block)
+                        positions.append([offset, len(block)])
+                        offset += len(block)
+                    entries[key] = {
+                        "segment": path.name,
+                        "size": size,
+                        "block_size": block_size,
+                        "blocks": positions,
+                    }
+                f.flush()
+                os.fsync(f.fileno())
+            return entries
+    
+    def _writable_segment(self) -> Path:
+        """
+        追記するセグメント
+        
+        上限のサイズに達したセグメント・しばらく追記していない（削除・詰め直しの対象になりうる）
+        セグメント・削除されたセグメントには追記せず、新しいセグメントにする。
+        """
+        rotate = self._segment is None
+        if not rotate:
+            try:
+                stat = self._segment.stat()
+                rotate = (
+                    stat.st_size >= settings.log_archive_segment_size
+                    or time.time() - stat.st_mtime >= SEGMENT_IDLE_SECONDS
+                )
+            except FileNotFoundError:
+                rotate = True
+        if rotate:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            name = f"segment-{datetime.utcnow():%Y%m%d%H%M%S}-{secrets.token_hex(4)}.log"
+            self._segment = self.directory / name
+        return self._segment
+    
+    def _read_blocks(self, segment: str, blocks: list) -> list:
+        """
+        セグメントのメモリマップから圧縮したブロックを取り出す
+        
+        マップは開いたまま再利用し、追記された範囲を読む場合はマップし直す。
+        閉じたマップを読まないよう、取り出し（コピー）まではロックを保持する。
+        """
+        with self._map_lock:
+            item = self._maps.get(segment)
+            if item is not None and len(item[1]) < blocks[-1][0] + blocks[-1][1]:
+                self._maps.pop(segment)
+                item[1].close()
+                item[0].close()
+                item = None
+            if item is None:
+                f = open(self.directory / segment, "rb")
+                item = (f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+                self._maps[segment] = item
+                while len(self._maps) > settings.log_archive_max_open_segments:
+                    _, (old_file, old_map) = self._maps.popitem(last=False)
+                    old_map.close()
+                    old_file.close()
+            else:
+                self._maps.move_to_end(segment)
+            mapped = item[1]
+            return [mapped[offset:offset + length] for offset, length in blocks]
+
+
+class LogArchiver:
+    """
+    ログのアーカイブワーカー
+    
+    LOG_ARCHIVE_AFTER_DAYS より前に終了した実行の出力を一定間隔ごとにセグメントファイルへ移し、
+    DBの stdout / stderr を空にする。あわせて、どの実行からも参照されなくなったセグメント
+    （実行履歴の削除などによる）を削除し、参照されている部分が少ないセグメントは詰め直す。
+    """
+    
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+    
+    def start(self) -> None:
+        """アーカイブループを開始"""
+        if self._task is None and settings.log_archive_after_days > 0:
+            self._task = asyncio.create_task(self._loop())
+    
+    async def stop(self) -> None:
+        """アーカイブループを停止"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        log_archive.close()
+    
+    async def archive_batch(self, limit: Optional[int] = None) -> int:
+        """
+        古い実行の出力をセグメントファイルへ移す（1回のトランザクション）
+        
+        セグメントファイルに書き込んでからDBを更新するため、途中で失敗しても出力は失われない
+        （セグメントに使われない領域が残るだけ）。
+        
+        Args:
+            limit: 1回に移す最大実行数（Noneは設定値）
+            
+        Returns:
+            移した実行数
+        """
+        cutoff = datetime.utcnow() - timedelta(days=settings.log_archive_after_days)
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(JobExecution.id, JobExecution.stdout, JobExecution.stderr)
+                .where(
+                    JobExecution.finished_at < cutoff,
+                    JobExecution.status.in_(FINAL_STATUSES),
+                    JobExecution.log_archive.is_(None),
+                    or_(JobExecution.stdout.is_not(None), JobExecution.stderr.is_not(None)),
+                )
+                .order_by(JobExecution.id)
+                .limit(limit or settings.log_archive_batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            rows = result.all()
+            if not rows:
+                return 0
+            
+            logs = {
+                (row.id, stream): getattr(row, stream)
+                for row in rows
+                for stream in STREAMS
+                if getattr(row, stream) is not None
+            }
+            entries = await asyncio.to_thread(log_archive.append, logs)
+            await db.execute(
+                update(JobExecution),
+                [
+                    _archive_values(row.id, {
+                        stream: entries[(row.id, stream)] for stream in STREAMS if (row.id, stream) in entries
+                    }, stdout=None, stderr=None)
+                    for row in rows
+                ]
+            )
+            await db.commit()
+            return len(rows)
+    
+    async def backfill_batch(self, limit: Optional[int] = None) -> int:
+        """
+        セグメント名を記録していない（セグメントの削除に対応する前に移した）実行に記録する
+        
+        Args:
+            limit: 1回に記録する最大実行数（Noneは設定値）
+            
+        Returns:
+            記録した実行数
+        """
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(JobExecution.id, JobExecution.log_archive)
+                .where(JobExecution.log_archive.is_not(None), JobExecution.log_segment.is_(None))
+                .limit(limit or settings.log_archive_batch_size)
+            )
+            rows = result.all()
+            if not rows:
+                return 0
+            await db.execute(
+                update(JobExecution),
+                [_archive_values(row.id, row.log_archive) for row in rows]
+            )
+            await db.commit()
+            return len(rows)
+    
+    async def compact(self) -> Tuple[int, int]:
+        """
+        参照されなくなったセグメントを削除し、参照されている部分が少ないセグメントを詰め直す
+        
+        対象は最終更新から十分時間の経ったセグメントのみ。詰め直しでは参照されている出力を
+        圧縮したまま現在のセグメントへ複製して実行のインデックスを更新し、元のセグメントは
+        参照がなくなった後の回で削除する（読み込み中の実行が元のセグメントを読み終えられるよう）。
+        
+        Returns:
+            (削除したセグメント数, 詰め直した実行数)
+        """
+        segments = await asyncio.to_thread(log_archive.idle_segments)
+        if not segments:
+            return 0, 0
+        
+        async with AsyncSessionLocal() as db:
+            # セグメント名を記録していない実行が残っている間は参照を判定できない
+            unrecorded = await db.scalar(
+                select(JobExecution.id)
+                .where(JobExecution.log_archive.is_not(None), JobExecution.log_segment.is_(None))
+                .limit(1)
+            )
+            if unrecorded is not None:
+                return 0, 0
+            result = await db.execute(
+                select(JobExecution.log_segment, func.sum(JobExecution.log_archive_bytes))
+                .where(JobExecution.log_segment.in_([name for name, _ in segments]))
+                .group_by(JobExecution.log_segment)
+            )
+            live = {name: total or 0 for name, total in result.all()}
+        
+        removed = relocated = 0
+        for name, size in segments:
+            live_bytes = live.get(name, 0)
+            if live_bytes == 0:
+                await asyncio.to_thread(log_archive.remove, name)
+                removed += 1
+                logger.info("参照されなくなったセグメント %s（%d バイト）を削除しました", name, size)
+            elif live_bytes < size * settings.log_archive_compact_ratio:
+                while True:
+                    count = await self._relocate_batch(name)
+                    relocated += count
+                    if count < settings.log_archive_batch_size:
+                        break
+                logger.info(
+                    "セグメント %s を詰め直しました（%d / %d バイトを移動）", name, live_bytes, size
+                )
+        return removed, relocated
+    
+    async def _relocate_batch(self, segment: str) -> int:
+        """
+        セグメントを参照している実行の出力を現在のセグメントへ移す（1回のトランザクション）
+        
+        Args:
+            segment: 移動元のセグメント名
+            
+        Returns:
+            移した実行数
+        """
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(JobExecution.id, JobExecution.log_archive)
+                .where(JobExecution.log_segment == segment)
+                .order_by(JobExecution.id)
+                .limit(settings.log_archive_batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            rows = result.all()
+            if not rows:
+                return 0
+            entries = await asyncio.to_thread(log_archive.copy, {
+                (row.id, stream): entry for row in rows for stream, entry in row.log_archive.items()
+            })
+            await db.execute(
+                update(JobExecution),
+                [
+                    _archive_values(row.id, {
+                        stream: entries[(row.id, stream)] for stream in row.log_archive
+                    })
+                    for row in rows
+                ]
+            )
+            await db.commit()
+            return len(rows)
+    
+    async def _loop(self) -> None:
+        """一定間隔ごとに古い実行の出力を移し、不要になったセグメントを削除・詰め直す"""
+        while True:
+            try:
+                while await self.archive_batch() >= settings.log_archive_batch_size:
+                    pass
+                while await self.backfill_batch() >= settings.log_archive_batch_size:
+                    pass
+                await self.compact()
+            except Exception:
+                logger.exception("実行の出力のアーカイブに失敗しました")
+            await asyncio.sleep(settings.log_archive_interval)
+
+
+def _archive_values(execution_id: int, entries: Dict[str, dict], **values) -> dict:
+    """実行のインデックスと参照するセグメントの更新値"""
+    return {
+        "id": execution_id,
+        "log_archive": entries,
+        "log_segment": next((entry["segment"] for entry in entries.values()), None),
+        "log_archive_bytes": archived_bytes(entries),
+        **values,
+    }
+
+
+# シングルトンインスタンス
+log_archive = LogArchive()
+log_archiver = LogArchiver()
@@ -0,0 +1,337 @@
+"""
+パイプラインスケジューラ
+DAGの各ノードを依存ノードの成功後すぐに、並列数の上限内で実行する
+"""
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import selectinload
+
+from app.core.database import AsyncSessionLocal
+from app.models.execution import JobExecution, ExecutionStatus
+from app.models.pipeline import Pipeline, PipelineRun
+from app.services.execution_service import ExecutionService
+from app.services.execution_events import execution_events
+
+logger = logging.getLogger(__name__)
+
+
+def topological_order(dependencies: Dict[str, List[str]]) -> List[str]:
+    """
+    依存関係をトポロジカル順に並べる
+    
+    Args:
+        dependencies: ノード名 -> 依存するノード名のリスト
+        
+    Returns:
+        依存先が常に先に来るノード名のリスト
+        
+    Raises:
+        ValueError: 循環している、または存在しないノードに依存している
+    """
+    for name, deps in dependencies.items():
+        for dep in deps:
+            if dep not in dependencies:
+                raise ValueError(f"ノード {name} の依存先 {dep} が存在しません")
+    
+    remaining = {name: set(deps) for name, deps in dependencies.items()}
+    order: List[str] = []
+    while remaining:
+        ready = sorted(name for name, deps in remaining.items() if not deps)
+        if not ready:
+            raise ValueError(f"依存関係が循環しています: {', '.join(sorted(remaining))}")
+        for name in ready:
+            order.append(name)
+            del remaining[name]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+    return order
+
+
+@dataclass
+class _Node:
+    """スケジューリング用のノード情報（セッションから切り離したもの）"""
+    id: int
+    name: str
+    job_id: int
+    depends_on: List[str]
+
+
+class PipelineScheduler:
+    """
+    パイプラインスケジューラ
+    
+    ノードは依存するノードがすべて成功した時点で起動し、同時実行数は
+    パイプラインの max_parallel で制限する。ノードが失敗した場合は、
+    その下流のノードを実行せずキャンセル扱いの実行履歴として記録する。
+    各ノードは独立したDBセッションで実行する。
+    """
+    
+    def __init__(self):
+        self._tasks: Set[asyncio.Task] = set()
+        self._run_ids: Set[int] = set()
+    
+    def start(self, run_id: int) -> None:
+        """
+        パイプライン実行をバックグラウンドで開始
+        
+        Args:
+            run_id: パイプライン実行ID
+        """
+        task = asyncio.create_task(self.run(run_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def shutdown(self) -> None:
+        """
+        実行中のパイプラインを中断（アプリケーション終了時）
+        
+        中断したノードの実行は実行中のまま残らないようキャンセルとして記録する。
+        """
+        run_ids = set(self._run_ids)
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if not run_ids:
+            return
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(JobExecution)
+                .where(
+                    JobExecution.pipeline_run_id.in_(run_ids),
+                    JobExecution.status.in_((ExecutionStatus.PENDING, ExecutionStatus.RUNNING)),
+                )
+                .values(
+                    status=ExecutionStatus.CANCELLED,
+                    error_message="アプリケーションの終了により中断されました",
+                    finished_at=datetime.utcnow(),
+                )
+            )
+            await db.commit()
+    
+    async def run(self, run_id: int) -> None:
+        """
+        パイプラインを実行
+        
+        開始後に依存関係が壊れていた場合（ジョブの削除でノードが消えた等）や予期しない
+        エラーの場合も、パイプライン実行は必ず終了状態にする。
+        
+        Args:
+            run_id: パイプライン実行ID
+        """
+        self._run_ids.add(run_id)
+        try:
+            await self._run(run_id)
+        finally:
+            self._run_ids.discard(run_id)
+    
+    async def _run(self, run_id: int) -> None:
+        """パイプラインを実行（run の本体）"""
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(PipelineRun)
+                .where(PipelineRun.id == run_id)
+                .options(selectinload(PipelineRun.pipeline).selectinload(Pipeline.nodes))
+            )
+            run = result.scalar_one()
+            nodes = {
+                node.name: _Node(node.id, node.name, node.job_id, list(node.depends_on or []))
+                for node in run.pipeline.nodes
+            }
+            max_parallel = run.pipeline.max_parallel
+            
+            run.status = ExecutionStatus.RUNNING
+            run.started_at = datetime.utcnow()
+            await db.commit()
+        
+        results: Dict[str, Optional[JobExecution]] = {}
+        status = ExecutionStatus.FAILED
+        try:
+            # 依存関係を検証（存在しないノードへの依存・循環は実行せず失敗にする）
+            try:
+                topological_order({name: node.depends_on for name, node in nodes.items()})
+            except ValueError as e:
+                logger.error("パイプライン実行 %s を開始できません: %s", run_id, e)
+                return
+            results = await self._execute_graph(run_id, nodes, max_parallel)
+            succeeded = len(results) == len(nodes) and all(
+                execution is not None and execution.status == ExecutionStatus.SUCCESS
+                for execution in results.values()
+            )
+            status = ExecutionStatus.SUCCESS if succeeded else ExecutionStatus.FAILED
+        except asyncio.CancelledError:
+            status = ExecutionStatus.CANCELLED
+        except Exception:
+            logger.exception("パイプライン実行 %s に失敗しました", run_id)
+            status = ExecutionStatus.FAILED
+        finally:
+            try:
+                path, seconds = self._critical_path(nodes, results)
+            except ValueError:
+                path, seconds = [], 0.0
+            async with AsyncSessionLocal() as db:
+                run = await db.get(PipelineRun, run_id)
+                run.status = status
+                run.finished_at = datetime.utcnow()
+                run.critical_path = path
+                run.critical_path_seconds = seconds
+                await db.commit()
+    
+    async def _execute_graph(
+        self,
+        run_id: int,
+        nodes: Dict[str, _Node],
+        max_parallel: int
+    ) -> Dict[str, Optional[JobExecution]]:
+        """
+        依存関係に従ってノードを実行
+        
+        Returns:
+            ノード名 -> 実行履歴（起動に失敗した場合はNone）
+        """
+        semaphore = asyncio.Semaphore(max_parallel)
+        results: Dict[str, Optional[JobExecution]] = {}
+        remaining = set(nodes)
+        running: Dict[asyncio.Task, str] = {}
+        # キャンセルしたノード名 -> 原因となった上流ノード名
+        cancelled: Dict[str, str] = {}
+        
+        try:
+            while remaining or running:
+                # 依存ノードがすべて成功したノードを起動
+                ready = sorted(
+                    name for name in remaining
+                    if all(
+                        results.get(dep) is not None
+                        and results[dep].status == ExecutionStatus.SUCCESS
+                        for dep in nodes[name].depends_on
+                    )
+                )
+                for name in ready:
+                    remaining.discard(name)
+                    task = asyncio.create_task(self._run_node(run_id, nodes[name], semaphore))
+                    running[task] = name
+                
+                if not running:
+                    break
+                
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    name = running.pop(task)
+                    execution = task.result()
+                    results[name] = execution
+                    if execution is None or execution.status != ExecutionStatus.SUCCESS:
+                        # 失敗したノードの下流はすべてキャンセル
+                        for downstream in self._descendants(name, nodes):
+                            if downstream in remaining:
+                                remaining.discard(downstream)
+                                cancelled[downstream] = name
+        finally:
+            # 中断した場合は実行中のノードを止め、終了（実行履歴の書き込み）まで待つ
+            for task in running:
+                task.cancel()
+            await asyncio.gather(*running, return_exceptions=True)
+        
+        await self._record_cancelled(run_id, nodes, cancelled)
+        return results
+    
+    async def _run_node(
+        self,
+        run_id: int,
+        node: _Node,
+        semaphore: asyncio.Semaphore
+    ) -> Optional[JobExecution]:
+        """ノード1件を独立したセッションで実行"""
+        async with semaphore:
+            try:
+                async with AsyncSessionLocal() as db:
+                    return await ExecutionService(db).create_and_execute(
+                        node.job_id,
+                        pipeline_run_id=run_id,
+                        pipeline_node_id=node.id
+                    )
+            except Exception:
+                return None
+    
+    async def _record_cancelled(
+        self,
+        run_id: int,
+        nodes: Dict[str, _Node],
+        cancelled: Dict[str, str]
+    ) -> None:
+        """キャンセルしたノードの実行履歴をまとめて記録"""
+        if not cancelled:
+            return
+        
+        now = datetime.utcnow()
+        executions = []
+        async with AsyncSessionLocal() as db:
+            for name, upstream in sorted(cancelled.items()):
+                executions.append(JobExecution(
+                    job_id=nodes[name].job_id,
+                    pipeline_run_id=run_id,
+                    pipeline_node_id=nodes[name].id,
+                    status=ExecutionStatus.CANCELLED,
+                    error_message=f"上流ノード {upstream} が成功しなかったためキャンセルされました",
+                    finished_at=now
+                ))
+            db.add_all(executions)
+            await db.commit()
+        
+        for execution in executions:
+            execution_events.publish_execution(execution)
+    
+    @staticmethod
+    def _descendants(name: str, nodes: Dict[str, _Node]) -> Set[str]:
+        """指定ノードに直接・間接に依存するノード名"""
+        found: Set[str] = set()
+        stack = [name]
+        while stack:
+            current = stack.pop()
+            for node in nodes.values():
+                if current in node.depends_on and node.name not in found:
+                    found.add(node.name)
+                    stack.append(node.name)
+        return found
+    
+    @staticmethod
+    def _critical_path(
+        nodes: Dict[str, _Node],
+        results: Dict[str, Optional[JobExecution]]
+    ) -> Tuple[List[str], float]:
+        """
+        クリティカルパスを計算
+        
+        実行したノードの所要時間を重みとして、依存経路のうち合計が最長のものを求める。
+        
+        Returns:
+            (経路上のノード名のリスト, 合計秒数) のタプル
+        """
+        order = topological_order({name: node.depends_on for name, node in nodes.items()})
+        longest: Dict[str, float] = {}
+        previous: Dict[str, Optional[str]] = {}
+        for name in order:
+            execution = results.get(name)
+            duration = (execution.duration_seconds or 0.0) if execution is not None else 0.0
+            best = max(nodes[name].depends_on, key=lambda dep: longest[dep], default=None)
+            longest[name] = duration + (longest[best] if best else 0.0)
+            previous[name] = best
+        
+        if not longest:
+            return [], 0.0
+        
+        end: Optional[str] = max(longest, key=lambda name: longest[name])
+        seconds = longest[end]
+        path: List[str] = []
+        while end is not None:
+            path.append(end)
+            end = previous[end]
+        return list(reversed(path)), seconds
+
+
+# シングルトンインスタンス
+pipeline_scheduler = PipelineScheduler()
@@ -0,0 +1,256 @@
+"""
+パイプラインサービス
+パイプライン定義のCRUD操作と実行の開始を管理
+"""
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, desc
+from sqlalchemy.orm import selectinload
+from typing import List
+
+from app.models.execution import ExecutionStatus
+from app.models.pipeline import Pipeline, PipelineNode, PipelineRun
+from app.schemas.pipeline import PipelineCreate, PipelineUpdate, PipelineNodeBase
+from app.services.job_service import JobService
+from app.services.pipeline_scheduler import pipeline_scheduler, topological_order
+
+
+class PipelineNotFoundError(Exception):
+    """パイプラインが見つからない"""
+    pass
+
+
+class PipelineRunNotFoundError(Exception):
+    """パイプライン実行が見つからない"""
+    pass
+
+
+class InvalidPipelineError(Exception):
+    """パイプラインの定義が不正（ノード名の重複・循環依存など）"""
+    pass
+
+
+class PipelineService:
+    """パイプライン管理サービス"""
+    
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self.job_service = JobService(db)
+    
+    async def get_all(self) -> List[Pipeline]:
+        """
+        全パイプラインを取得
+        
+        Returns:
+            パイプラインのリスト
+        """
+        result = await self.db.execute(
+            select(Pipeline).options(selectinload(Pipeline.nodes))
+        )
+        return list(result.scalars().all())
+    
+    async def get_by_id(self, pipeline_id: int) -> Pipeline:
+        """
+        IDでパイプラインを取得
+        
+        Args:
+            pipeline_id: パイプラインID
+            
+        Returns:
+            パイプラインオブジェクト
+            
+        Raises:
+            PipelineNotFoundError: パイプラインが見つからない
+        """
+        result = await self.db.execute(
+            select(Pipeline)
+            .where(Pipeline.id == pipeline_id)
+            .options(selectinload(Pipeline.nodes))
+        )
+        pipeline = result.scalar_one_or_none()
+        
+        if not pipeline:
+            raise PipelineNotFoundError(f"パイプラインID {pipeline_id} が見つかりません")
+        
+        return pipeline
+    
+    async def create(self, pipeline_data: PipelineCreate) -> Pipeline:
+        """
+        パイプラインを作成
+        
+        Args:
+            pipeline_data: パイプライン作成データ
+            
+        Returns:
+            作成されたパイプライン
+            
+        Raises:
+            InvalidPipelineError: ノードの定義が不正
+            JobNotFoundError: ジョブが見つからない
+        """
+        await self._validate_nodes(pipeline_data.nodes)
+        
+        pipeline = Pipeline(
+            name=pipeline_data.name,
+            description=pipeline_data.description,
+            max_parallel=pipeline_data.max_parallel,
+            nodes=self._build_nodes(pipeline_data.nodes)
+        )
+        
+        self.db.add(pipeline)
+        await self.db.commit()
+        
+        return await self.get_by_id(pipeline.id)
+    
+    async def update(self, pipeline_id: int, pipeline_data: PipelineUpdate) -> Pipeline:
+        """
+        パイプラインを更新
+        
+        Args:
+            pipeline_id: パイプラインID
+            pipeline_data: 更新データ（nodes 指定時は全ノードを置き換える）
+            
+        Returns:
+            更新されたパイプライン
+            
+        Raises:
+            PipelineNotFoundError: パイプラインが見つからない
+            InvalidPipelineError: ノードの定義が不正
+            JobNotFoundError: ジョブが見つからない
+        """
+        pipeline = await self.get_by_id(pipeline_id)
+        
+        update_dict = pipeline_data.model_dump(exclude_unset=True, exclude={"nodes"})
+        for key, value in update_dict.items():
+            setattr(pipeline, key, value)
+        
+        if pipeline_data.nodes is not None:
+            await self._validate_nodes(pipeline_data.nodes)
+            # 過去の実行履歴が参照するノードIDは SET NULL になる
+            pipeline.nodes = self._build_nodes(pipeline_data.nodes)
+        
+        await self.db.commit()
+        self.db.expire(pipeline)
+        
+        return await self.get_by_id(pipeline_id)
+    
+    async def delete(self, pipeline_id: int) -> None:
+        """
+        パイプラインを削除
+        
+        Args:
+            pipeline_id: パイプラインID
+            
+        Raises:
+            PipelineNotFoundError: パイプラインが見つからない
+        """
+        pipeline = await self.get_by_id(pipeline_id)
+        await self.db.delete(pipeline)
+        await self.db.commit()
+    
+    async def start_run(self, pipeline_id: int) -> PipelineRun:
+        """
+        パイプラインの実行を開始（ノードはバックグラウンドで実行される）
+        
+        Args:
+            pipeline_id: パイプラインID
+            
+        Returns:
+            作成されたパイプライン実行
+            
+        Raises:
+            PipelineNotFoundError: パイプラインが見つからない
+        """
+        await self.get_by_id(pipeline_id)
+        
+        run = PipelineRun(pipeline_id=pipeline_id, status=ExecutionStatus.PENDING)
+        self.db.add(run)
+        await self.db.commit()
+        
+        pipeline_scheduler.start(run.id)
+        
+        return await self.get_run(pipeline_id, run.id)
+    
+    async def get_runs(self, pipeline_id: int, limit: int = 50) -> List[PipelineRun]:
+        """
+        パイプラインの実行履歴を取得（最新順）
+        
+        Args:
+            pipeline_id: パイプラインID
+            limit: 取得件数
+            
+        Returns:
+            パイプライン実行のリスト
+            
+        Raises:
+            PipelineNotFoundError: パイプラインが見つからない
+        """
+        await self.get_by_id(pipeline_id)
+        
+        result = await self.db.execute(
+            select(PipelineRun)
+            .where(PipelineRun.pipeline_id == pipeline_id)
+            .options(selectinload(PipelineRun.executions))
+            .order_by(desc(PipelineRun.created_at))
+            .limit(limit)
+        )
+        return list(result.scalars().all())
+    
+    async def get_run(self, pipeline_id: int, run_id: int) -> PipelineRun:
+        """
+        パイプライン実行を取得
+        
+        Args:
+            pipeline_id: パイプラインID
+            run_id: パイプライン実行ID
+            
+        Returns:
+            ノードごとの実行履歴を含むパイプライン実行
+            
+        Raises:
+            PipelineRunNotFoundError: パイプライン実行が見つからない
+        """
+        result = await self.db.execute(
+            select(PipelineRun)
+            .where(PipelineRun.id == run_id, PipelineRun.pipeline_id == pipeline_id)
+            .options(selectinload(PipelineRun.executions))
+            .execution_options(populate_existing=True)
+        )
+        run = result.scalar_one_or_none()
+        
+        if not run:
+            raise PipelineRunNotFoundError(f"パイプライン実行ID {run_id} が見つかりません")
+        
+        return run
+    
+    async def _validate_nodes(self, nodes: List[PipelineNodeBase]) -> None:
+        """
+        ノード定義を検証
+        
+        Raises:
+            InvalidPipelineError: ノード名の重複・存在しないノードへの依存・循環依存
+            JobNotFoundError: ジョブが見つからない
+        """
+        names = [node.name for node in nodes]
+        duplicates = sorted({name for name in names if names.count(name) > 1})
+        if duplicates:
+            raise InvalidPipelineError(f"ノード名が重複しています: {', '.join(duplicates)}")
+        
+        try:
+            topological_order({node.name: node.depends_on for node in nodes})
+        except ValueError as e:
+            raise InvalidPipelineError(str(e))
+        
+        for job_id in sorted({node.job_id for node in nodes}):
+            await self.job_service.get_by_id(job_id, cached=True)
+    
+    @staticmethod
+    def _build_nodes(nodes: List[PipelineNodeBase]) -> List[PipelineNode]:
+        """スキーマからノードオブジェクトを作成"""
+        return [
+            PipelineNode(
+                name=node.name,
+                job_id=node.job_id,
+                depends_on=list(dict.fromkeys(node.depends_on))
+            )
+            for node in nodes
+        ]
@@ -0,0 +1,192 @@
+"""
+実行時間の遅延検知サービス
+ジョブごとの実行時間モデルを終了した実行で更新し、大きく遅れた実行を記録・参照する
+"""
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.execution import JobExecution, ExecutionStatus
+from app.models.job_duration_model import JobDurationModel
+from app.services.duration_sketch import MIN_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# モデルに加えるステータス（失敗・タイムアウトは途中で終わるため実行時間を比べられない）
+MODEL_STATUSES = (ExecutionStatus.SUCCESS,)
+
+
+def observe_duration(model: JobDurationModel, seconds: float) -> None:
+    """
+    実行時間をモデルに加える（指数移動平均・分散を更新）
+    
+    モデルに加えた実行数が 1 / α に達するまでは単純平均・分散と同じ重みで更新し、
+    最初の数件が初期値（0秒）に引きずられないようにする。
+    """
+    alpha = max(settings.duration_model_alpha, 1.0 / ((model.samples or 0) + 1))
+    diff = seconds - (model.mean_seconds or 0.0)
+    increment = alpha * diff
+    model.mean_seconds = (model.mean_seconds or 0.0) + increment
+    model.variance = (1 - alpha) * ((model.variance or 0.0) + diff * increment)
+    model.samples = (model.samples or 0) + 1
+
+
+def judge_duration(model: JobDurationModel, seconds: float) -> Optional[float]:
+    """
+    実行時間がモデルから大きく遅れているか判定
+    
+    Args:
+        model: この実行を加える前のモデル
+        seconds: 実行時間（秒）
+        
+    Returns:
+        遅延した場合は平均からの乖離（標準偏差の何倍か）、そうでなければNone
+    """
+    if (model.samples or 0) < settings.duration_regression_min_samples:
+        return None
+    deviation = (seconds - model.mean_seconds) / max(model.stddev_seconds, MIN_SECONDS)
+    if deviation < settings.duration_regression_deviation:
+        return None
+    if seconds < model.mean_seconds * settings.duration_regression_min_ratio:
+        return None
+    return deviation
+
+
+class RegressionService:
+    """実行時間の遅延検知サービス"""
+    
+    def __init__(self, db: AsyncSession):
+        self.db = db
+    
+    async def observe(self, executions) -> int:
+        """
+        終了した実行をジョブの実行時間モデルと比べ、遅延した実行を記録してからモデルに加える
+        
+        集計ワーカーが未集計の実行を集計するのと同じトランザクションで呼ぶ
+        （コミットは呼び出し元）。各実行は1回だけモデルに加わる。
+        
+        Args:
+            executions: 終了した実行（id・job_id・status・cached_from_execution_id・
+                started_at・finished_at を持つ行。ID順）
+                
+        Returns:
+            遅延として記録した実行数
+        """
+        samples = [
+            (execution, max((execution.finished_at - execution.started_at).total_seconds(), 0.0))
+            for execution in executions
+            if execution.status in MODEL_STATUSES
+            and execution.cached_from_execution_id is None
+            and execution.started_at is not None
+            and execution.finished_at is not None
+        ]
+        if not samples:
+            return 0
+        
+        result = await self.db.execute(
+            select(JobDurationModel)
+            .where(JobDurationModel.job_id.in_({execution.job_id for execution, _ in samples}))
+            .order_by(JobDurationModel.job_id)
+            .with_for_update()
+        )
+        models: Dict[int, JobDurationModel] = {model.job_id: model for model in result.scalars().all()}
+        
+        regressions = []
+        for execution, seconds in samples:
+            model = models.get(execution.job_id)
+            if model is None:
+                model = JobDurationModel(job_id=execution.job_id, samples=0, mean_seconds=0.0, variance=0.0)
+                self.db.add(model)
+                models[execution.job_id] = model
+            
+            deviation = judge_duration(model, seconds)
+            if deviation is not None:
+                regressions.append({
+                    "id": execution.id,
+                    "duration_expected_seconds": model.mean_seconds,
+                    "duration_deviation": deviation,
+                    "duration_regressed": True,
+                })
+                logger.warning(
+                    "ジョブ %s の実行 %s が遅延しました: %.1f秒（平均 %.1f秒、%.1fσ）",
+                    execution.job_id, execution.id, seconds, model.mean_seconds, deviation
+                )
+            # 遅延した実行も加えるため、遅いままの状態が続けばそれが新しい基準になる
+            observe_duration(model, seconds)
+            model.last_execution_id = max(model.last_execution_id or 0, execution.id)
+        
+        if regressions:
+            await self.db.execute(update(JobExecution), regressions)
+        return len(regressions)
+    
+    async def reset(self) -> None:
+        """実行時間モデルと遅延の記録をすべて削除（コミットは呼び出し元）"""
+        await self.db.execute(JobDurationModel.__table__.delete())
+        await self.db.execute(
+            update(JobExecution)
+            .where(JobExecution.duration_regressed.is_(True))
+            .values(duration_regressed=False, duration_expected_seconds=None, duration_deviation=None)
+        )
+    
+    async def slowest(
+        self,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        job_id: Optional[int] = None,
+        limit: int = 50
+    ) -> List[dict]:
+        """
+        遅延した実行を平均からの遅れが大きい順に取得
+        
+        Args:
+            since: 終了日時の開始（Noneは7日前）
+            until: 終了日時の終了（Noneは現在）
+            job_id: ジョブIDで絞り込み
+            limit: 取得件数
+            
+        Returns:
+            実行・実行時間・平均実行時間・乖離・平均の何倍かの辞書のリスト
+        """
+        until = until or datetime.utcnow()
+        since = since or until - timedelta(days=7)
+        query = select(
+            JobExecution.id,
+            JobExecution.job_id,
+            JobExecution.server_id,
+            JobExecution.status,
+            JobExecution.started_at,
+            JobExecution.finished_at,
+            JobExecution.duration_expected_seconds,
+            JobExecution.duration_deviation,
+        ).where(
+            JobExecution.duration_regressed.is_(True),
+            JobExecution.finished_at >= since,
+            JobExecution.finished_at < until,
+        )
+        if job_id is not None:
+            query = query.where(JobExecution.job_id == job_id)
+        result = await self.db.execute(query)
+        
+        # 遅延した実行は少ないため、遅れの比率での並べ替えはここで行う（DBごとの日時の差の計算を避ける）
+        regressions = []
+        for row in result.all():
+            seconds = max((row.finished_at - row.started_at).total_seconds(), 0.0)
+            expected = row.duration_expected_seconds
+            regressions.append({
+                "execution_id": row.id,
+                "job_id": row.job_id,
+                "server_id": row.server_id,
+                "status": row.status,
+                "started_at": row.started_at,
+                "finished_at": row.finished_at,
+                "duration_seconds": seconds,
+                "expected_seconds": expected,
+                "deviation": row.duration_deviation,
+                "slowdown": seconds / expected if expected else None,
+            })
+        regressions.sort(key=lambda item: (item["slowdown"] or 0.0, item["deviation"] or 0.0), reverse=True)
+        return regressions[:limit]
@@ -0,0 +1,147 @@
+"""
+実行結果キャッシュサービス
+同じ内容の実行の成功結果を再利用し、再実行を省略する
+"""
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, Float
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import aliased
+from sqlalchemy.sql.expression import FunctionElement
+from typing import Dict, Optional
+from datetime import datetime, timedelta
+import hashlib
+import json
+
+from app.core.config import settings
+from app.models.execution import JobExecution, ExecutionStatus
+from app.models.job import Job
+from app.services.script_cache import script_hash
+
+
+class _elapsed_seconds(FunctionElement):
+    """2つの日時の差（秒）を求めるSQL式（DBごとに日時の差の求め方が異なる）"""
+    type = Float()
+    inherit_cache = True
+
+
+@compiles(_elapsed_seconds)
+def _compile_elapsed_seconds(element, compiler, **kw):
+    started_at, finished_at = element.clauses
+    return (
+        f"EXTRACT(EPOCH FROM ({compiler.process(finished_at, **kw)} - {compiler.process(started_at, **kw)}))"
+    )
+
+
+@compiles(_elapsed_seconds, "sqlite")
+def _compile_elapsed_seconds_sqlite(element, compiler, **kw):
+    started_at, finished_at = element.clauses
+    return (
+        f"((julianday({compiler.process(finished_at, **kw)}) - "
+        f"julianday({compiler.process(started_at, **kw)})) * 86400.0)"
+    )
+
+
+def compute_fingerprint(
+    job: Job,
+    parameters: Dict[str, str],
+    input_hashes: Dict[str, str]
+) -> str:
+    """
+    実行内容のフィンガープリントを計算
+    
+    スクリプトのハッシュ・実行先サーバ（またはサーバプール）・パラメータ・入力のハッシュが
+    すべて同じ実行は、同じ結果になるものとみなす。
+    
+    Args:
+        job: ジョブ（サーバ情報を含む）
+        parameters: パラメータ
+        input_hashes: 入力の名前とハッシュ値
+        
+    Returns:
+        SHA-256 の16進文字列
+    """
+    material = {
+        "script": script_hash(job.script),
+        # サーバプールのメンバーは置き換え可能なため、プール単位で同じ結果とみなす
+        "server": (
+            [job.server.id, job.server.host, job.server.port, job.server.username]
+            if job.server_pool_id is None else ["pool", job.server_pool_id]
+        ),
+        "parameters": sorted(parameters.items()),
+        "inputs": sorted(input_hashes.items()),
+    }
+    encoded = json.dumps(material, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+class ResultCacheService:
+    """実行結果キャッシュサービス"""
+    
+    def __init__(self, db: AsyncSession):
+        self.db = db
+    
+    async def find(self, fingerprint: str, ttl_seconds: Optional[int] = None) -> Optional[JobExecution]:
+        """
+        有効期間内で最新の、同じフィンガープリントの成功した実行を取得
+        
+        キャッシュから作成した実行は対象外とし、常に実際に実行した結果を参照する。
+        
+        Args:
+            fingerprint: フィンガープリント
+            ttl_seconds: 有効期間（秒）、未指定の場合は既定値
+            
+        Returns:
+            再利用できる実行、ない場合はNone
+        """
+        ttl = ttl_seconds or settings.execution_cache_ttl_seconds
+        cutoff = datetime.utcnow() - timedelta(seconds=ttl)
+        result = await self.db.execute(
+            select(JobExecution)
+            .where(
+                JobExecution.fingerprint == fingerprint,
+                JobExecution.status == ExecutionStatus.SUCCESS,
+                JobExecution.cached_from_execution_id.is_(None),
+                JobExecution.finished_at >= cutoff
+            )
+            .order_by(JobExecution.finished_at.desc())
+            .limit(1)
+        )
+        return result.scalar_one_or_none()
+    
+    async def stats(self, since: Optional[datetime] = None) -> dict:
+        """
+        キャッシュの統計を取得
+        
+        Args:
+            since: 集計開始日時（未指定の場合は全期間）
+            
+        Returns:
+            実行数・ヒット数・ヒット率・節約した実行時間の辞書
+        """
+        conditions = [JobExecution.fingerprint.is_not(None)]
+        if since:
+            conditions.append(JobExecution.created_at >= since)
+        
+        result = await self.db.execute(
+            select(
+                func.count(JobExecution.id),
+                func.count(JobExecution.cached_from_execution_id)
+            ).where(*conditions)
+        )
+        executions, hits = result.one()
+        
+        # ヒットした実行ごとに、元の実行の所要時間を節約時間として数える（DBで合計する）
+        original = aliased(JobExecution)
+        saved_seconds = await self.db.scalar(
+            select(func.coalesce(func.sum(_elapsed_seconds(original.started_at, original.finished_at)), 0.0))
+            .select_from(JobExecution)
+            .join(original, JobExecution.cached_from_execution_id == original.id)
+            .where(*conditions, original.started_at.is_not(None), original.finished_at.is_not(None))
+        )
+        
+        return {
+            "executions": executions,
+            "hits": hits,
+            "hit_rate": hits / executions if executions else 0.0,
+            "saved_seconds": saved_seconds,
+        }
@@ -0,0 +1,327 @@
+"""
+実行履歴の保持サービス
+ジョブごとの保持件数・保持日数を過ぎた実行履歴を、小さなトランザクションに分けて削除する
+"""
+import asyncio
+import gzip
+import json
+import logging
+import os
+from dataclasses import dataclass, field, asdict
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from sqlalchemy import select, delete, func, or_, exists
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.job import Job
+from app.models.execution import JobExecution, ExecutionIdempotencyKey
+from app.models.artifact import ExecutionArtifact
+from app.models.pipeline import PipelineRun
+from app.services.rollup_service import FINAL_STATUSES
+from app.services.log_archive import log_archive, archived_size
+
+logger = logging.getLogger(__name__)
+
+# 削除した量に数える列（実行履歴の大半を占める出力）
+LOG_COLUMNS = ("stdout", "stderr", "error_message")
+
+
+@dataclass
+class PruneReport:
+    """実行履歴の削除の結果"""
+    started_at: datetime = field(default_factory=datetime.utcnow)
+    finished_at: Optional[datetime] = None
+    deleted_executions: int = 0
+    bytes_reclaimed: int = 0
+    archived_files: List[str] = field(default_factory=list)
+    archived_bytes: int = 0
+    deleted_idempotency_keys: int = 0
+    
+    def add(self, other: "PruneReport") -> None:
+        """別の結果を合算"""
+        self.deleted_executions += other.deleted_executions
+        self.deleted_idempotency_keys += other.deleted_idempotency_keys
+        self.bytes_reclaimed += other.bytes_reclaimed
+        self.archived_files.extend(other.archived_files)
+        self.archived_bytes += other.archived_bytes
+    
+    def to_dict(self) -> dict:
+        """APIで返す形式"""
+        return asdict(self)
+
+
+class RetentionService:
+    """実行履歴の保持サービス"""
+    
+    def __init__(self, db: AsyncSession):
+        self.db = db
+    
+    async def get_policies(self) -> List[Tuple[int, int, int]]:
+        """
+        保持期間を設定したジョブを取得
+        
+        Returns:
+            (ジョブID, 保持件数, 保持日数) のリスト（0は無制限。ジョブで未指定の項目は設定値）
+        """
+        result = await self.db.execute(
+            select(Job.id, Job.retention_max_executions, Job.retention_days).order_by(Job.id)
+        )
+        policies = []
+        for job_id, max_executions, days in result.all():
+            if max_executions is None:
+                max_executions = settings.retention_max_executions
+            if days is None:
+                days = settings.retention_days
+            if max_executions or days:
+                policies.append((job_id, max_executions or 0, days or 0))
+        return policies
+    
+    async def prune_batch(
+        self,
+        job_id: int,
+        max_executions: int,
+        days: int,
+        limit: Optional[int] = None
+    ) -> PruneReport:
+        """
+        ジョブの保持期間を過ぎた実行履歴を1回のトランザクションで削除
+        
+        最新の max_executions 件に入らない実行、または days 日より前に終了した実行が
+        対象。ただし終了していない実行、集計に加算していない実行、キャッシュとして
+        他の実行から参照されている実行、実行中のパイプラインの実行は残す。
+        設定で保存先を指定した場合は、削除する前に出力を含む全列を圧縮して保存する。
+        
+        Args:
+            job_id: ジョブID
+            max_executions: 保持件数（0は無制限）
+            days: 保持日数（0は無制限）
+            limit: 1回に削除する最大件数（Noneは設定値）
+            
+        Returns:
+            削除の結果（削除する実行がなければ deleted_executions が0）
+        """
+        report = PruneReport()
+        expired = []
+        if days:
+            expired.append(JobExecution.finished_at < datetime.utcnow() - timedelta(days=days))
+        if max_executions:
+            boundary = await self.db.scalar(
+                select(JobExecution.id)
+                .where(JobExecution.job_id == job_id)
+                .order_by(JobExecution.id.desc())
+                .offset(max_executions - 1)
+                .limit(1)
+            )
+            if boundary is not None:
+                expired.append(JobExecution.id < boundary)
+        if not expired:
+            return report
+        
+        referrer = aliased(JobExecution)
+        archive = bool(settings.retention_archive_dir)
+        columns = [JobExecution] if archive else [
+            JobExecution.id,
+            JobExecution.log_archive,
+            *(func.coalesce(func.length(getattr(JobExecution, name)), 0) for name in LOG_COLUMNS),
+        ]
+        query = (
+            select(*columns)
+            .where(
+                JobExecution.job_id == job_id,
+                or_(*expired),
+                JobExecution.status.in_(FINAL_STATUSES),
+                JobExecution.finished_at.is_not(None),
+                ~exists().where(referrer.cached_from_execution_id == JobExecution.id),
+                ~exists().where(PipelineRun.id == JobExecution.pipeline_run_id, PipelineRun.finished_at.is_(None)),
+            )
+            .order_by(JobExecution.id)
+            .limit(limit or settings.retention_batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        # 集計する場合は集計に加算した実行のみ削除する（ダッシュボードの数値を変えない）
+        if settings.rollup_enabled:
+            query = query.where(JobExecution.rolled_up.is_(True))
+        result = await self.db.execute(query)
+        
+        if archive:
+            records = [_to_record(execution) for execution in result.scalars().all()]
+            ids = [record["id"] for record in records]
+            report.bytes_reclaimed = sum(
+                len(record[name].encode()) for record in records for name in LOG_COLUMNS if record[name]
+            ) + sum(archived_size(record["log_archive"]) for record in records if record["log_archive"])
+        else:
+            rows = result.all()
+            ids = [row[0] for row in rows]
+            # ログアーカイブへ移した出力は、参照されなくなったセグメントとして後で削除される
+            report.bytes_reclaimed = sum(
+                sum(row[2:]) + (archived_size(row[1]) if row[1] else 0) for row in rows
+            )
+        if not ids:
+            return report
+        
+        if archive:
+            path = (
+                Path(settings.retention_archive_dir) / f"job-{job_id}" / f"executions-{ids[0]}-{ids[-1]}.jsonl.gz"
+            )
+            report.archived_bytes = await asyncio.to_thread(_write_archive, path, records)
+            report.archived_files.append(str(path))
+        
+        await self.db.execute(delete(ExecutionArtifact).where(ExecutionArtifact.execution_id.in_(ids)))
+        await self.db.execute(delete(ExecutionIdempotencyKey).where(ExecutionIdempotencyKey.execution_id.in_(ids)))
+        await self.db.execute(delete(JobExecution).where(JobExecution.id.in_(ids)))
+        await self.db.commit()
+        report.deleted_executions = len(ids)
+        return report
+    
+    async def prune_idempotency_keys(self, limit: Optional[int] = None) -> int:
+        """
+        有効期限を過ぎた冪等キーを1回のトランザクションで削除
+        
+        Args:
+            limit: 1回に削除する最大件数（Noneは設定値）
+            
+        Returns:
+            削除した件数
+        """
+        keys = (await self.db.execute(
+            select(ExecutionIdempotencyKey.key)
+            .where(ExecutionIdempotencyKey.expires_at < datetime.utcnow())
+            .limit(limit or settings.retention_batch_size)
+            .with_for_update(skip_locked=True)
+        )).scalars().all()
+        if not keys:
+            return 0
+        await self.db.execute(delete(ExecutionIdempotencyKey).where(ExecutionIdempotencyKey.key.in_(keys)))
+        await self.db.commit()
+        return len(keys)
+
+
+def _to_record(execution: JobExecution) -> dict:
+    """実行履歴の全列を保存する形式の辞書にする"""
+    return {attr.key: getattr(execution, attr.key) for attr in execution.__mapper__.column_attrs}
+
+
+def _write_archive(path: Path, records: List[dict]) -> int:
+    """
+    実行履歴を gzip 圧縮した JSON Lines で保存（書き終えてから置き換える）
+    
+    Returns:
+        保存したファイルのバイト数
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    for record in records:
+        # ログアーカイブへ移した出力も含めて保存する
+        if record.get("log_archive"):
+            record.update(log_archive.read_logs(record["log_archive"]))
+    tmp_path = path.with_name(path.name + ".tmp")
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False, default=str))
+            f.write("\n")
+    os.replace(tmp_path, path)
+    return path.stat().st_size
+
+
+class ExecutionPruner:
+    """
+    実行履歴の削除ワーカー
+    
+    一定間隔ごとに、保持期間を設定したジョブの実行履歴と期限切れの冪等キーを小さなバッチで削除する。
+    バッチごとにトランザクションを分け、間に少し待つことで、他の書き込みを長く待たせない。
+    """
+    
+    def __init__(self):
+        self.last_report: Optional[PruneReport] = None
+        self.total_deleted_executions = 0
+        self.total_bytes_reclaimed = 0
+        self.total_archived_bytes = 0
+        self.total_deleted_idempotency_keys = 0
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+    
+    def start(self) -> None:
+        """削除ループを開始"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+    
+    async def stop(self) -> None:
+        """削除ループを停止"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+    
+    async def prune(self) -> PruneReport:
+        """
+        保持期間を過ぎた実行履歴をすべて削除（同時に1回のみ実行する）
+        
+        Returns:
+            削除の結果
+        """
+        async with self._lock:
+            report = PruneReport()
+            async with AsyncSessionLocal() as db:
+                policies = await RetentionService(db).get_policies()
+            for job_id, max_executions, days in policies:
+                while True:
+                    async with AsyncSessionLocal() as db:
+                        batch = await RetentionService(db).prune_batch(job_id, max_executions, days)
+                    report.add(batch)
+                    if batch.deleted_executions < settings.retention_batch_size:
+                        break
+                    await asyncio.sleep(settings.retention_batch_pause)
+            while True:
+                async with AsyncSessionLocal() as db:
+                    deleted = await RetentionService(db).prune_idempotency_keys()
+                report.deleted_idempotency_keys += deleted
+                if deleted < settings.retention_batch_size:
+                    break
+                await asyncio.sleep(settings.retention_batch_pause)
+            report.finished_at = datetime.utcnow()
+            
+            self.last_report = report
+            self.total_deleted_executions += report.deleted_executions
+            self.total_bytes_reclaimed += report.bytes_reclaimed
+            self.total_archived_bytes += report.archived_bytes
+            self.total_deleted_idempotency_keys += report.deleted_idempotency_keys
+            if report.deleted_idempotency_keys:
+                logger.info("期限切れの冪等キーを %d 件削除しました", report.deleted_idempotency_keys)
+            if report.deleted_executions:
+                logger.info(
+                    "実行履歴を %d 件削除しました（出力 %d バイト、保存 %d ファイル）",
+                    report.deleted_executions, report.bytes_reclaimed, len(report.archived_files)
+                )
+            return report
+    
+    def stats(self) -> dict:
+        """
+        削除の統計を取得
+        
+        Returns:
+            前回の削除の結果と、起動してからの合計
+        """
+        return {
+            "last_run": self.last_report.to_dict() if self.last_report else None,
+            "total_deleted_executions": self.total_deleted_executions,
+            "total_bytes_reclaimed": self.total_bytes_reclaimed,
+            "total_archived_bytes": self.total_archived_bytes,
+            "total_deleted_idempotency_keys": self.total_deleted_idempotency_keys,
+        }
+    
+    async def _loop(self) -> None:
+        """一定間隔ごとに保持期間を過ぎた実行履歴を削除する"""
+        while True:
+            try:
+                await self.prune()
+            except Exception:
+                logger.exception("実行履歴の削除に失敗しました")
+            await asyncio.sleep(settings.retention_interval)
+
+
+# シングルトンインスタンス
+execution_pruner = ExecutionPruner()
@@ -0,0 +1,321 @@
+"""
+実行集計サービス
+終了した実行をジョブ・サーバ・時間帯ごとの集計に加算し、集計を参照する
+"""
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select, update, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.execution import JobExecution, ExecutionStatus
+from app.models.execution_rollup import ExecutionRollup
+from app.services.duration_sketch import DurationSketch
+from app.services.execution_events import execution_events
+from app.services.regression_service import RegressionService
+
+logger = logging.getLogger(__name__)
+
+# 集計する（終了した）ステータス
+FINAL_STATUSES = (
+    ExecutionStatus.SUCCESS,
+    ExecutionStatus.FAILED,
+    ExecutionStatus.TIMEOUT,
+    ExecutionStatus.CANCELLED,
+)
+
+# 集計のパーセンタイル
+PERCENTILES = {"p50": 0.5, "p95": 0.95, "p99": 0.99}
+
+
+def bucket_of(moment: datetime) -> datetime:
+    """日時が属する時間帯（1時間ごと）の開始日時"""
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+@dataclass
+class _Totals:
+    """集計の途中結果（集計行の加算・参照時の合算に使う）"""
+    total: int = 0
+    success: int = 0
+    failed: int = 0
+    timeout: int = 0
+    cancelled: int = 0
+    cached: int = 0
+    duration_count: int = 0
+    duration_sum: float = 0.0
+    duration_max: Optional[float] = None
+    sketch: DurationSketch = field(default_factory=DurationSketch)
+    
+    def add_execution(self, execution) -> None:
+        """終了した実行を加算"""
+        self.total += 1
+        setattr(self, execution.status.value, getattr(self, execution.status.value) + 1)
+        if execution.cached_from_execution_id is not None:
+            self.cached += 1
+            return
+        if execution.started_at is not None and execution.finished_at is not None:
+            self.add_duration(max((execution.finished_at - execution.started_at).total_seconds(), 0.0))
+    
+    def add_duration(self, seconds: float) -> None:
+        """実行時間を加算"""
+        self.duration_count += 1
+        self.duration_sum += seconds
+        self.duration_max = seconds if self.duration_max is None else max(self.duration_max, seconds)
+        self.sketch.add(seconds)
+    
+    def merge(self, other) -> None:
+        """別の集計（_Totals または ExecutionRollup）を合算"""
+        for name in ("total", "success", "failed", "timeout", "cancelled", "cached", "duration_count"):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        self.duration_sum += other.duration_sum
+        if other.duration_max is not None:
+            self.duration_max = (
+                other.duration_max if self.duration_max is None else max(self.duration_max, other.duration_max)
+            )
+        sketch = other.sketch if isinstance(other, _Totals) else DurationSketch.from_json(other.duration_sketch)
+        self.sketch.merge(sketch)
+    
+    def apply_to(self, rollup: ExecutionRollup) -> None:
+        """集計行に加算"""
+        for name in ("total", "success", "failed", "timeout", "cancelled", "cached", "duration_count"):
+            setattr(rollup, name, (getattr(rollup, name) or 0) + getattr(self, name))
+        rollup.duration_sum = (rollup.duration_sum or 0.0) + self.duration_sum
+        if self.duration_max is not None:
+            rollup.duration_max = (
+                self.duration_max if rollup.duration_max is None else max(rollup.duration_max, self.duration_max)
+            )
+        # 保存済みのスケッチの精度が現在の設定と異なる場合は、現在の設定の精度に変換する
+        sketch = DurationSketch()
+        sketch.merge(DurationSketch.from_json(rollup.duration_sketch))
+        sketch.merge(self.sketch)
+        rollup.duration_sketch = sketch.to_json()
+    
+    def to_dict(self) -> dict:
+        """APIで返す形式"""
+        result = {
+            "total": self.total,
+            "success": self.success,
+            "failed": self.failed,
+            "timeout": self.timeout,
+            "cancelled": self.cancelled,
+            "cached": self.cached,
+            "success_rate": self.success / self.total if self.total else None,
+            "duration_avg": self.duration_sum / self.duration_count if self.duration_count else None,
+            "duration_max": self.duration_max,
+        }
+        for name, q in PERCENTILES.items():
+            result[f"duration_{name}"] = self.sketch.quantile(q)
+        return result
+
+
+class RollupService:
+    """実行集計サービス"""
+    
+    def __init__(self, db: AsyncSession):
+        self.db = db
+    
+    async def apply_pending(self, limit: Optional[int] = None) -> int:
+        """
+        未集計の終了した実行を集計に加算（1回のトランザクション）
+        
+        同じトランザクションでジョブの実行時間モデルも更新し、遅延した実行を記録する。
+        複数のワーカーが同時に呼んでも、同じ実行を二重に加算しない
+        （PostgreSQL では他のワーカーが処理中の実行を飛ばす）。
+        
+        Args:
+            limit: 1回に加算する最大件数（Noneは設定値）
+            
+        Returns:
+            加算した実行数
+        """
+        result = await self.db.execute(
+            select(
+                JobExecution.id,
+                JobExecution.job_id,
+                JobExecution.server_id,
+                JobExecution.status,
+                JobExecution.cached_from_execution_id,
+                JobExecution.started_at,
+                JobExecution.finished_at,
+            )
+            .where(
+                JobExecution.rolled_up.is_(False),
+                JobExecution.finished_at.is_not(None),
+                JobExecution.status.in_(FINAL_STATUSES),
+            )
+            .order_by(JobExecution.id)
+            .limit(limit or settings.rollup_batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        executions = result.all()
+        if not executions:
+            return 0
+        
+        deltas: Dict[Tuple[int, Optional[int], datetime], _Totals] = {}
+        for execution in executions:
+            key = (execution.job_id, execution.server_id, bucket_of(execution.finished_at))
+            deltas.setdefault(key, _Totals()).add_execution(execution)
+        
+        # 加算先の集計行（なければ作成する）
+        result = await self.db.execute(
+            select(ExecutionRollup)
+            .where(
+                ExecutionRollup.job_id.in_({key[0] for key in deltas}),
+                ExecutionRollup.bucket_start.in_({key[2] for key in deltas}),
+            )
+            .order_by(ExecutionRollup.id)
+            .with_for_update()
+        )
+        rollups: Dict[Tuple[int, Optional[int], datetime], ExecutionRollup] = {}
+        for rollup in result.scalars().all():
+            rollups.setdefault((rollup.job_id, rollup.server_id, _naive(rollup.bucket_start)), rollup)
+        
+        for key, delta in deltas.items():
+            rollup = rollups.get((key[0], key[1], _naive(key[2])))
+            if rollup is None:
+                rollup = ExecutionRollup(job_id=key[0], server_id=key[1], bucket_start=key[2])
+                self.db.add(rollup)
+            delta.apply_to(rollup)
+        
+        await RegressionService(self.db).observe(executions)
+        
+        await self.db.execute(
+            update(JobExecution)
+            .where(JobExecution.id.in_([execution.id for execution in executions]))
+            .values(rolled_up=True)
+        )
+        await self.db.commit()
+        return len(executions)
+    
+    async def reset(self) -> None:
+        """集計・実行時間モデルをすべて削除し、全実行を未集計に戻す（集計し直す場合）"""
+        await self.db.execute(delete(ExecutionRollup))
+        await RegressionService(self.db).reset()
+        await self.db.execute(
+            update(JobExecution).where(JobExecution.rolled_up.is_(True)).values(rolled_up=False)
+        )
+        await self.db.commit()
+    
+    async def query(
+        self,
+        group_by: str,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        granularity: str = "day",
+        job_id: Optional[int] = None,
+        server_id: Optional[int] = None
+    ) -> List[dict]:
+        """
+        集計を取得
+        
+        Args:
+            group_by: "job"（ジョブごと）または "server"（実行したサーバごと）
+            since: 集計開始日時（Noneは7日前）
+            until: 集計終了日時（Noneは現在）
+            granularity: "hour"（1時間ごと）または "day"（1日ごと。UTC）
+            job_id: ジョブIDで絞り込み
+            server_id: サーバIDで絞り込み
+            
+        Returns:
+            グループ・時間帯ごとの件数・成功率・実行時間の辞書のリスト（時間帯の古い順）
+        """
+        until = until or datetime.utcnow()
+        since = since or until - timedelta(days=7)
+        query = select(ExecutionRollup).where(
+            ExecutionRollup.bucket_start >= bucket_of(since),
+            ExecutionRollup.bucket_start < until,
+        )
+        if job_id is not None:
+            query = query.where(ExecutionRollup.job_id == job_id)
+        if server_id is not None:
+            query = query.where(ExecutionRollup.server_id == server_id)
+        result = await self.db.execute(query)
+        
+        groups: Dict[Tuple[Optional[int], datetime], _Totals] = {}
+        for rollup in result.scalars().all():
+            bucket = _naive(rollup.bucket_start)
+            if granularity == "day":
+                bucket = bucket.replace(hour=0)
+            group = rollup.job_id if group_by == "job" else rollup.server_id
+            groups.setdefault((group, bucket), _Totals()).merge(rollup)
+        
+        key_name = "job_id" if group_by == "job" else "server_id"
+        return [
+            {key_name: group, "bucket_start": bucket, **totals.to_dict()}
+            for (group, bucket), totals in sorted(
+                groups.items(), key=lambda item: (item[0][1], item[0][0] is None, item[0][0] or 0)
+            )
+        ]
+
+
+def _naive(moment: datetime) -> datetime:
+    """タイムゾーン付きの日時をUTCのタイムゾーンなしに揃える（比較・グループ化のキーに使う）"""
+    if moment.tzinfo is not None:
+        return (moment - moment.utcoffset()).replace(tzinfo=None)
+    return moment
+
+
+class ExecutionRollupWorker:
+    """
+    集計ワーカー
+    
+    このプロセスで実行が終了したイベントを受け取るとすぐに、それ以外（他のワーカーで
+    終了した実行）は一定間隔で、未集計の実行を集計に加算する。
+    """
+    
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+    
+    def start(self) -> None:
+        """集計ループを開始"""
+        if self._task is None and settings.rollup_enabled:
+            self._task = asyncio.create_task(self._loop())
+    
+    async def stop(self) -> None:
+        """集計ループを停止"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+    
+    async def _loop(self) -> None:
+        """終了イベントまたは一定間隔ごとに未集計の実行を加算する"""
+        with execution_events.subscribe() as subscription:
+            while True:
+                try:
+                    while True:
+                        async with AsyncSessionLocal() as db:
+                            applied = await RollupService(db).apply_pending()
+                        if applied < settings.rollup_batch_size:
+                            break
+                except Exception:
+                    logger.exception("実行の集計に失敗しました")
+                await self._wait_finished(subscription)
+    
+    @staticmethod
+    async def _wait_finished(subscription) -> None:
+        """実行が終了したイベントを受け取るか、一定時間が経過するまで待つ"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.rollup_interval
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return
+            try:
+                message = await asyncio.wait_for(subscription.get(), timeout=remaining)
+            except asyncio.TimeoutError:
+                return
+            if message.status in FINAL_STATUSES:
+                # 同時に終了した他の実行もまとめて加算する
+                await asyncio.sleep(settings.rollup_delay)
+                return
+
+
+# シングルトンインスタンス
+execution_rollup_worker = ExecutionRollupWorker()
@@ -0,0 +1,108 @@
+"""
+リモートスクリプトキャッシュ
+スクリプトを内容のハッシュ名でリモートに一度だけ転送し、以降はキャッシュを実行する
+
+リモートのコマンドはログインシェルで解釈されるため、ログインシェルが POSIX 互換
+（sh / bash / dash / zsh / ksh）であることが前提。fish・csh などのホストでは
+SSH_SCRIPT_CACHE_ENABLED=False にする。ハッシュの検証には sha256sum（GNU）、
+shasum（macOS・BSD）、openssl のいずれかを使い、どれもないホストではキャッシュを使わない。
+"""
+import hashlib
+import shlex
+from typing import Hashable, Set
+
+
+# キャッシュミス・書き込み不可を示すマーカー（標準エラー出力の最終行）
+CACHE_MISS_MARKER = "__tsubame_script_cache_miss__"
+CACHE_READONLY_MARKER = "__tsubame_script_cache_readonly__"
+CACHE_UNSUPPORTED_MARKER = "__tsubame_script_cache_unsupported__"
+# マーカー出力時の終了コード
+CACHE_SIGNAL_EXIT_CODE = 254
+
+# SHA-256 を計算するコマンドを選ぶシェル式（見つからなければ非対応マーカーを出力して終了する）
+_HASH_COMMAND_EXPR = (
+    'if command -v sha256sum >/dev/null 2>&1; then h="sha256sum"; '
+    'elif command -v shasum >/dev/null 2>&1; then h="shasum -a 256"; '
+    'elif command -v openssl >/dev/null 2>&1; then h="openssl dgst -sha256 -r"; '
+    f'else echo {CACHE_UNSUPPORTED_MARKER} >&2; exit {CACHE_SIGNAL_EXIT_CODE}; fi; '
+)
+
+
+def script_hash(script: str) -> str:
+    """スクリプト内容のSHA-256ハッシュ"""
+    return hashlib.sha256(script.encode()).hexdigest()
+
+
+def _remote_dir_expr(cache_dir: str) -> str:
+    """キャッシュディレクトリをシェル式に変換（先頭の ~/ は $HOME に展開）"""
+    if cache_dir.startswith("~/"):
+        return '"$HOME"/' + shlex.quote(cache_dir[2:])
+    return shlex.quote(cache_dir)
+
+
+class RemoteScriptCache:
+    """
+    リモートスクリプトキャッシュ
+    
+    スクリプトを exec コマンドとして毎回送る代わりに、
+    <キャッシュディレクトリ>/<sha256>.sh へ標準入力経由で一度だけ転送する。
+    実行時はファイルのハッシュを検証し、一致した場合のみキャッシュを実行する。
+    書き込みできないホスト・ハッシュを計算するコマンドがないホストは記憶しておき、
+    従来どおりコマンドとして直接実行する。
+    """
+    
+    def __init__(self, cache_dir: str, ttl_days: int):
+        """
+        Args:
+            cache_dir: リモートのキャッシュディレクトリ
+            ttl_days: 最終利用からこの日数を過ぎたキャッシュを削除する
+        """
+        self.dir_expr = _remote_dir_expr(cache_dir)
+        self.ttl_days = ttl_days
+        self._readonly: Set[Hashable] = set()
+    
+    def is_readonly(self, key: Hashable) -> bool:
+        """キャッシュを使えないホストか"""
+        return key in self._readonly
+    
+    def mark_readonly(self, key: Hashable) -> None:
+        """キャッシュを使えないホストとして記憶"""
+        self._readonly.add(key)
+    
+    def run_command(self, digest: str) -> str:
+        """
+        キャッシュ済みスクリプトを実行するコマンド
+        
+        ファイルが存在しハッシュが一致する場合のみ実行し（利用日時を更新）、
+        それ以外はミスマーカーを出力して終了する。ハッシュを計算するコマンドが
+        ない場合は非対応マーカーを出力して終了する。
+        """
+        return (
+            f'f={self.dir_expr}/{digest}.sh; '
+            f'{_HASH_COMMAND_EXPR}'
+            f'if [ -f "$f" ] && [ "$($h < "$f" 2>/dev/null | cut -c1-64)" = {digest} ]; then '
+            f'touch "$f" 2>/dev/null; exec "${{SHELL:-/bin/sh}}" "$f"; fi; '
+            f'echo {CACHE_MISS_MARKER} >&2; exit {CACHE_SIGNAL_EXIT_CODE}'
+        )
+    
+    def upload_command(self, digest: str) -> str:
+        """
+        標準入力のスクリプトをキャッシュに書き込んで実行するコマンド
+        
+        一時ファイルに書いてから rename するため、同時転送でも壊れたファイルは残らない。
+        書き込みに成功したときは期限切れのキャッシュをバックグラウンドで削除する。
+        書き込めない場合は書き込み不可マーカーを出力して終了する。
+        """
+        return (
+            f'd={self.dir_expr}; f="$d/{digest}.sh"; t="$f.tmp.$$"; '
+            f'if mkdir -p "$d" 2>/dev/null && cat > "$t" 2>/dev/null && mv -f "$t" "$f" 2>/dev/null; then '
+            f'(find "$d" -type f -name "*.sh" -mtime +{self.ttl_days} -delete; '
+            f'find "$d" -type f -name "*.tmp.*" -mmin +60 -delete) >/dev/null 2>&1 & '
+            f'exec "${{SHELL:-/bin/sh}}" "$f"; fi; '
+            f'rm -f "$t" 2>/dev/null; echo {CACHE_READONLY_MARKER} >&2; exit {CACHE_SIGNAL_EXIT_CODE}'
+        )
+    
+    @staticmethod
+    def is_signal(exit_code: int, stderr: str, marker: str) -> bool:
+        """実行結果がキャッシュ処理のマーカーか（スクリプト自体の結果ではないか）"""
+        return exit_code == CACHE_SIGNAL_EXIT_CODE and stderr.strip() == marker
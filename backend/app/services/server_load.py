@@ -0,0 +1,294 @@
+"""
+サーバの負荷収集と割り当て
+サーバプールのメンバーの負荷を定期的に収集し、実行ごとに負荷の低いメンバーを選ぶ
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.server import Server
+from app.services.concurrency_controller import concurrency_controller
+from app.services.execution_scheduler import execution_scheduler
+from app.services.ssh_service import ssh_service
+
+logger = logging.getLogger(__name__)
+
+
+# 1回のチャネルでロードアベレージ・CPU数・メモリをまとめて取得する
+LOAD_COMMAND = (
+    "cat /proc/loadavg; "
+    "getconf _NPROCESSORS_ONLN; "
+    "grep -E '^(MemTotal|MemAvailable):' /proc/meminfo"
+)
+
+# 収集に失敗したサーバ・空きメモリが少ないサーバに加える値（他に候補がない場合のみ選ばれる）
+UNAVAILABLE_PENALTY = 1000.0
+
+
+class ServerLoadNotAvailableError(Exception):
+    """サーバの負荷を収集できない"""
+    pass
+
+
+@dataclass
+class ServerLoad:
+    """サーバの負荷の収集結果"""
+    load1: float
+    cpus: int
+    memory_total_kb: Optional[int] = None
+    memory_available_kb: Optional[int] = None
+    sampled_at: float = 0.0  # time.monotonic()
+    
+    @property
+    def load_per_cpu(self) -> float:
+        """CPUあたりのロードアベレージ（1分）"""
+        return self.load1 / max(self.cpus, 1)
+    
+    @property
+    def memory_available_ratio(self) -> Optional[float]:
+        """空きメモリの割合"""
+        if not self.memory_total_kb or self.memory_available_kb is None:
+            return None
+        return self.memory_available_kb / self.memory_total_kb
+
+
+def parse_load(output: str) -> ServerLoad:
+    """
+    負荷収集コマンドの出力を解析
+    
+    Args:
+        output: LOAD_COMMAND の標準出力
+        
+    Returns:
+        収集結果（sampled_at は未設定）
+        
+    Raises:
+        ServerLoadNotAvailableError: 出力の形式が不正
+    """
+    lines = output.strip().splitlines()
+    try:
+        load1 = float(lines[0].split()[0])
+        cpus = int(lines[1].strip())
+    except (IndexError, ValueError):
+        raise ServerLoadNotAvailableError(f"負荷の出力を解析できません: {output[:200]!r}")
+    
+    memory: Dict[str, int] = {}
+    for line in lines[2:]:
+        name, _, value = line.partition(":")
+        fields = value.split()
+        if fields and fields[0].isdigit():
+            memory[name.strip()] = int(fields[0])
+    
+    return ServerLoad(
+        load1=load1,
+        cpus=max(cpus, 1),
+        memory_total_kb=memory.get("MemTotal"),
+        memory_available_kb=memory.get("MemAvailable")
+    )
+
+
+def placement_score(
+    queued: int,
+    capacity: Optional[int],
+    load: Optional[ServerLoad],
+    now: Optional[float] = None
+) -> float:
+    """
+    サーバへの割り当てのしやすさを計算（小さいほど空いている）
+    
+    このプロセスで割り当て済みの件数（実行中と開始待ち）を同時実行数で割った値に、
+    直近の収集結果のCPUあたりのロードアベレージを加える。収集結果は一定間隔でしか
+    更新されないため、割り当て済みの件数を含めることで、収集の間に集中した実行も
+    同じサーバに偏らずに分散する。
+    
+    Args:
+        queued: このプロセスで割り当て済みの件数（実行中と開始待ち）
+        capacity: 同時実行数の上限（未指定の場合はCPU数、CPU数も不明な場合は1）
+        load: 直近の収集結果
+        now: 現在時刻（time.monotonic()、収集結果の鮮度の判定に使う）
+        
+    Returns:
+        スコア
+    """
+    now = time.monotonic() if now is None else now
+    if load is not None and now - load.sampled_at > settings.server_load_max_age:
+        load = None
+    
+    slots = capacity or (load.cpus if load else 1)
+    score = (queued + 1) / max(slots, 1)
+    
+    if load is None:
+        return score
+    score += load.load_per_cpu
+    ratio = load.memory_available_ratio
+    if ratio is not None and ratio < settings.server_load_min_free_memory_ratio:
+        score += UNAVAILABLE_PENALTY
+    return score
+
+
+def server_capacity(server: Server) -> Optional[int]:
+    """
+    サーバの現在の同時実行数の上限
+    
+    Args:
+        server: 対象サーバ
+        
+    Returns:
+        上限（適応型制御が有効な場合は現在の上限）、未指定の場合はNone
+    """
+    limit = server.max_concurrency or settings.scheduler_server_max_concurrency or None
+    if server.adaptive_concurrency:
+        limit = concurrency_controller.current_limit(server.id) or limit
+    return limit
+
+
+class ServerLoadSampler:
+    """
+    サーバプールのメンバーの負荷収集
+    
+    プールした接続上でチャネルを1本開き、ロードアベレージ・CPU数・空きメモリを
+    取得する。収集結果はプロセス内に持ち、割り当ての判定にのみ使う。
+    """
+    
+    def __init__(self):
+        self._loads: Dict[int, ServerLoad] = {}
+        self._failures: Dict[int, float] = {}
+        self._task: Optional[asyncio.Task] = None
+    
+    def start(self) -> None:
+        """収集ループを開始"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+    
+    async def stop(self) -> None:
+        """収集ループを停止"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+    
+    def get(self, server_id: int) -> Optional[ServerLoad]:
+        """サーバの直近の収集結果を取得"""
+        return self._loads.get(server_id)
+    
+    def is_unreachable(self, server_id: int) -> bool:
+        """直近の収集に失敗したか"""
+        return server_id in self._failures
+    
+    async def sample(self, server: Server) -> ServerLoad:
+        """
+        サーバの負荷を収集
+        
+        Args:
+            server: 対象サーバ
+            
+        Returns:
+            収集結果
+            
+        Raises:
+            ServerLoadNotAvailableError: 収集に失敗した
+        """
+        try:
+            exit_code, stdout, stderr = await asyncio.wait_for(
+                ssh_service.run_command(server, LOAD_COMMAND),
+                timeout=settings.server_load_sample_timeout
+            )
+        except asyncio.TimeoutError:
+            self._failures[server.id] = time.monotonic()
+            raise ServerLoadNotAvailableError(
+                f"負荷の収集がタイムアウトしました（{settings.server_load_sample_timeout}秒）"
+            )
+        except Exception as e:
+            self._failures[server.id] = time.monotonic()
+            raise ServerLoadNotAvailableError(f"負荷の収集に失敗: {str(e)}")
+        
+        try:
+            if exit_code != 0:
+                raise ServerLoadNotAvailableError(f"負荷の収集コマンドが失敗しました: {stderr.strip()}")
+            load = parse_load(stdout)
+        except ServerLoadNotAvailableError:
+            self._failures[server.id] = time.monotonic()
+            raise
+        
+        load.sampled_at = time.monotonic()
+        self._loads[server.id] = load
+        self._failures.pop(server.id, None)
+        return load
+    
+    async def sample_all(self, servers: Sequence[Server]) -> None:
+        """
+        複数サーバの負荷を並行して収集（失敗したサーバは記録のみ）
+        
+        Args:
+            servers: 対象サーバのリスト
+        """
+        await asyncio.gather(
+            *[self.sample(server) for server in servers],
+            return_exceptions=True
+        )
+    
+    def score(self, server: Server, now: Optional[float] = None) -> float:
+        """
+        サーバへの割り当てのスコア（収集に失敗したサーバは後回しにする）
+        
+        Args:
+            server: 対象サーバ
+            now: 現在時刻（time.monotonic()）
+            
+        Returns:
+            スコア（小さいほど空いている）
+        """
+        value = placement_score(
+            execution_scheduler.queued_on(server.id),
+            server_capacity(server),
+            self._loads.get(server.id),
+            now
+        )
+        if self.is_unreachable(server.id):
+            value += UNAVAILABLE_PENALTY
+        return value
+    
+    def choose(self, servers: Sequence[Server]) -> Server:
+        """
+        最も空いているサーバを選ぶ（同点の場合は割り当て済みの件数が少ない順）
+        
+        Args:
+            servers: 候補のサーバ（1台以上）
+            
+        Returns:
+            選んだサーバ
+        """
+        now = time.monotonic()
+        return min(
+            servers,
+            key=lambda server: (
+                self.score(server, now),
+                execution_scheduler.queued_on(server.id),
+                server.id
+            )
+        )
+    
+    async def _loop(self) -> None:
+        """収集ループ（プールに所属するサーバのみ対象）"""
+        while True:
+            try:
+                async with AsyncSessionLocal() as db:
+                    result = await db.execute(
+                        select(Server).where(Server.pool_id.is_not(None))
+                    )
+                    servers: List[Server] = list(result.scalars().all())
+                await self.sample_all(servers)
+            except Exception:
+                # 収集できなかった場合は割り当て済みの件数だけで判定する
+                logger.exception("サーバの負荷の収集に失敗しました")
+            await asyncio.sleep(settings.server_load_sample_interval)
+
+
+# シングルトンインスタンス
+server_load_sampler = ServerLoadSampler()
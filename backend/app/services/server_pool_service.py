@@ -0,0 +1,234 @@
+"""
+サーバプールサービス
+サーバプールのCRUD操作とメンバーの負荷の取得を管理
+"""
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from typing import List
+import time
+
+from app.models.server import Server
+from app.models.server_pool import ServerPool
+from app.schemas.server_pool import ServerPoolCreate, ServerPoolUpdate
+from app.services.server_service import ServerNotFoundError
+from app.services.execution_scheduler import execution_scheduler
+from app.services.server_load import server_load_sampler, server_capacity
+from app.services.definition_cache import definition_cache, ALL
+
+
+class ServerPoolNotFoundError(Exception):
+    """サーバプールが見つからない"""
+    pass
+
+
+class ServerPoolNameConflictError(Exception):
+    """同じ名前のサーバプールがすでにある"""
+    pass
+
+
+class ServerPoolService:
+    """サーバプール管理サービス"""
+    
+    def __init__(self, db: AsyncSession):
+        self.db = db
+    
+    async def get_all(self) -> List[ServerPool]:
+        """
+        全サーバプールを取得
+        
+        Returns:
+            サーバプールのリスト
+        """
+        result = await self.db.execute(select(ServerPool).order_by(ServerPool.id))
+        return list(result.scalars().all())
+    
+    async def get_by_id(self, pool_id: int) -> ServerPool:
+        """
+        IDでサーバプールを取得
+        
+        Args:
+            pool_id: サーバプールID
+            
+        Returns:
+            サーバプールオブジェクト
+            
+        Raises:
+            ServerPoolNotFoundError: サーバプールが見つからない
+        """
+        result = await self.db.execute(
+            select(ServerPool).where(ServerPool.id == pool_id)
+        )
+        pool = result.scalar_one_or_none()
+        
+        if not pool:
+            raise ServerPoolNotFoundError(f"サーバプールID {pool_id} が見つかりません")
+        
+        return pool
+    
+    async def create(self, pool_data: ServerPoolCreate) -> ServerPool:
+        """
+        サーバプールを作成
+        
+        Args:
+            pool_data: サーバプール作成データ
+            
+        Returns:
+            作成されたサーバプール
+            
+        Raises:
+            ServerPoolNameConflictError: 同じ名前のサーバプールがある
+            ServerNotFoundError: メンバーのサーバが見つからない
+        """
+        await self._check_name(pool_data.name)
+        servers = await self._get_servers(pool_data.server_ids)
+        
+        pool = ServerPool(
+            name=pool_data.name,
+            description=pool_data.description,
+            servers=servers
+        )
+        
+        self.db.add(pool)
+        # メンバーのサーバの所属が変わるため無効化する
+        await definition_cache.publish(self.db, ALL)
+        await self.db.commit()
+        definition_cache.invalidate(ALL)
+        await self.db.refresh(pool)
+        
+        return pool
+    
+    async def update(self, pool_id: int, pool_data: ServerPoolUpdate) -> ServerPool:
+        """
+        サーバプールを更新
+        
+        Args:
+            pool_id: サーバプールID
+            pool_data: 更新データ
+            
+        Returns:
+            更新されたサーバプール
+            
+        Raises:
+            ServerPoolNotFoundError: サーバプールが見つからない
+            ServerPoolNameConflictError: 同じ名前のサーバプールがある
+            ServerNotFoundError: メンバーのサーバが見つからない
+        """
+        pool = await self.get_by_id(pool_id)
+        
+        update_dict = pool_data.model_dump(exclude_unset=True)
+        
+        if update_dict.get("name") and update_dict["name"] != pool.name:
+            await self._check_name(update_dict["name"])
+        
+        # メンバーは指定した一覧で置き換える（外れたサーバはどのプールにも所属しない）
+        server_ids = update_dict.pop("server_ids", None)
+        if server_ids is not None:
+            pool.servers = await self._get_servers(server_ids)
+        
+        for key, value in update_dict.items():
+            if hasattr(pool, key) and value is not None:
+                setattr(pool, key, value)
+        
+        # プールはジョブ（実行先）の定義に含まれ、メンバーのサーバの所属も変わるため全件を無効化する
+        await definition_cache.publish(self.db, ALL)
+        await self.db.commit()
+        definition_cache.invalidate(ALL)
+        await self.db.refresh(pool)
+        
+        return pool
+    
+    async def delete(self, pool_id: int) -> None:
+        """
+        サーバプールを削除
+        
+        メンバーのサーバは残し、プールを実行先とするジョブは削除する。
+        
+        Args:
+            pool_id: サーバプールID
+            
+        Raises:
+            ServerPoolNotFoundError: サーバプールが見つからない
+        """
+        pool = await self.get_by_id(pool_id)
+        
+        await self.db.delete(pool)
+        await definition_cache.publish(self.db, ALL)
+        await self.db.commit()
+        definition_cache.invalidate(ALL)
+    
+    async def get_load(self, pool_id: int, refresh: bool = False) -> List[dict]:
+        """
+        メンバーの負荷と割り当てのスコアを取得
+        
+        Args:
+            pool_id: サーバプールID
+            refresh: 定期収集を待たずに負荷を収集し直すか
+            
+        Returns:
+            メンバーごとの負荷の辞書のリスト（スコアの小さい順）
+            
+        Raises:
+            ServerPoolNotFoundError: サーバプールが見つからない
+        """
+        pool = await self.get_by_id(pool_id)
+        servers = list(pool.servers)
+        if refresh:
+            await server_load_sampler.sample_all(servers)
+        
+        now = time.monotonic()
+        members = []
+        for server in servers:
+            load = server_load_sampler.get(server.id)
+            members.append({
+                "server_id": server.id,
+                "name": server.name,
+                "host": server.host,
+                "queued": execution_scheduler.queued_on(server.id),
+                "running": execution_scheduler.running_on(server.id),
+                "capacity": server_capacity(server),
+                "load1": load.load1 if load else None,
+                "cpus": load.cpus if load else None,
+                "memory_available_ratio": load.memory_available_ratio if load else None,
+                "sampled_seconds_ago": now - load.sampled_at if load else None,
+                "reachable": not server_load_sampler.is_unreachable(server.id),
+                "score": server_load_sampler.score(server, now),
+            })
+        
+        members.sort(key=lambda member: (member["score"], member["queued"], member["server_id"]))
+        return members
+    
+    async def _check_name(self, name: str) -> None:
+        """
+        プール名の重複を確認
+        
+        Raises:
+            ServerPoolNameConflictError: 同じ名前のサーバプールがある
+        """
+        result = await self.db.execute(
+            select(ServerPool.id).where(ServerPool.name == name)
+        )
+        if result.scalar_one_or_none() is not None:
+            raise ServerPoolNameConflictError(f"サーバプール {name} はすでに存在します")
+    
+    async def _get_servers(self, server_ids: List[int]) -> List[Server]:
+        """
+        メンバーのサーバを取得
+        
+        Raises:
+            ServerNotFoundError: サーバが見つからない
+        """
+        if not server_ids:
+            return []
+        
+        result = await self.db.execute(
+            select(Server).where(Server.id.in_(server_ids))
+        )
+        servers = list(result.scalars().all())
+        
+        missing = set(server_ids) - {server.id for server in servers}
+        if missing:
+            raise ServerNotFoundError(
+                f"サーバID {', '.join(str(server_id) for server_id in sorted(missing))} が見つかりません"
+            )
+        
+        return servers
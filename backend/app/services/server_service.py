@@ -8,8 +8,12 @@ from typing import List, Optional
 
 from app.models.server import Server, AuthMethod
 from app.schemas.server import ServerCreate, ServerUpdate
+from app.core.config import settings
 from app.core.security import credential_encryptor
 from app.services.ssh_service import ssh_service
+from app.services.concurrency_controller import concurrency_controller
+from app.services.execution_scheduler import execution_scheduler
+from app.services.definition_cache import definition_cache, ALL
 
 
 class ServerNotFoundError(Exception):
@@ -17,6 +21,11 @@ class ServerNotFoundError(Exception):
     pass
 
 
+class InvalidJumpServerError(Exception):
+    """踏み台サーバの指定が不正"""
+    pass
+
+
 class ServerService:
     """サーバ管理サービス"""
     
@@ -33,12 +42,50 @@ class ServerService:
         result = await self.db.execute(select(Server))
         return list(result.scalars().all())
     
-    async def get_by_id(self, server_id: int) -> Server:
+    async def get_concurrency_status(self) -> List[dict]:
+        """
+        全サーバの同時実行数の状態を取得
+        
+        Returns:
+            サーバごとの上限・実行中の件数・適応型制御の観測値の辞書のリスト
+        """
+        statuses = []
+        for server in await self.get_all():
+            status = {
+                "server_id": server.id,
+                "name": server.name,
+                "host": server.host,
+                "adaptive": bool(server.adaptive_concurrency),
+                "limit": server.max_concurrency or settings.scheduler_server_max_concurrency or None,
+                "running": execution_scheduler.running_on(server.id),
+            }
+            state = concurrency_controller.get(server.id) if server.adaptive_concurrency else None
+            if server.adaptive_concurrency and state is None:
+                # まだ実行していないサーバは設定からの初期状態を返す（制御対象には登録しない）
+                state = concurrency_controller.initial_state(
+                    server.min_concurrency, server.max_concurrency
+                )
+            if state is not None:
+                status.update(
+                    limit=int(state.limit),
+                    floor=state.floor,
+                    ceiling=state.ceiling,
+                    baseline_connect_seconds=state.baseline_connect_seconds,
+                    last_connect_seconds=state.last_connect_seconds,
+                    successes=state.successes,
+                    errors=state.errors,
+                    decreases=state.decreases
+                )
+            statuses.append(status)
+        return statuses
+    
+    async def get_by_id(self, server_id: int, cached: bool = False) -> Server:
         """
         IDでサーバを取得
         
         Args:
             server_id: サーバID
+            cached: 定義キャッシュを使うか（参照のみの場合に使う）
             
         Returns:
             サーバオブジェクト
@@ -46,10 +93,16 @@ class ServerService:
         Raises:
             ServerNotFoundError: サーバが見つからない
         """
-        result = await self.db.execute(
-            select(Server).where(Server.id == server_id)
-        )
-        server = result.scalar_one_or_none()
+        async def load(db: AsyncSession) -> Optional[Server]:
+            result = await db.execute(
+                select(Server).where(Server.id == server_id)
+            )
+            return result.scalar_one_or_none()
+        
+        if cached:
+            server = await definition_cache.get(self.db, "server", server_id, load)
+        else:
+            server = await load(self.db)
         
         if not server:
             raise ServerNotFoundError(f"サーバID {server_id} が見つかりません")
@@ -65,7 +118,14 @@ class ServerService:
             
         Returns:
             作成されたサーバ
+            
+        Raises:
+            ServerNotFoundError: 踏み台サーバが見つからない
+            InvalidJumpServerError: 踏み台サーバの指定が不正
         """
+        if server_data.jump_server_id:
+            await self._validate_jump_server(server_data.jump_server_id)
+        
         # 認証情報を暗号化
         password_encrypted = None
         private_key_encrypted = None
@@ -86,7 +146,11 @@ class ServerService:
             username=server_data.username,
             auth_method=server_data.auth_method,
             password_encrypted=password_encrypted,
-            private_key_encrypted=private_key_encrypted
+            private_key_encrypted=private_key_encrypted,
+            jump_server_id=server_data.jump_server_id,
+            max_concurrency=server_data.max_concurrency,
+            min_concurrency=server_data.min_concurrency,
+            adaptive_concurrency=server_data.adaptive_concurrency
         )
         
         self.db.add(server)
@@ -108,12 +172,17 @@ class ServerService:
             
         Raises:
             ServerNotFoundError: サーバが見つからない
+            InvalidJumpServerError: 踏み台サーバの指定が不正
         """
         server = await self.get_by_id(server_id)
         
         # 更新データを適用
         update_dict = server_data.model_dump(exclude_unset=True)
         
+        # 踏み台サーバの変更がある場合は検証
+        if update_dict.get("jump_server_id"):
+            await self._validate_jump_server(update_dict["jump_server_id"], server_id)
+        
         # 認証情報の更新処理
         if "password" in update_dict and update_dict["password"]:
             server.password_encrypted = credential_encryptor.encrypt(update_dict["password"])
@@ -128,9 +197,21 @@ class ServerService:
             if hasattr(server, key):
                 setattr(server, key, value)
         
+        # サーバはジョブ（実行先）や他のサーバ（踏み台）の定義にも含まれるため全件を無効化する
+        await definition_cache.publish(self.db, ALL)
         await self.db.commit()
+        definition_cache.invalidate(ALL)
         await self.db.refresh(server)
         
+        # 同時実行数の設定の変更を開始待ちの実行に反映する
+        if server.adaptive_concurrency and concurrency_controller.get(server.id) is not None:
+            concurrency_controller.configure(server.id, server.min_concurrency, server.max_concurrency)
+        execution_scheduler.kick(
+            server.id,
+            server.max_concurrency or settings.scheduler_server_max_concurrency,
+            bool(server.adaptive_concurrency)
+        )
+        
         return server
     
     async def delete(self, server_id: int) -> None:
@@ -146,7 +227,9 @@ class ServerService:
         server = await self.get_by_id(server_id)
         
         await self.db.delete(server)
+        await definition_cache.publish(self.db, ALL)
         await self.db.commit()
+        definition_cache.invalidate(ALL)
     
     async def test_connection(
         self,
@@ -155,7 +238,8 @@ class ServerService:
         username: str,
         auth_method: AuthMethod,
         password: Optional[str] = None,
-        private_key: Optional[str] = None
+        private_key: Optional[str] = None,
+        jump_server_id: Optional[int] = None
     ) -> tuple[bool, str]:
         """
         SSH接続テスト
@@ -167,15 +251,67 @@ class ServerService:
             auth_method: 認証方式
             password: パスワード
             private_key: 秘密鍵
+            jump_server_id: 経由する踏み台サーバID
             
         Returns:
             (成功フラグ, メッセージ) のタプル
+            
+        Raises:
+            ServerNotFoundError: 踏み台サーバが見つからない
+            InvalidJumpServerError: 踏み台サーバの指定が不正
         """
+        jump_server = None
+        if jump_server_id:
+            jump_server = await self._validate_jump_server(jump_server_id)
+        
         return await ssh_service.test_connection(
             host=host,
             port=port,
             username=username,
             auth_method=auth_method,
             password=password,
-            private_key=private_key
+            private_key=private_key,
+            jump_server=jump_server
         )
+    
+    async def _validate_jump_server(
+        self,
+        jump_server_id: int,
+        server_id: Optional[int] = None
+    ) -> Server:
+        """
+        踏み台サーバの指定を検証
+        
+        踏み台は1段のみ対応する（踏み台自身がさらに踏み台を経由する構成は不可）。
+        
+        Args:
+            jump_server_id: 踏み台サーバID
+            server_id: 更新対象のサーバID（新規作成時はNone）
+            
+        Returns:
+            踏み台サーバ
+            
+        Raises:
+            ServerNotFoundError: 踏み台サーバが見つからない
+            InvalidJumpServerError: 踏み台サーバの指定が不正
+        """
+        if server_id is not None and jump_server_id == server_id:
+            raise InvalidJumpServerError("自分自身を踏み台サーバに指定できません")
+        
+        jump_server = await self.get_by_id(jump_server_id)
+        if jump_server.jump_server_id:
+            raise InvalidJumpServerError(
+                f"サーバID {jump_server_id} は別の踏み台を経由しているため踏み台に指定できません"
+            )
+        
+        if server_id is not None:
+            # 他サーバの踏み台になっているサーバは、自身が踏み台を経由できない
+            result = await self.db.execute(
+                select(Server.id).where(Server.jump_server_id == server_id).limit(1)
+            )
+            if result.scalar_one_or_none() is not None:
+                raise InvalidJumpServerError(
+                    f"サーバID {server_id} は他のサーバの踏み台のため踏み台を経由できません"
+                )
+        
+        return jump_server
@@ -0,0 +1,222 @@
+"""
+SSH接続プール
+1本のSSH接続上に複数のセッションチャネルを多重化して共有する
+"""
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Dict, Hashable, List
+
+import asyncssh
+
+
+# 接続を確立するファクトリ関数の型
+ConnectFactory = Callable[[], Awaitable[asyncssh.SSHClientConnection]]
+
+
+class _PooledConnection:
+    """プール内の1接続と、その上で使用中のチャネル数"""
+    
+    def __init__(self, conn: asyncssh.SSHClientConnection, max_sessions: int):
+        self.conn = conn
+        self.max_sessions = max_sessions
+        self.active = 0
+        self.last_used = time.monotonic()
+    
+    @property
+    def closed(self) -> bool:
+        """接続が切断済みか"""
+        return self.conn.is_closed()
+    
+    @property
+    def has_capacity(self) -> bool:
+        """新しいチャネルを開く余地があるか"""
+        return not self.closed and self.active < self.max_sessions
+
+
+class SSHConnectionPool:
+    """
+    ホスト単位のSSH接続プール
+    
+    1接続あたり最大 max_sessions 本のセッションチャネルを多重化し、
+    上限を超えた場合は新しい接続を張る（ホストあたり max_connections 本まで）。
+    sshd にチャネルを拒否された場合（MaxSessions が設定値より小さい場合）は
+    その接続の上限を実際に開けた本数まで下げ、以降は別接続へ振り分ける。
+    """
+    
+    def __init__(
+        self,
+        max_sessions: int,
+        max_connections: int,
+        idle_timeout: float
+    ):
+        """
+        Args:
+            max_sessions: 1接続あたりの最大チャネル数
+            max_connections: 1ホストあたりの最大接続数
+            idle_timeout: 未使用接続を閉じるまでの秒数
+        """
+        self.max_sessions = max(1, max_sessions)
+        self.max_connections = max(1, max_connections)
+        self.idle_timeout = idle_timeout
+        self._entries: Dict[Hashable, List[_PooledConnection]] = {}
+        self._connecting: Dict[Hashable, int] = {}
+        self._waiting: Dict[Hashable, int] = {}
+        self._conditions: Dict[Hashable, asyncio.Condition] = {}
+        self._tunnels: Dict[Hashable, asyncssh.SSHClientConnection] = {}
+        self._tunnel_locks: Dict[Hashable, asyncio.Lock] = {}
+    
+    def _condition(self, key: Hashable) -> asyncio.Condition:
+        if key not in self._conditions:
+            self._conditions[key] = asyncio.Condition()
+        return self._conditions[key]
+    
+    @asynccontextmanager
+    async def session(
+        self,
+        key: Hashable,
+        connect: ConnectFactory
+    ) -> AsyncIterator[asyncssh.SSHClientConnection]:
+        """
+        チャネル1本分の枠を確保した接続を貸し出す
+        
+        Args:
+            key: 接続先を識別するキー
+            connect: 新規接続が必要な場合に呼び出すファクトリ
+            
+        Yields:
+            SSH接続オブジェクト（ブロック内で開くチャネルは1本にすること）
+        """
+        pooled = await self._acquire(key, connect)
+        try:
+            yield pooled.conn
+        except asyncssh.ChannelOpenError:
+            # MaxSessions に達している: 実際に開けていた本数を上限とする
+            pooled.max_sessions = max(1, pooled.active - 1)
+            raise
+        finally:
+            await self._release(key, pooled)
+    
+    async def tunnel(
+        self,
+        key: Hashable,
+        connect: ConnectFactory
+    ) -> asyncssh.SSHClientConnection:
+        """
+        踏み台（ジャンプホスト）用の共有接続を取得
+        
+        踏み台接続はポート転送（direct-tcpip）にのみ使い MaxSessions を消費しないため、
+        チャネル数を管理せずホストごとに1本を長期間使い回す。
+        
+        Args:
+            key: 踏み台を識別するキー
+            connect: 未接続・切断済みの場合に呼び出すファクトリ
+            
+        Returns:
+            踏み台へのSSH接続
+        """
+        lock = self._tunnel_locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            conn = self._tunnels.get(key)
+            if conn is None or conn.is_closed():
+                conn = await connect()
+                self._tunnels[key] = conn
+            return conn
+    
+    async def _acquire(self, key: Hashable, connect: ConnectFactory) -> _PooledConnection:
+        """空きのある接続を取得（なければ新規接続、上限なら待機）"""
+        cond = self._condition(key)
+        async with cond:
+            while True:
+                entries = self._prune(key)
+                # 使用中チャネルの多い接続から詰めて、余った接続をアイドルにする
+                candidates = [e for e in entries if e.has_capacity]
+                if candidates:
+                    pooled = max(candidates, key=lambda e: e.active)
+                    pooled.active += 1
+                    return pooled
+                
+                # 確立中の接続に空きが見込めるならその完了を待つ
+                connecting = self._connecting.get(key, 0)
+                waiting = self._waiting.get(key, 0)
+                if connecting * self.max_sessions <= waiting + connecting:
+                    if len(entries) + connecting < self.max_connections:
+                        self._connecting[key] = connecting + 1
+                        break
+                
+                self._waiting[key] = waiting + 1
+                try:
+                    await cond.wait()
+                finally:
+                    self._waiting[key] -= 1
+        
+        # 接続確立はロックの外で行う（他ホスト・他チャネルを待たせない）
+        try:
+            conn = await connect()
+        except BaseException:
+            async with cond:
+                self._connecting[key] -= 1
+                cond.notify_all()
+            raise
+        
+        pooled = _PooledConnection(conn, self.max_sessions)
+        pooled.active = 1
+        async with cond:
+            self._connecting[key] -= 1
+            self._entries.setdefault(key, []).append(pooled)
+            cond.notify_all()
+        return pooled
+    
+    async def _release(self, key: Hashable, pooled: _PooledConnection) -> None:
+        """チャネル枠を返却"""
+        cond = self._condition(key)
+        async with cond:
+            pooled.active -= 1
+            pooled.last_used = time.monotonic()
+            cond.notify_all()
+    
+    def _prune(self, key: Hashable) -> List[_PooledConnection]:
+        """切断済み・アイドルタイムアウトした接続を取り除く"""
+        now = time.monotonic()
+        alive: List[_PooledConnection] = []
+        for pooled in self._entries.get(key, []):
+            if pooled.closed:
+                continue
+            if pooled.active == 0 and now - pooled.last_used > self.idle_timeout:
+                pooled.conn.close()
+                continue
+            alive.append(pooled)
+        self._entries[key] = alive
+        return alive
+    
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        プールの状態を取得
+        
+        Returns:
+            キーごとの接続数・使用中チャネル数
+        """
+        stats = {
+            str(key): {
+                "connections": len(entries),
+                "active_channels": sum(e.active for e in entries),
+            }
+            for key, entries in self._entries.items()
+        }
+        for key, conn in self._tunnels.items():
+            if not conn.is_closed():
+                stats.setdefault(str(key), {"connections": 0, "active_channels": 0})
+                stats[str(key)]["tunnel"] = 1
+        return stats
+    
+    async def close_all(self) -> None:
+        """全接続を閉じる（アプリケーション終了時）"""
+        conns = [e.conn for items in self._entries.values() for e in items]
+        self._entries.clear()
+        # 踏み台経由の接続を先に閉じてから踏み台を閉じる
+        conns.extend(self._tunnels.values())
+        self._tunnels.clear()
+        for conn in conns:
+            conn.close()
+        for conn in conns:
+            await conn.wait_closed()
@@ -3,13 +3,25 @@ SSH接続サービス
 asyncsshを使用してリモートサーバに接続し、スクリプトを実行
 """
 import asyncssh
-from typing import Optional, Tuple
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Dict, Optional, Tuple
 import asyncio
-from datetime import datetime
+import logging
+import time
 
 from app.core.config import settings
 from app.core.security import credential_encryptor
 from app.models.server import Server, AuthMethod
+from app.services.ssh_pool import SSHConnectionPool
+from app.services.script_cache import (
+    RemoteScriptCache,
+    CACHE_MISS_MARKER,
+    CACHE_READONLY_MARKER,
+    CACHE_UNSUPPORTED_MARKER,
+    script_hash
+)
+
+logger = logging.getLogger(__name__)
 
 
 class SSHConnectionError(Exception):
@@ -22,12 +34,60 @@ class SSHExecutionError(Exception):
     pass
 
 
+# 実行中の出力を受け取るコールバック（ストリーム名 "stdout"/"stderr", 受信したデータ）
+OutputCallback = Callable[[str, str], None]
+
+
+class _SignalGuard:
+    """
+    キャッシュ処理のマーカーになりうる間、標準エラー出力の転送を保留する
+    
+    キャッシュミス等のマーカーはスクリプトを実行せずに標準エラー出力へ出すため、
+    マーカーと区別できるまで実行中の出力として転送しない。
+    """
+    
+    def __init__(self, on_output: OutputCallback, *markers: str):
+        self.on_output = on_output
+        self.markers = markers
+        self.held = ""
+        self.passing = False
+    
+    def __call__(self, stream: str, data: str) -> None:
+        if self.passing:
+            self.on_output(stream, data)
+            return
+        if stream == "stderr":
+            self.held += data
+            held = self.held.rstrip("\n")
+            if any(marker.startswith(held) for marker in self.markers):
+                return
+        self.release()
+        if stream != "stderr":
+            self.on_output(stream, data)
+    
+    def release(self) -> None:
+        """保留している出力を転送し、以降はそのまま転送する"""
+        self.passing = True
+        if self.held:
+            self.on_output("stderr", self.held)
+            self.held = ""
+
+
 class SSHService:
     """SSH接続とスクリプト実行を管理するサービス"""
     
     def __init__(self):
         self.timeout = settings.ssh_timeout
         self.connect_timeout = settings.ssh_connect_timeout
+        self.pool = SSHConnectionPool(
+            max_sessions=settings.ssh_max_sessions_per_connection,
+            max_connections=settings.ssh_max_connections_per_host,
+            idle_timeout=settings.ssh_pool_idle_timeout
+        )
+        self.script_cache = RemoteScriptCache(
+            cache_dir=settings.ssh_script_cache_dir,
+            ttl_days=settings.ssh_script_cache_ttl_days
+        )
     
     async def test_connection(
         self,
@@ -36,7 +96,8 @@ class SSHService:
         username: str,
         auth_method: AuthMethod,
         password: Optional[str] = None,
-        private_key: Optional[str] = None
+        private_key: Optional[str] = None,
+        jump_server: Optional[Server] = None
     ) -> Tuple[bool, str]:
         """
         SSH接続テスト
@@ -48,18 +109,24 @@ class SSHService:
             auth_method: 認証方式
             password: パスワード（auth_method=passwordの場合）
             private_key: 秘密鍵（auth_method=keyの場合）
+            jump_server: 経由する踏み台サーバ
             
         Returns:
             (成功フラグ, メッセージ) のタプル
         """
         try:
+            tunnel = None
+            if jump_server is not None:
+                tunnel = await self._get_tunnel(jump_server)
+            
             conn = await self._create_connection(
                 host=host,
                 port=port,
                 username=username,
                 auth_method=auth_method,
                 password=password,
-                private_key=private_key
+                private_key=private_key,
+                tunnel=tunnel
             )
             
             # 簡単なコマンドを実行して接続を確認
@@ -78,7 +145,9 @@ class SSHService:
     async def execute_script(
         self,
         server: Server,
-        script: str
+        script: str,
+        timings: Optional[Dict[str, float]] = None,
+        on_output: Optional[OutputCallback] = None
     ) -> Tuple[int, str, str]:
         """
         サーバ上でスクリプトを実行
@@ -86,6 +155,10 @@ class SSHService:
         Args:
             server: 実行先サーバ
             script: 実行するスクリプト
+            timings: 指定した場合、新しく接続したときは接続（ハンドシェイク）にかかった
+                秒数を connect_seconds に、プールから接続を取得するまでの秒数
+                （接続待ち・新しい接続を含む）を acquire_seconds に設定する
+            on_output: 実行中に受信した出力を渡すコールバック
             
         Returns:
             (終了コード, 標準出力, 標準エラー出力) のタプル
@@ -94,47 +167,39 @@ class SSHService:
             SSHConnectionError: 接続エラー
             SSHExecutionError: 実行エラー
         """
+        started = time.monotonic()
+        
+        async def connect() -> asyncssh.SSHClientConnection:
+            # プールの既存の接続を使い回した場合は呼ばれないため、ハンドシェイクの時間だけを計る
+            connect_started = time.monotonic()
+            conn = await self._connect_server(server)
+            if timings is not None:
+                timings["connect_seconds"] = time.monotonic() - connect_started
+            return conn
+        
         try:
-            # 認証情報を復号化
-            password = None
-            private_key = None
-            
-            if server.auth_method == AuthMethod.PASSWORD:
-                if server.password_encrypted:
-                    password = credential_encryptor.decrypt(server.password_encrypted)
-            else:
-                if server.private_key_encrypted:
-                    private_key = credential_encryptor.decrypt(server.private_key_encrypted)
-            
-            # SSH接続
-            conn = await self._create_connection(
-                host=server.host,
-                port=server.port,
-                username=server.username,
-                auth_method=server.auth_method,
-                password=password,
-                private_key=private_key
-            )
-            
-            # スクリプト実行（タイムアウト付き）
-            try:
-                result = await asyncio.wait_for(
-                    conn.run(script, check=False),
-                    timeout=self.timeout
-                )
-                
-                exit_code = result.exit_status if result.exit_status is not None else 0
-                stdout = result.stdout if result.stdout else ""
-                stderr = result.stderr if result.stderr else ""
-                
-                await conn.close()
-                
-                return exit_code, stdout, stderr
-                
-            except asyncio.TimeoutError:
-                await conn.close()
-                raise SSHExecutionError(f"スクリプト実行がタイムアウトしました（{self.timeout}秒）")
+            if not settings.ssh_pool_enabled:
+                # 多重化なし: 実行ごとに接続を張って閉じる
+                conn = await connect()
+                if timings is not None:
+                    timings["acquire_seconds"] = time.monotonic() - started
+                try:
+                    return await self._run_script(conn, self._pool_key(server), script, on_output)
+                finally:
+                    conn.close()
             
+            # 同一サーバへの接続をプールで共有し、チャネルを多重化する
+            # MaxSessions 超過でチャネルを拒否された場合は別接続で1回だけ再試行
+            for attempt in range(2):
+                try:
+                    async with self.pool.session(self._pool_key(server), connect) as conn:
+                        if timings is not None:
+                            timings["acquire_seconds"] = time.monotonic() - started
+                        return await self._run_script(conn, self._pool_key(server), script, on_output)
+                except asyncssh.ChannelOpenError:
+                    if attempt > 0:
+                        raise
+                        
         except asyncssh.Error as e:
             raise SSHConnectionError(f"SSH接続エラー: {str(e)}")
         except SSHConnectionError:
@@ -144,6 +209,284 @@ class SSHService:
         except Exception as e:
             raise SSHExecutionError(f"予期しないエラー: {str(e)}")
     
+    async def run_command(
+        self,
+        server: Server,
+        command: str,
+        input: Optional[str] = None,
+        timings: Optional[Dict[str, float]] = None
+    ) -> Tuple[int, str, str]:
+        """
+        サーバ上でコマンドを実行（リモートスクリプトキャッシュを経由しない）
+        
+        負荷の収集や実行のバッチなど、内容が毎回異なりキャッシュの効かない
+        コマンド向け。
+        
+        Args:
+            server: 実行先サーバ
+            command: 実行するコマンド
+            input: 標準入力に渡すデータ
+            timings: 指定した場合、新しく接続したときは接続（ハンドシェイク）にかかった
+                秒数を connect_seconds に設定する
+            
+        Returns:
+            (終了コード, 標準出力, 標準エラー出力) のタプル
+            
+        Raises:
+            SSHConnectionError: 接続エラー
+            SSHExecutionError: 実行エラー
+        """
+        async def connect() -> asyncssh.SSHClientConnection:
+            # プールの既存の接続を使い回した場合は呼ばれないため、ハンドシェイクの時間だけを計る
+            connect_started = time.monotonic()
+            conn = await self._connect_server(server)
+            if timings is not None:
+                timings["connect_seconds"] = time.monotonic() - connect_started
+            return conn
+        
+        try:
+            if not settings.ssh_pool_enabled:
+                conn = await connect()
+                try:
+                    return await self._run_command(conn, command, input=input)
+                finally:
+                    conn.close()
+            
+            async with self.pool.session(self._pool_key(server), connect) as conn:
+                return await self._run_command(conn, command, input=input)
+        except asyncssh.Error as e:
+            raise SSHConnectionError(f"SSH接続エラー: {str(e)}")
+    
+    @asynccontextmanager
+    async def open_sftp(self, server: Server) -> AsyncIterator[asyncssh.SFTPClient]:
+        """
+        サーバへのSFTPセッションを開く（プールした接続上のチャネルを1本使う）
+        
+        Args:
+            server: 接続先サーバ
+            
+        Yields:
+            SFTPクライアント
+            
+        Raises:
+            SSHConnectionError: 接続エラー・SFTPエラー
+        """
+        try:
+            if not settings.ssh_pool_enabled:
+                conn = await self._connect_server(server)
+                try:
+                    async with conn.start_sftp_client() as sftp:
+                        yield sftp
+                finally:
+                    conn.close()
+                return
+            
+            async with self.pool.session(
+                self._pool_key(server),
+                lambda: self._connect_server(server)
+            ) as conn:
+                async with conn.start_sftp_client() as sftp:
+                    yield sftp
+        except asyncssh.Error as e:
+            raise SSHConnectionError(f"SFTPエラー: {str(e)}")
+    
+    async def close(self) -> None:
+        """プール中の接続をすべて閉じる"""
+        await self.pool.close_all()
+    
+    async def _run_script(
+        self,
+        conn: asyncssh.SSHClientConnection,
+        key: tuple,
+        script: str,
+        on_output: Optional[OutputCallback] = None
+    ) -> Tuple[int, str, str]:
+        """
+        スクリプトを実行（リモートスクリプトキャッシュ経由）
+        
+        キャッシュ済みならハッシュを検証して実行し、未転送なら標準入力で転送して実行する。
+        キャッシュディレクトリに書き込めないホストではスクリプトを直接実行する。
+        
+        Args:
+            conn: SSH接続
+            key: 接続先ホストのキー
+            script: 実行するスクリプト
+            on_output: 実行中に受信した出力を渡すコールバック
+            
+        Returns:
+            (終了コード, 標準出力, 標準エラー出力) のタプル
+            
+        Raises:
+            SSHExecutionError: タイムアウト
+        """
+        cache = self.script_cache
+        if not settings.ssh_script_cache_enabled or cache.is_readonly(key):
+            return await self._run_command(conn, script, on_output=on_output)
+        
+        digest = script_hash(script)
+        guard = _SignalGuard(on_output, CACHE_MISS_MARKER, CACHE_UNSUPPORTED_MARKER) if on_output else None
+        result = await self._run_command(conn, cache.run_command(digest), on_output=guard)
+        if cache.is_signal(result[0], result[2], CACHE_UNSUPPORTED_MARKER):
+            # sha256sum / shasum / openssl のいずれもない: 以降このホストは直接実行する
+            logger.warning("%s にSHA-256を計算するコマンドがないため、スクリプトキャッシュを使いません", key)
+            cache.mark_readonly(key)
+            return await self._run_command(conn, script, on_output=on_output)
+        if not cache.is_signal(result[0], result[2], CACHE_MISS_MARKER):
+            if guard:
+                guard.release()
+            return result
+        
+        # キャッシュミス: 標準入力で転送してそのまま実行
+        guard = _SignalGuard(on_output, CACHE_READONLY_MARKER) if on_output else None
+        result = await self._run_command(conn, cache.upload_command(digest), input=script, on_output=guard)
+        if not cache.is_signal(result[0], result[2], CACHE_READONLY_MARKER):
+            if guard:
+                guard.release()
+            return result
+        
+        # 読み取り専用ファイルシステム等: 以降このホストは直接実行する
+        logger.warning("%s のスクリプトキャッシュに書き込めないため、スクリプトキャッシュを使いません", key)
+        cache.mark_readonly(key)
+        return await self._run_command(conn, script, on_output=on_output)
+    
+    async def _run_command(
+        self,
+        conn: asyncssh.SSHClientConnection,
+        command: str,
+        input: Optional[str] = None,
+        on_output: Optional[OutputCallback] = None
+    ) -> Tuple[int, str, str]:
+        """
+        接続上でチャネルを1本開いてコマンドを実行
+        
+        Args:
+            conn: SSH接続
+            command: 実行するコマンド
+            input: 標準入力に渡すデータ
+            on_output: 実行中に受信した出力を渡すコールバック
+            
+        Returns:
+            (終了コード, 標準出力, 標準エラー出力) のタプル
+            
+        Raises:
+            SSHExecutionError: タイムアウト
+        """
+        process = await conn.create_process(command, input=input)
+        try:
+            if on_output is None:
+                result = await asyncio.wait_for(
+                    process.wait(check=False),
+                    timeout=self.timeout
+                )
+                stdout = result.stdout if result.stdout else ""
+                stderr = result.stderr if result.stderr else ""
+            else:
+                stdout, stderr = await asyncio.wait_for(
+                    asyncio.gather(
+                        self._read_stream(process.stdout, "stdout", on_output),
+                        self._read_stream(process.stderr, "stderr", on_output)
+                    ),
+                    timeout=self.timeout
+                )
+                result = await asyncio.wait_for(
+                    process.wait(check=False),
+                    timeout=self.timeout
+                )
+        except asyncio.TimeoutError:
+            # チャネルを閉じて共有接続上の枠を解放する
+            process.close()
+            raise SSHExecutionError(f"スクリプト実行がタイムアウトしました（{self.timeout}秒）")
+        
+        exit_code = result.exit_status if result.exit_status is not None else 0
+        
+        return exit_code, stdout, stderr
+    
+    @staticmethod
+    async def _read_stream(
+        stream: asyncssh.SSHReader,
+        name: str,
+        on_output: OutputCallback
+    ) -> str:
+        """
+        出力を終わりまで読み、受信するたびにコールバックへ渡す
+        
+        Returns:
+            出力全体
+        """
+        chunks = []
+        while True:
+            data = await stream.read(65536)
+            if not data:
+                break
+            chunks.append(data)
+            on_output(name, data)
+        return "".join(chunks)
+    
+    def _pool_key(self, server: Server) -> tuple:
+        """接続プールのキー（接続先・ユーザー・経由する踏み台）"""
+        key: tuple = (server.host, server.port, server.username)
+        if server.jump_server_id:
+            # 踏み台ごとに到達先が異なる（プライベートIPの重複など）ため区別する
+            key += self._pool_key(server.jump_server)
+        return key
+    
+    async def _connect_server(self, server: Server) -> asyncssh.SSHClientConnection:
+        """
+        サーバ情報からSSH接続を確立
+        
+        Args:
+            server: 接続先サーバ
+            
+        Returns:
+            SSH接続オブジェクト
+            
+        Raises:
+            SSHConnectionError: 接続エラー
+        """
+        # 認証情報を復号化
+        password = None
+        private_key = None
+        
+        if server.auth_method == AuthMethod.PASSWORD:
+            if server.password_encrypted:
+                password = credential_encryptor.decrypt(server.password_encrypted)
+        else:
+            if server.private_key_encrypted:
+                private_key = credential_encryptor.decrypt(server.private_key_encrypted)
+        
+        # 踏み台経由の場合は共有している踏み台接続をトンネルとして使う
+        tunnel = None
+        if server.jump_server_id:
+            tunnel = await self._get_tunnel(server.jump_server)
+        
+        return await self._create_connection(
+            host=server.host,
+            port=server.port,
+            username=server.username,
+            auth_method=server.auth_method,
+            password=password,
+            private_key=private_key,
+            tunnel=tunnel
+        )
+    
+    async def _get_tunnel(self, jump_server: Server) -> asyncssh.SSHClientConnection:
+        """
+        踏み台サーバへの共有接続を取得
+        
+        Args:
+            jump_server: 踏み台サーバ
+            
+        Returns:
+            踏み台へのSSH接続（複数の接続先で共有される）
+            
+        Raises:
+            SSHConnectionError: 踏み台への接続エラー
+        """
+        return await self.pool.tunnel(
+            self._pool_key(jump_server),
+            lambda: self._connect_server(jump_server)
+        )
+    
     async def _create_connection(
         self,
         host: str,
@@ -151,7 +494,8 @@ class SSHService:
         username: str,
         auth_method: AuthMethod,
         password: Optional[str] = None,
-        private_key: Optional[str] = None
+        private_key: Optional[str] = None,
+        tunnel: Optional[asyncssh.SSHClientConnection] = None
     ) -> asyncssh.SSHClientConnection:
         """
         SSH接続を確立
@@ -163,6 +507,7 @@ class SSHService:
             auth_method: 認証方式
             password: パスワード
             private_key: 秘密鍵
+            tunnel: 経由する踏み台への接続（直接接続の場合はNone）
             
         Returns:
             SSH接続オブジェクト
@@ -180,6 +525,9 @@ class SSHService:
                 "connect_timeout": self.connect_timeout,
             }
             
+            if tunnel is not None:
+                connect_kwargs["tunnel"] = tunnel
+            
             if auth_method == AuthMethod.PASSWORD:
                 if not password:
                     raise SSHConnectionError("パスワードが指定されていません")
@@ -0,0 +1,107 @@
+"""
+ステップマーカー
+スクリプトが標準出力に出す「::step 名前::」の行を実行中の出力から検出し、ステップごとの時間を記録する
+"""
+from datetime import datetime
+from typing import Callable, List, Optional
+
+# ステップの開始を表す行（「::step 名前::」）
+STEP_PREFIX = "::step "
+STEP_SUFFIX = "::"
+
+# 改行を待つ行の最大長（これより長い行はマーカーとして扱わない）
+MAX_MARKER_LENGTH = 512
+
+
+class StepTracker:
+    """
+    実行中の出力からステップを検出する
+    
+    標準出力を受信するたびに feed に渡す。行の先頭が「::step 」で始まり「::」で終わる
+    行をステップの開始とみなし、次のステップの開始（最後のステップは実行の終了）までを
+    そのステップの時間とする。時刻は出力を受信した時刻のため、同時に受信した
+    マーカーは同じ時刻になる。
+    チャンクにマーカーが含まれない場合は文字列の検索を1回行うだけで、行に分割しない。
+    チャンクをまたぐマーカーのため、マーカーになりうる書きかけの行だけを持ち越す。
+    """
+    
+    def __init__(self, clock: Callable[[], datetime] = datetime.utcnow):
+        self.steps: List[dict] = []
+        self._clock = clock
+        self._carry = ""  # マーカーになりうる書きかけの行
+        self._midline = False  # 直前の出力が行の途中で終わったか
+
+    def feed(self, stream: str, data: str) -> bool:
+        """
+        受信した出力を処理
+        
+        Args:
+            stream: "stdout" または "stderr"（標準出力のみ対象）
+            data: 受信した出力
+            
+        Returns:
+            ステップが始まった場合はTrue
+        """
+        if stream != "stdout":
+            return False
+        at_line_start = not self._midline
+        if self._carry:
+            data = self._carry + data
+            self._carry = ""
+            at_line_start = True
+        
+        last_newline = data.rfind("\n")
+        tail = data[last_newline + 1:]
+        self._midline = bool(tail)
+        if tail and (last_newline >= 0 or at_line_start) and len(tail) <= MAX_MARKER_LENGTH and (
+            tail.startswith(STEP_PREFIX) or STEP_PREFIX.startswith(tail)
+        ):
+            self._carry = tail
+        
+        if last_newline < 0 or STEP_PREFIX not in data:
+            return False
+        
+        started = False
+        position = data.find(STEP_PREFIX)
+        while 0 <= position < last_newline:
+            end = data.find("\n", position)
+            if (position == 0 and at_line_start) or (position > 0 and data[position - 1] == "\n"):
+                name = data[position + len(STEP_PREFIX):end].rstrip("\r")
+                if name.endswith(STEP_SUFFIX) and len(name) <= MAX_MARKER_LENGTH:
+                    self._start(name[:-len(STEP_SUFFIX)].strip())
+                    started = True
+            position = data.find(STEP_PREFIX, end)
+        return started
+    
+    def finish(self, finished_at: Optional[datetime] = None) -> List[dict]:
+        """
+        実行の終了時に最後のステップを終える
+        
+        Args:
+            finished_at: 実行の終了日時（Noneは現在）
+            
+        Returns:
+            ステップのリスト（JobExecution.steps に保存する形式）
+        """
+        if self.steps and self.steps[-1]["finished_at"] is None:
+            self._end(self.steps[-1], finished_at or self._clock())
+        return self.steps
+    
+    def _start(self, name: str) -> None:
+        """ステップを開始（前のステップは同じ時刻に終える）"""
+        now = self._clock()
+        if self.steps and self.steps[-1]["finished_at"] is None:
+            self._end(self.steps[-1], now)
+        self.steps.append({
+            "name": name,
+            "started_at": now.isoformat(),
+            "finished_at": None,
+            "duration_seconds": None,
+        })
+    
+    @staticmethod
+    def _end(step: dict, moment: datetime) -> None:
+        """ステップを終える"""
+        started_at = datetime.fromisoformat(step["started_at"])
+        step["finished_at"] = moment.isoformat()
+        step["duration_seconds"] = max((moment - started_at).total_seconds(), 0.0)
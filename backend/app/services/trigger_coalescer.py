@@ -0,0 +1,103 @@
+"""
+実行要求の合流
+同じジョブへの集中した実行要求を1回の実行にまとめる
+"""
+import asyncio
+import hashlib
+import json
+from typing import Coroutine, Dict
+
+
+def compute_trigger_hash(parameters: Dict[str, str], input_hashes: Dict[str, str]) -> str:
+    """
+    実行要求の内容のハッシュを計算
+    
+    同じジョブでこのハッシュが同じ要求は、同じ実行待ちに合流できる。
+    
+    Args:
+        parameters: パラメータ
+        input_hashes: 入力の名前とハッシュ値
+        
+    Returns:
+        SHA-256 の16進文字列
+    """
+    material = {
+        "parameters": sorted(parameters.items()),
+        "inputs": sorted(input_hashes.items()),
+    }
+    encoded = json.dumps(material, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+class TriggerCoalescer:
+    """
+    実行要求の合流
+    
+    ジョブごとのロックで実行待ちの確認と作成を直列化し、予約した実行を
+    バックグラウンドで動かす。合流した要求はすべて同じ実行の完了を待つ。
+    
+    ロック（asyncio.Lock）は同じプロセス内の要求にのみ有効。複数のワーカープロセスでは、
+    既にコミットされた実行待ちには合流するが、別のプロセスに同時に届いた同じ要求は
+    それぞれ実行待ちを作成して別々に実行されることがある（合流は最適化のため重複実行は許容する）。
+    冪等キーはDBの主キーで一意にしており、別のプロセスが先に登録した場合は
+    一意制約違反を検出してそのプロセスが作成した実行を返すため、複数プロセスでも重複しない。
+    """
+    
+    def __init__(self):
+        self._locks: Dict[int, asyncio.Lock] = {}
+        self._tasks: Dict[int, asyncio.Task] = {}
+    
+    def lock(self, job_id: int) -> asyncio.Lock:
+        """
+        ジョブごとのロックを取得
+        
+        Args:
+            job_id: ジョブID
+            
+        Returns:
+            ロック
+        """
+        return self._locks.setdefault(job_id, asyncio.Lock())
+    
+    def dispatch(self, execution_id: int, coro: Coroutine) -> None:
+        """
+        実行をバックグラウンドで開始
+        
+        Args:
+            execution_id: 実行ID
+            coro: 実行するコルーチン
+        """
+        task = asyncio.create_task(coro)
+        self._tasks[execution_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(execution_id, None))
+    
+    async def wait(self, execution_id: int) -> None:
+        """
+        実行の完了を待つ（このプロセスで実行していない場合はすぐに戻る）
+        
+        待っている側がキャンセルされても実行自体は継続する。
+        
+        Args:
+            execution_id: 実行ID
+        """
+        task = self._tasks.get(execution_id)
+        if task is None:
+            return
+        try:
+            await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.cancelled():
+                raise
+        except Exception:
+            # 実行中のエラーは実行履歴に記録されている
+            pass
+    
+    async def shutdown(self) -> None:
+        """実行待ち・実行中のタスクを中断（アプリケーション終了時）"""
+        for task in list(self._tasks.values()):
+            task.cancel()
+        await asyncio.gather(*list(self._tasks.values()), return_exceptions=True)
+
+
+# シングルトンインスタンス
+trigger_coalescer = TriggerCoalescer()
@@ -0,0 +1,347 @@
+"""
+Webhookサービス
+Webhookの受信（署名検証と保存）と、イベントからジョブ実行への対応付けを管理
+"""
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, desc
+from sqlalchemy.exc import IntegrityError
+from dataclasses import dataclass
+from datetime import datetime
+from fnmatch import fnmatchcase
+from typing import Dict, List, Mapping, Optional, Tuple
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.job import Job
+from app.models.webhook import WebhookEvent, WebhookEventStatus, WebhookProvider
+from app.services.execution_service import ExecutionService
+
+logger = logging.getLogger(__name__)
+
+
+# 送信元ごとのヘッダー名（イベント種別, 配信ID）
+EVENT_HEADERS: Dict[WebhookProvider, Tuple[str, str]] = {
+    WebhookProvider.GITHUB: ("X-GitHub-Event", "X-GitHub-Delivery"),
+    WebhookProvider.GITEA: ("X-Gitea-Event", "X-Gitea-Delivery"),
+    WebhookProvider.GITLAB: ("X-Gitlab-Event", "X-Gitlab-Event-UUID"),
+}
+
+# pushイベントの種別
+PUSH_EVENT_TYPES = {"push", "Push Hook"}
+
+# ブランチ削除時の after
+NULL_COMMIT = "0" * 40
+
+
+class WebhookNotConfiguredError(Exception):
+    """Webhookのシークレットが設定されていない"""
+    pass
+
+
+class WebhookSignatureError(Exception):
+    """Webhookの署名が不正"""
+    pass
+
+
+@dataclass
+class PushEvent:
+    """pushイベントの内容"""
+    repository: str
+    branch: str
+    commit: str
+
+
+def verify_signature(provider: WebhookProvider, headers: Mapping[str, str], body: bytes) -> None:
+    """
+    Webhookの署名を検証
+    
+    GitHub・Gitea はリクエストボディの HMAC-SHA256、GitLab はトークンを比較する。
+    
+    Args:
+        provider: 送信元
+        headers: リクエストヘッダー
+        body: リクエストボディ
+        
+    Raises:
+        WebhookNotConfiguredError: シークレットが設定されていない
+        WebhookSignatureError: 署名が不正
+    """
+    secret = settings.webhook_secret
+    if not secret:
+        raise WebhookNotConfiguredError("Webhookのシークレットが設定されていません")
+    
+    if provider == WebhookProvider.GITLAB:
+        token = headers.get("X-Gitlab-Token", "")
+        if not hmac.compare_digest(token.encode(), secret.encode()):
+            raise WebhookSignatureError("Webhookのトークンが一致しません")
+        return
+    
+    expected = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    if provider == WebhookProvider.GITHUB:
+        signature = headers.get("X-Hub-Signature-256", "")
+        expected = f"sha256={expected}"
+    else:
+        signature = headers.get("X-Gitea-Signature", "")
+    if not hmac.compare_digest(signature.encode(), expected.encode()):
+        raise WebhookSignatureError("Webhookの署名が一致しません")
+
+
+def parse_push(provider: WebhookProvider, event_type: Optional[str], payload: str) -> Optional[PushEvent]:
+    """
+    ブランチへのpushイベントを解析
+    
+    Args:
+        provider: 送信元
+        event_type: イベント種別
+        payload: リクエストボディ
+        
+    Returns:
+        pushイベント、対象外（push以外・タグ・ブランチ削除）の場合はNone
+        
+    Raises:
+        ValueError: ボディの形式が不正
+    """
+    if event_type not in PUSH_EVENT_TYPES:
+        return None
+    
+    data = json.loads(payload)
+    if not isinstance(data, dict):
+        raise ValueError("JSONオブジェクトではありません")
+    if provider == WebhookProvider.GITLAB:
+        repository = (data.get("project") or {}).get("path_with_namespace")
+    else:
+        repository = (data.get("repository") or {}).get("full_name")
+    
+    ref = data.get("ref") or ""
+    commit = data.get("after") or ""
+    if not repository or not ref.startswith("refs/heads/") or not commit or commit == NULL_COMMIT:
+        return None
+    
+    return PushEvent(repository=repository, branch=ref[len("refs/heads/"):], commit=commit)
+
+
+class WebhookService:
+    """Webhookサービス"""
+    
+    def __init__(self, db: AsyncSession):
+        self.db = db
+    
+    async def receive(
+        self,
+        provider: WebhookProvider,
+        headers: Mapping[str, str],
+        body: bytes
+    ) -> Tuple[Optional[int], bool]:
+        """
+        Webhookを受信して保存
+        
+        送信元にすぐ応答できるよう、ここでは署名検証とイベントの挿入だけを行う。
+        
+        Args:
+            provider: 送信元
+            headers: リクエストヘッダー
+            body: リクエストボディ
+            
+        Returns:
+            (イベントID, 重複したか) のタプル。重複した場合のイベントIDはNone
+            
+        Raises:
+            WebhookNotConfiguredError: シークレットが設定されていない
+            WebhookSignatureError: 署名が不正
+        """
+        verify_signature(provider, headers, body)
+        
+        event_header, delivery_header = EVENT_HEADERS[provider]
+        event = WebhookEvent(
+            provider=provider,
+            event_type=headers.get(event_header),
+            delivery_id=headers.get(delivery_header),
+            payload=body.decode("utf-8", errors="replace"),
+            status=WebhookEventStatus.PENDING
+        )
+        
+        self.db.add(event)
+        try:
+            await self.db.commit()
+        except IntegrityError:
+            # 同じ配信IDの再送
+            await self.db.rollback()
+            return None, True
+        
+        webhook_processor.notify()
+        return event.id, False
+    
+    async def get_events(self, limit: int = 100) -> List[WebhookEvent]:
+        """
+        受信したイベントを取得（最新順）
+        
+        Args:
+            limit: 取得件数
+            
+        Returns:
+            イベントのリスト
+        """
+        result = await self.db.execute(
+            select(WebhookEvent)
+            .order_by(desc(WebhookEvent.id))
+            .limit(limit)
+        )
+        return list(result.scalars().all())
+    
+    async def process_pending(self, batch_size: int) -> int:
+        """
+        処理待ちのイベントをまとめてジョブの実行に対応付ける
+        
+        同じリポジトリ・ブランチへのpushはバッチ内で最新のものにまとめ、
+        対象のジョブごとに1回だけ実行を予約する。
+        イベントは行ロックで確保したまま処理待ちにしておき、実行の予約（別のセッション）が
+        終わってから結果のステータスを1回のコミットで記録する。途中でプロセスが
+        終了した場合はイベントが処理待ちのまま残って再処理され、予約はイベントごとの
+        冪等キーで重複しない。
+        
+        Args:
+            batch_size: 1回に処理するイベント数
+            
+        Returns:
+            処理したイベント数
+        """
+        result = await self.db.execute(
+            select(WebhookEvent)
+            .where(WebhookEvent.status == WebhookEventStatus.PENDING)
+            .order_by(WebhookEvent.id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        events = list(result.scalars().all())
+        if not events:
+            return 0
+        
+        # ステータスは予約が終わるまで変更しない（変更するとロック中の行が書き込まれる）
+        outcomes: Dict[int, Tuple[WebhookEventStatus, Optional[str], Optional[List[int]]]] = {}
+        latest: Dict[Tuple[str, str], Tuple[int, PushEvent]] = {}
+        grouped: Dict[Tuple[str, str], List[WebhookEvent]] = {}
+        for event in events:
+            try:
+                push = parse_push(event.provider, event.event_type, event.payload)
+            except ValueError as e:
+                outcomes[event.id] = (WebhookEventStatus.FAILED, f"イベントの解析に失敗: {str(e)}", None)
+                continue
+            if push is None:
+                outcomes[event.id] = (WebhookEventStatus.IGNORED, None, None)
+                continue
+            key = (push.repository, push.branch)
+            latest[key] = (event.id, push)
+            grouped.setdefault(key, []).append(event)
+        
+        jobs = []
+        if latest:
+            result = await self.db.execute(
+                select(Job.id, Job.trigger_repository, Job.trigger_branch)
+                .where(Job.trigger_repository.in_({repo for repo, _ in latest}))
+            )
+            jobs = list(result.all())
+        
+        async with AsyncSessionLocal() as enqueue_db:
+            execution_service = ExecutionService(enqueue_db)
+            for (repository, branch), (event_id, push) in latest.items():
+                execution_ids: List[int] = []
+                error = None
+                for job_id, trigger_repository, trigger_branch in jobs:
+                    if trigger_repository != repository:
+                        continue
+                    if trigger_branch and not fnmatchcase(branch, trigger_branch):
+                        continue
+                    try:
+                        execution = await execution_service.enqueue(
+                            job_id,
+                            parameters={
+                                "GIT_REPOSITORY": repository,
+                                "GIT_BRANCH": branch,
+                                "GIT_COMMIT": push.commit,
+                            },
+                            idempotency_key=f"webhook:{event_id}:{job_id}"
+                        )
+                        execution_ids.append(execution.id)
+                    except Exception as e:
+                        await enqueue_db.rollback()
+                        logger.exception("Webhookイベント %d のジョブID %d の実行予約に失敗しました", event_id, job_id)
+                        error = f"ジョブID {job_id} の実行予約に失敗: {str(e)}"
+                
+                if error:
+                    status = WebhookEventStatus.FAILED
+                elif execution_ids:
+                    status = WebhookEventStatus.PROCESSED
+                else:
+                    status = WebhookEventStatus.IGNORED
+                for event in grouped[(repository, branch)]:
+                    outcomes[event.id] = (status, error, execution_ids)
+        
+        now = datetime.utcnow()
+        for event in events:
+            status, error, execution_ids = outcomes[event.id]
+            event.status = status
+            event.error_message = error
+            event.execution_ids = execution_ids
+            event.processed_at = now
+        await self.db.commit()
+        
+        return len(events)
+
+
+class WebhookProcessor:
+    """
+    Webhookイベントの処理ワーカー
+    
+    受信の通知を受けると、少し待って後続のイベントをまとめてから処理する。
+    他のプロセスで受信したイベントも拾えるよう、通知がなくても一定間隔で確認する。
+    """
+    
+    def __init__(self):
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+    
+    def start(self) -> None:
+        """ワーカーを開始"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+    
+    async def stop(self) -> None:
+        """ワーカーを停止"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+    
+    def notify(self) -> None:
+        """イベントの受信を通知"""
+        self._wakeup.set()
+    
+    async def _loop(self) -> None:
+        """処理ループ"""
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=settings.webhook_poll_interval)
+                # 連続して届くイベントを1回の処理にまとめる
+                await asyncio.sleep(settings.webhook_batch_delay)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            
+            try:
+                while True:
+                    async with AsyncSessionLocal() as db:
+                        count = await WebhookService(db).process_pending(settings.webhook_batch_size)
+                    if count < settings.webhook_batch_size:
+                        break
+            except Exception:
+                # 処理できなかったイベントは処理待ちのまま残り、次回に再試行する
+                logger.exception("Webhookイベントの処理に失敗しました")
+
+
+# シングルトンインスタンス
+webhook_processor = WebhookProcessor()
@@ -0,0 +1,337 @@
+"""
+ワークスペース同期サービス
+ローカルのワークスペースをリモートへ差分転送する
+"""
+import asyncio
+import hashlib
+import json
+import os
+import posixpath
+import stat
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+import asyncssh
+
+from app.core.config import settings
+from app.models.server import Server
+from app.services.ssh_service import ssh_service
+
+
+# リモートに保存するマニフェストのファイル名
+MANIFEST_NAME = ".tsubame-manifest.json"
+
+
+class WorkspaceError(Exception):
+    """ワークスペースの指定が不正・ワークスペースが存在しない"""
+    pass
+
+
+def resolve_workspace(source: str, must_exist: bool = False) -> Path:
+    """
+    ワークスペースのパスを WORKSPACE_ROOT の下に解決
+    
+    相対パスは WORKSPACE_ROOT 基準とし、シンボリックリンクを解決した結果が
+    WORKSPACE_ROOT の外になるパスは拒否する（CIホストの任意のファイルをリモートへ
+    コピーできないようにする）。WORKSPACE_ROOT が未設定の場合は同期できない。
+    
+    Args:
+        source: ワークスペース（ローカルのパス）
+        must_exist: ディレクトリが存在することも確認するか
+        
+    Returns:
+        解決したワークスペースのパス
+        
+    Raises:
+        WorkspaceError: WORKSPACE_ROOT が未設定・WORKSPACE_ROOT の外・存在しない
+    """
+    if not settings.workspace_root:
+        raise WorkspaceError("WORKSPACE_ROOT が設定されていないため、ワークスペースは同期できません")
+    root = Path(settings.workspace_root).expanduser().resolve()
+    path = (root / Path(source).expanduser()).resolve()
+    if not path.is_relative_to(root):
+        raise WorkspaceError(f"ワークスペースは WORKSPACE_ROOT の下を指定してください: {source}")
+    if must_exist and not path.is_dir():
+        raise WorkspaceError(f"ワークスペースが見つかりません: {source}")
+    return path
+
+
+@dataclass
+class SyncResult:
+    """同期結果"""
+    files_total: int = 0
+    files_transferred: int = 0
+    files_deleted: int = 0
+    bytes_total: int = 0
+    bytes_transferred: int = 0
+    
+    @property
+    def bytes_saved(self) -> int:
+        """全量転送と比べて削減したバイト数"""
+        return max(self.bytes_total - self.bytes_transferred, 0)
+
+
+class WorkspaceSyncService:
+    """
+    ワークスペース同期サービス
+    
+    ローカルのファイル一覧（サイズ・更新日時・ハッシュ）と、前回同期時に
+    リモートへ保存したマニフェストを比較し、変更されたファイルだけを転送する。
+    大きなファイルはブロック単位のハッシュも比較し、変更ブロックのみ書き込む。
+    リモート側のファイルを直接変更した場合はマニフェストと食い違うため検出できない。
+    ワークスペース内のシンボリックリンクはたどらない（ファイル・ディレクトリとも同期しない）。
+    """
+    
+    def __init__(self):
+        self.block_size = settings.workspace_sync_block_size
+        # ローカルのハッシュ計算結果（パス -> (サイズ, 更新日時, エントリ)。最近使った順に上限まで保持）
+        self._hash_cache: "OrderedDict[str, Tuple[int, int, dict]]" = OrderedDict()
+        self._hash_cache_lock = threading.Lock()
+    
+    def build_manifest(self, root: Path) -> Dict[str, dict]:
+        """
+        ローカルワークスペースのマニフェストを作成
+        
+        サイズと更新日時が前回と同じファイルはハッシュを再計算しない。
+        
+        Args:
+            root: ワークスペースのルート
+            
+        Returns:
+            相対パス -> {size, mtime, mode, sha256, blocks} の辞書
+        """
+        excludes = set(settings.workspace_sync_exclude_list)
+        manifest: Dict[str, dict] = {}
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = sorted(d for d in dirnames if d not in excludes)
+            for filename in sorted(filenames):
+                if filename in excludes:
+                    continue
+                path = Path(dirpath) / filename
+                st = path.lstat()
+                if not stat.S_ISREG(st.st_mode):
+                    continue
+                rel = path.relative_to(root).as_posix()
+                manifest[rel] = self._entry(path, st)
+        return manifest
+    
+    def _entry(self, path: Path, st: os.stat_result) -> dict:
+        """ファイル1件のマニフェストエントリ（キャッシュ付き）"""
+        key = str(path)
+        # build_manifest は別スレッドで同時に実行されるため、キャッシュの操作はロックで保護する
+        # （ハッシュの計算中はロックを保持しない）
+        with self._hash_cache_lock:
+            cached = self._hash_cache.get(key)
+            if cached and cached[0] == st.st_size and cached[1] == st.st_mtime_ns:
+                self._hash_cache.move_to_end(key)
+                return cached[2]
+        
+        digest = hashlib.sha256()
+        blocks: List[str] = []
+        with open(path, "rb") as f:
+            while True:
+                data = f.read(self.block_size)
+                if not data:
+                    break
+                digest.update(data)
+                blocks.append(hashlib.sha256(data).hexdigest())
+        
+        entry = {
+            "size": st.st_size,
+            "mtime": st.st_mtime_ns,
+            "mode": stat.S_IMODE(st.st_mode),
+            "sha256": digest.hexdigest(),
+            # 1ブロックに収まるファイルはブロック差分を使わない
+            "block_size": self.block_size,
+            "blocks": blocks if len(blocks) > 1 else [],
+        }
+        with self._hash_cache_lock:
+            self._hash_cache[key] = (st.st_size, st.st_mtime_ns, entry)
+            self._hash_cache.move_to_end(key)
+            while len(self._hash_cache) > settings.workspace_sync_hash_cache_size:
+                self._hash_cache.popitem(last=False)
+        return entry
+    
+    async def sync(self, server: Server, source: str, dest: str) -> SyncResult:
+        """
+        ワークスペースをリモートへ同期
+        
+        Args:
+            server: 同期先サーバ
+            source: ローカルのワークスペース（WORKSPACE_ROOT 基準）
+            dest: リモートの同期先ディレクトリ
+            
+        Returns:
+            同期結果
+            
+        Raises:
+            WorkspaceError: ワークスペースが WORKSPACE_ROOT の外・存在しない
+            SSHConnectionError: 接続エラー
+        """
+        root = resolve_workspace(source, must_exist=True)
+        
+        local = await asyncio.to_thread(self.build_manifest, root)
+        result = SyncResult(
+            files_total=len(local),
+            bytes_total=sum(entry["size"] for entry in local.values())
+        )
+        
+        async with ssh_service.open_sftp(server) as sftp:
+            await sftp.makedirs(dest, exist_ok=True)
+            remote = await self._read_remote_manifest(sftp, dest)
+            
+            changed = [
+                rel for rel, entry in local.items()
+                if remote.get(rel, {}).get("sha256") != entry["sha256"]
+                or remote[rel].get("mode") != entry["mode"]
+            ]
+            deleted = [rel for rel in remote if rel not in local]
+            
+            # 親ディレクトリは事前に作成しておく（並列転送での競合を避ける）
+            dirs = sorted({posixpath.dirname(rel) for rel in changed} - {""})
+            for directory in dirs:
+                await sftp.makedirs(posixpath.join(dest, directory), exist_ok=True)
+            
+            semaphore = asyncio.Semaphore(settings.workspace_sync_concurrency)
+            
+            async def transfer(rel: str) -> int:
+                async with semaphore:
+                    return await self._transfer(
+                        sftp, root / rel, posixpath.join(dest, rel),
+                        local[rel], remote.get(rel)
+                    )
+            
+            async def remove(rel: str) -> None:
+                async with semaphore:
+                    try:
+                        await sftp.remove(posixpath.join(dest, rel))
+                    except asyncssh.SFTPNoSuchFile:
+                        pass
+            
+            sent = await asyncio.gather(*[transfer(rel) for rel in changed])
+            await asyncio.gather(*[remove(rel) for rel in deleted])
+            
+            await self._write_remote_manifest(sftp, dest, local)
+        
+        result.files_transferred = len(changed)
+        result.files_deleted = len(deleted)
+        result.bytes_transferred = sum(sent)
+        return result
+    
+    async def _transfer(
+        self,
+        sftp: asyncssh.SFTPClient,
+        local_path: Path,
+        remote_path: str,
+        entry: dict,
+        remote_entry: Optional[dict]
+    ) -> int:
+        """
+        ファイル1件を転送
+        
+        リモートに前回版があり両方にブロックハッシュがある場合は変更ブロックのみ書き込む。
+        
+        Returns:
+            転送したバイト数
+        """
+        if remote_entry and remote_entry.get("sha256") == entry["sha256"]:
+            # 内容は同じでパーミッションのみ変更
+            await sftp.chmod(remote_path, entry["mode"])
+            return 0
+        
+        old_blocks: List[str] = []
+        if remote_entry and remote_entry.get("block_size") == self.block_size:
+            old_blocks = remote_entry.get("blocks", [])
+        
+        if old_blocks and entry["blocks"] and await sftp.exists(remote_path):
+            changed_blocks: Set[int] = {
+                index for index, block in enumerate(entry["blocks"])
+                if index >= len(old_blocks) or old_blocks[index] != block
+            }
+            sent = await self._write_blocks(sftp, local_path, remote_path, changed_blocks, entry["size"])
+        else:
+            sent = await self._write_all(sftp, local_path, remote_path)
+        
+        await sftp.chmod(remote_path, entry["mode"])
+        return sent
+    
+    async def _write_blocks(
+        self,
+        sftp: asyncssh.SFTPClient,
+        local_path: Path,
+        remote_path: str,
+        indexes: Set[int],
+        size: int
+    ) -> int:
+        """変更ブロックのみ上書きし、サイズを合わせる"""
+        sent = 0
+        async with sftp.open(remote_path, "r+b") as remote:
+            with open(local_path, "rb") as local:
+                for index in sorted(indexes):
+                    offset = index * self.block_size
+                    local.seek(offset)
+                    data = local.read(self.block_size)
+                    await remote.write(data, offset)
+                    sent += len(data)
+            await remote.truncate(size)
+        return sent
+    
+    async def _write_all(
+        self,
+        sftp: asyncssh.SFTPClient,
+        local_path: Path,
+        remote_path: str
+    ) -> int:
+        """ファイル全体を転送（書き込み要求はパイプライン化される）"""
+        sent = 0
+        chunk_size = settings.sftp_block_size * settings.sftp_max_requests
+        async with sftp.open(
+            remote_path,
+            "wb",
+            block_size=settings.sftp_block_size,
+            max_requests=settings.sftp_max_requests
+        ) as remote:
+            with open(local_path, "rb") as local:
+                while True:
+                    data = local.read(chunk_size)
+                    if not data:
+                        break
+                    await remote.write(data)
+                    sent += len(data)
+        return sent
+    
+    async def _read_remote_manifest(self, sftp: asyncssh.SFTPClient, dest: str) -> Dict[str, dict]:
+        """前回同期時のマニフェストを読み込む（存在しない・壊れている場合は空）"""
+        try:
+            async with sftp.open(posixpath.join(dest, MANIFEST_NAME), "rb") as f:
+                data = await f.read()
+            manifest = json.loads(data)
+            return manifest if isinstance(manifest, dict) else {}
+        except (asyncssh.SFTPNoSuchFile, ValueError):
+            return {}
+    
+    async def _write_remote_manifest(
+        self,
+        sftp: asyncssh.SFTPClient,
+        dest: str,
+        manifest: Dict[str, dict]
+    ) -> None:
+        """マニフェストを一時ファイル経由で置き換える"""
+        path = posixpath.join(dest, MANIFEST_NAME)
+        tmp_path = f"{path}.tmp"
+        async with sftp.open(tmp_path, "wb") as f:
+            await f.write(json.dumps(manifest, separators=(",", ":")).encode())
+        try:
+            await sftp.posix_rename(tmp_path, path)
+        except asyncssh.SFTPOpUnsupported:
+            # posix-rename 拡張のないサーバでは削除してから名前を変更する
+            if await sftp.exists(path):
+                await sftp.remove(path)
+            await sftp.rename(tmp_path, path)
+
+
+# シングルトンインスタンス（ローカルのハッシュキャッシュを共有する）
+workspace_sync_service = WorkspaceSyncService()
@@ -0,0 +1,154 @@
+"""
+サーバプールの割り当てシミュレーション
+
+CPU数とバックグラウンド負荷の異なるサーバのプールに、実行時間のばらつく
+ジョブを集中して投入し、全ジョブの完了時刻（makespan）を
+「ランダムに割り当て」と「負荷の低いメンバーに割り当て」で比較する。
+負荷の低いメンバーの判定にはアプリケーションと同じ placement_score を使い、
+負荷の収集結果は一定間隔でしか更新されない（その間の割り当ては件数で補う）。
+
+実行方法（backend ディレクトリで）:
+    DATABASE_URL=postgresql+asyncpg://x:x@localhost/x SECRET_KEY=x ENCRYPTION_KEY=x \\
+        python -m benchmarks.pool_placement --jobs 500 --seeds 5
+"""
+import argparse
+import heapq
+import random
+import statistics
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+from app.services.server_load import ServerLoad, placement_score
+
+
+@dataclass
+class SimServer:
+    """シミュレーション上のサーバ"""
+    cpus: int
+    background_load: float  # プール外の処理によるロード
+    slots: List[float] = field(default_factory=list)  # 各実行枠が空く時刻
+    finishes: List[float] = field(default_factory=list)  # 割り当てた実行の終了時刻
+    starts: List[float] = field(default_factory=list)  # 割り当てた実行の開始時刻
+    sample: Optional[ServerLoad] = None
+    
+    def reset(self) -> None:
+        self.slots = [0.0] * self.cpus
+        heapq.heapify(self.slots)
+        self.finishes = []
+        self.starts = []
+        self.sample = None
+    
+    def queued(self, now: float) -> int:
+        """時刻 now に実行中・開始待ちの件数"""
+        return sum(1 for finished in self.finishes if finished > now)
+    
+    def running(self, now: float) -> int:
+        """時刻 now に実行中の件数"""
+        return sum(
+            1 for started, finished in zip(self.starts, self.finishes)
+            if started <= now < finished
+        )
+    
+    def assign(self, now: float, work: float) -> float:
+        """実行を割り当て、終了時刻を返す（バックグラウンド負荷の分だけ遅くなる）"""
+        start = max(now, heapq.heappop(self.slots))
+        finish = start + work * (1.0 + self.background_load / self.cpus)
+        heapq.heappush(self.slots, finish)
+        self.starts.append(start)
+        self.finishes.append(finish)
+        return finish
+
+
+def _make_pool(rng: random.Random, size: int) -> List[SimServer]:
+    """CPU数とバックグラウンド負荷の異なるサーバのプールを作る"""
+    return [
+        SimServer(
+            cpus=rng.choice([2, 4, 8, 16]),
+            background_load=rng.choice([0.0, 0.0, 1.0, 4.0, 12.0])
+        )
+        for _ in range(size)
+    ]
+
+
+def _make_jobs(rng: random.Random, count: int, burst_seconds: float) -> List[tuple]:
+    """(到着時刻, 実行時間) のリスト。到着は burst_seconds の間に集中する"""
+    jobs = [
+        (rng.uniform(0.0, burst_seconds), rng.lognormvariate(3.0, 0.8))
+        for _ in range(count)
+    ]
+    return sorted(jobs)
+
+
+def _random_policy(rng: random.Random) -> Callable:
+    def choose(servers: List[SimServer], now: float) -> SimServer:
+        return rng.choice(servers)
+    return choose
+
+
+def _least_loaded_policy(sample_interval: float) -> Callable:
+    def choose(servers: List[SimServer], now: float) -> SimServer:
+        for server in servers:
+            # 収集間隔ごとの時刻に収集した値だけが見える
+            sampled_at = now - (now % sample_interval)
+            if server.sample is None or server.sample.sampled_at < sampled_at:
+                server.sample = ServerLoad(
+                    load1=server.background_load + server.running(sampled_at),
+                    cpus=server.cpus,
+                    sampled_at=sampled_at
+                )
+        return min(
+            servers,
+            key=lambda server: placement_score(
+                server.queued(now), server.cpus, server.sample, now
+            )
+        )
+    return choose
+
+
+def simulate(servers: List[SimServer], jobs: List[tuple], choose: Callable) -> tuple:
+    """
+    全ジョブを割り当て、(makespan, 平均の完了までの時間) を返す
+    """
+    for server in servers:
+        server.reset()
+    makespan = 0.0
+    turnaround = []
+    for arrived, work in jobs:
+        finished = choose(servers, arrived).assign(arrived, work)
+        makespan = max(makespan, finished)
+        turnaround.append(finished - arrived)
+    return makespan, statistics.mean(turnaround)
+
+
+def main(jobs: int, servers: int, seeds: int, burst_seconds: float, sample_interval: float) -> None:
+    print(
+        f"{jobs} jobs over {burst_seconds:.0f}s onto {servers} servers "
+        f"(load sampled every {sample_interval:.0f}s)"
+    )
+    ratios = []
+    for seed in range(seeds):
+        rng = random.Random(seed)
+        pool = _make_pool(rng, servers)
+        workload = _make_jobs(rng, jobs, burst_seconds)
+        
+        random_makespan, random_turnaround = simulate(pool, workload, _random_policy(random.Random(seed)))
+        placed_makespan, placed_turnaround = simulate(pool, workload, _least_loaded_policy(sample_interval))
+        ratios.append(random_makespan / placed_makespan)
+        
+        print(
+            f"  seed {seed}: makespan random {random_makespan:8.1f}s / least-loaded {placed_makespan:8.1f}s "
+            f"({random_makespan / placed_makespan:4.2f}x), "
+            f"mean turnaround {random_turnaround:7.1f}s / {placed_turnaround:7.1f}s"
+        )
+    print(f"  geometric mean speedup: {statistics.geometric_mean(ratios):.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--jobs", type=int, default=500, help="投入するジョブ数")
+    parser.add_argument("--servers", type=int, default=8, help="プールのサーバ数")
+    parser.add_argument("--seeds", type=int, default=5, help="試行回数（乱数シード数）")
+    parser.add_argument("--burst-seconds", type=float, default=120.0, help="ジョブが到着する期間（秒）")
+    parser.add_argument("--sample-interval", type=float, default=15.0, help="負荷の収集間隔（秒）")
+    args = parser.parse_args()
+    main(args.jobs, args.servers, args.seeds, args.burst_seconds, args.sample_interval)
@@ -0,0 +1,115 @@
+"""
+SSHチャネル多重化ベンチマーク
+
+ローカルに asyncssh のSSHサーバを立て、同一ホストへの同時ジョブ実行を
+「実行ごとに接続」と「接続プールでチャネル多重化」で比較する。
+
+実行方法（backend ディレクトリで）:
+    DATABASE_URL=postgresql+asyncpg://x:x@localhost/x SECRET_KEY=x ENCRYPTION_KEY=x \\
+        python -m benchmarks.ssh_multiplex --jobs 50
+"""
+import argparse
+import asyncio
+import time
+
+import asyncssh
+
+from app.core.config import settings
+from app.core.security import credential_encryptor
+from app.models.server import Server, AuthMethod
+from app.services.ssh_pool import SSHConnectionPool
+from app.services.ssh_service import ssh_service
+
+
+USERNAME = "bench"
+PASSWORD = "bench"
+
+
+class _BenchServer(asyncssh.SSHServer):
+    """ハンドシェイク回数を数えるSSHサーバ"""
+    
+    handshakes = 0
+    
+    def connection_made(self, conn: asyncssh.SSHServerConnection) -> None:
+        _BenchServer.handshakes += 1
+    
+    def begin_auth(self, username: str) -> bool:
+        return True
+    
+    def password_auth_supported(self) -> bool:
+        return True
+    
+    def validate_password(self, username: str, password: str) -> bool:
+        return username == USERNAME and password == PASSWORD
+
+
+def _make_process_handler(job_seconds: float):
+    async def handle(process: asyncssh.SSHServerProcess) -> None:
+        # スクリプトの実行時間を模擬
+        await asyncio.sleep(job_seconds)
+        process.stdout.write(f"ran: {process.command}\n")
+        process.exit(0)
+    return handle
+
+
+async def _run_jobs(server: Server, jobs: int) -> float:
+    """同時にジョブを投入し、全完了までの秒数を返す"""
+    started = time.perf_counter()
+    results = await asyncio.gather(*[
+        ssh_service.execute_script(server, f"echo job-{i}")
+        for i in range(jobs)
+    ])
+    elapsed = time.perf_counter() - started
+    assert all(exit_code == 0 for exit_code, _, _ in results)
+    return elapsed
+
+
+async def main(jobs: int, job_seconds: float, max_sessions: int) -> None:
+    host_key = asyncssh.generate_private_key("ssh-ed25519")
+    acceptor = await asyncssh.create_server(
+        _BenchServer,
+        "127.0.0.1",
+        0,
+        server_host_keys=[host_key],
+        process_factory=_make_process_handler(job_seconds),
+    )
+    port = acceptor.sockets[0].getsockname()[1]
+    
+    server = Server(
+        id=1,
+        name="bench",
+        host="127.0.0.1",
+        port=port,
+        username=USERNAME,
+        auth_method=AuthMethod.PASSWORD,
+        password_encrypted=credential_encryptor.encrypt(PASSWORD),
+    )
+    
+    try:
+        for enabled in (False, True):
+            settings.ssh_pool_enabled = enabled
+            ssh_service.pool = SSHConnectionPool(
+                max_sessions=max_sessions,
+                max_connections=jobs,
+                idle_timeout=60,
+            )
+            _BenchServer.handshakes = 0
+            elapsed = await _run_jobs(server, jobs)
+            label = "multiplexed" if enabled else "per-job connection"
+            print(
+                f"{label:>20}: {jobs} jobs in {elapsed:.3f}s "
+                f"({_BenchServer.handshakes} SSH handshakes)"
+            )
+            await ssh_service.close()
+    finally:
+        acceptor.close()
+        await acceptor.wait_closed()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--jobs", type=int, default=50, help="同時実行ジョブ数")
+    parser.add_argument("--job-seconds", type=float, default=0.2, help="1ジョブの模擬実行時間")
+    parser.add_argument("--max-sessions", type=int, default=10, help="1接続あたりのチャネル上限")
+    args = parser.parse_args()
+    asyncio.run(main(args.jobs, args.job_seconds, args.max_sessions))